@@ -0,0 +1,81 @@
+from django.db import transaction
+
+# Local imports
+from core.models import ActivityLog, Books, Events, Materials, MobileUsers, Professionals
+from core.apis.cache_versions import bump_model_version
+from core.apis.live import RESYNC, publish_event
+from core.apis.serializers import ActivityLogSerializer
+
+# Model -> (timeline type, fields kept in the summary)
+ACTIVITY_MODELS = {
+    Professionals: ('professional', ('name', 'expertise', 'location')),
+    Materials: ('material', ('name', 'type', 'price', 'availability')),
+    Events: ('event', ('title', 'date', 'location')),
+    Books: ('book', ('name', 'price', 'availability')),
+    MobileUsers: ('user', ('first_name', 'last_name', 'email', 'is_active')),
+}
+
+
+def activity_summary(instance):
+    _, fields = ACTIVITY_MODELS[type(instance)]
+    return {field: getattr(instance, field) for field in fields}
+
+def stored_summary(model, pk):
+    _, fields = ACTIVITY_MODELS[model]
+    return model.objects.filter(pk=pk).values(*fields).first()
+
+def is_logged_change(model, changes):
+    """
+    True if `changes` (field names) touch the summary of `model`, other updates are not logged (eg: otp, fcm_token).
+    """
+    return model in ACTIVITY_MODELS and bool(set(ACTIVITY_MODELS[model][1]) & set(changes))
+
+def activity_entry(instance, action, created_on=None):
+    entity_type, _ = ACTIVITY_MODELS[type(instance)]
+    entry = ActivityLog(entity_type=entity_type, entity_id=instance.pk, action=action, summary=activity_summary(instance))
+    if created_on:
+        entry.created_on = created_on
+
+    return entry
+
+def log_activity(instance, action):
+    entry = activity_entry(instance, action)
+    entry.save()
+    publish_event('activity', ActivityLogSerializer(entry).data)
+    return entry
+
+def log_updates(model, ids, batch_size=500):
+    """
+    Bulk counterpart of log_activity for queryset.update().
+    """
+    for start in range(0, len(ids), batch_size):
+        rows = model.objects.filter(id__in=ids[start:start + batch_size])
+        for entry in ActivityLog.objects.bulk_create([activity_entry(row, 'updated') for row in rows]):
+            publish_event('activity', ActivityLogSerializer(entry).data)
+
+def backfill_activity_log(batch_size=1000):
+    """
+    Log a 'created' entry, dated from created_on, for the entities created before the activity log.
+    Returns the number of entries written.
+    """
+    count = 0
+    for model, (entity_type, _) in ACTIVITY_MODELS.items():
+        logged_ids = ActivityLog.objects.filter(entity_type=entity_type, action='created').values('entity_id')
+        rows = model.objects.exclude(id__in=logged_ids).order_by('id')
+
+        last_id = 0
+        while True:
+            batch = list(rows.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+
+            with transaction.atomic():
+                ActivityLog.objects.bulk_create([activity_entry(row, 'created', created_on=row.created_on) for row in batch])
+            count += len(batch)
+            last_id = batch[-1].id
+
+    if count:
+        # bulk_create sends no signal: the cached timelines would not show the entries
+        bump_model_version(ActivityLog)
+        publish_event(RESYNC, {})
+    return count
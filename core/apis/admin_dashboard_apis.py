@@ -1,22 +1,34 @@
 import datetime
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Sum
-from django.db.models.aggregates import Count
-from django.db.models.functions import TruncMonth
+from django.db.models import Q
 from django.utils import timezone
+from django.views import View
 
 # Third party imports
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework.utils.urls import replace_query_param
 
 # Local imports
 from .permissions import IsAuthenticatedAndAdmin
-from .serializers import AdminLoginSerializer, AdminLogoutSerializer, AccountSettingsRetrieveSerializer, AccountSettingsUpdateSerializer, AccountSettingsProfilePictureSerializer, AdminChangePasswordSerializer, BooksActivitySerializer, BooksCreateRetrieveUpdateSerializer, BooksListSerializer, BooksMultipleDeleteSerializer, EventsActivitySerializer, EventsCreateSerializer, EventsListSerializer, EventsMultipleDeleteSerializer, EventsRetrieveUpdateSerializer, MaterialsActivitySerializer, MaterialsCreateSerializer, MaterialsListSerializer, MaterialsMultipleDeleteSerializer, MaterialsRetrieveUpdateSerializer, MobileUsersActivitySerializer, NotificationsListCheckSerializer, NotificationsRetrieveUpdateSerializer, NotificationsCreateSerializer, NotificationsListSerializer, ProfessionalsActivitySerializer, ProfessionalsCreateRetrieveSerializer, ProfessionalsDeleteSerializer, ProfessionalsGrowthChartSerializer, ProfessionalsListSerializer, ProfessionalsUpdateSerializer, RevenueGrowthSerializer, TransactionsCreateSerializer, TransactionsListCheckSerializer, TransactionsListSerializer, TransactionsMarkAsCompletedSerializer, UsersListCheckSerializer, UsersListSerializer, UsersMultipleDeleteSerializer, UsersProfilePictureSerializer, UsersRetrieveUpdateSerializer
-from . paginations import BooksPagination, EventsPagination, MaterialsPagination, NotificationsPagination, ProfessionalsPagination, TransactionsPagination, UsersPagination
+from .serializers import AdminLoginSerializer, AdminLogoutSerializer, AccountSettingsRetrieveSerializer, AccountSettingsUpdateSerializer, AccountSettingsProfilePictureSerializer, AdminChangePasswordSerializer, BooksCreateRetrieveUpdateSerializer, BooksListSerializer, BooksMultipleDeleteSerializer, EventsCreateSerializer, EventsListSerializer, EventsMultipleDeleteSerializer, EventsRetrieveUpdateSerializer, MaterialsCreateSerializer, MaterialsListSerializer, MaterialsMultipleDeleteSerializer, MaterialsRetrieveUpdateSerializer, NotificationsListCheckSerializer, NotificationsRetrieveUpdateSerializer, NotificationsCreateSerializer, NotificationsListSerializer, ProfessionalsAutocompleteSerializer, ProfessionalsCreateRetrieveSerializer, ProfessionalsDeleteSerializer, ProfessionalsGrowthChartSerializer, GrowthChartSerializer, DashboardSummarySerializer, ProfessionalsListSerializer, ProfessionalsUpdateSerializer, RevenueGrowthSerializer, DistributionSerializer, SearchSerializer, TransactionAnalyticsSerializer, TransactionsCreateSerializer, TransactionsListCheckSerializer, TransactionsListSerializer, TransactionsMarkAsCompletedSerializer, UsersListCheckSerializer, UsersListSerializer, UsersMultipleDeleteSerializer, UsersProfilePictureSerializer, UsersRetrieveUpdateSerializer
+from . paginations import ActivityTimelinePagination, BooksPagination, EventsPagination, MaterialsPagination, NotificationsPagination, ProfessionalsPagination, TransactionsPagination, UsersPagination
 from core.models import Books, CustomUser, AdminUsers, Events, Materials, MobileUsers, Notifications, Professionals, ProReview, Transactions
-from core.apis.firebase import get_recipient_fcm_tokens, send_fcm_notification
+from core.apis.dispatch import enqueue_notification
+from core.apis.firebase import has_recipients
+from core.apis.segments import remove_users_from_segments
+from core.apis.dashboard import compute_dashboard, dashboard_etag, get_dashboard_result, live_snapshot
+from core.apis.live import CHANNELS, event_stream
+from core.apis.search import SEARCH_ENTITIES, search_filter, search_results
+from core.apis.autocomplete import AUTOCOMPLETE_FIELDS, professionals_autocomplete
 
 # Create your views apis.
 # ADMIN MANAGEMENT APIS
@@ -157,7 +169,7 @@ class ProfessionalsListCreateDeleteView(APIView):
                 filters &= Q(location=location)
 
             if search:
-                filters &= Q(name__icontains=search)
+                filters &= search_filter(Professionals, search)
 
             professionals = Professionals.objects.filter(filters)
 
@@ -226,6 +238,31 @@ class ProfessionalsRetrieveUpdateDeleteView(APIView):
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
 
+class ProfessionalsAutocompleteView(APIView):
+    """
+    Values of the professionals' name, expertise and location starting with `q` (at any
+    word), most frequent first with their counts, to fill the expertise/location filters.
+    Served from memory, no query per keystroke.
+
+    params: q, field (name, expertise or location, all by default), limit
+    """
+
+    permission_classes = [IsAuthenticatedAndAdmin]
+
+    def get(self, request):
+        serializer = ProfessionalsAutocompleteSerializer(data=request.query_params)
+        if serializer.is_valid():
+            field = serializer.validated_data.get("field")
+            suggestions = professionals_autocomplete.complete(
+                serializer.validated_data["q"],
+                (field,) if field else AUTOCOMPLETE_FIELDS,
+                serializer.validated_data["limit"],
+            )
+            return Response(suggestions, status=status.HTTP_200_OK)
+
+        return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
 # BOOKS MODULE API'S *******
 class BooksListCreateDeleteView(APIView):
     permission_classes = [IsAuthenticatedAndAdmin]
@@ -249,7 +286,7 @@ class BooksListCreateDeleteView(APIView):
         name = request.query_params.get("name")
 
         if name:
-            books = Books.objects.filter(name__icontains=name)
+            books = Books.objects.filter(search_filter(Books, name))
         else:
             books = Books.objects.all()
 
@@ -348,7 +385,7 @@ class EventsListCreateDeleteView(APIView):
             events = Events.objects.all()
         
         else:
-            events = Events.objects.filter(Q(title__icontains=search)|Q(location__icontains=search))
+            events = Events.objects.filter(search_filter(Events, search))
         
         pagination = EventsPagination()
         paginated_events = pagination.paginate_queryset(events, request)
@@ -453,7 +490,7 @@ class MaterialsListCreateDeleteView(APIView):
                 filters &= Q(supplier_name=supplier_name)
 
             if search:
-                filters &= Q(supplier_name__icontains=search) | Q(type__icontains=search)
+                filters &= search_filter(Materials, search)
 
             materials = Materials.objects.filter(filters)
 
@@ -551,7 +588,7 @@ class UsersListDeleteView(APIView):
                     filters &= Q(is_active=status_)
 
                 if search:
-                    filters &= Q(first_name__icontains=search) | Q(email__icontains=search)
+                    filters &= search_filter(MobileUsers, search)
 
                 users = MobileUsers.objects.filter(filters)
 
@@ -570,7 +607,9 @@ class UsersListDeleteView(APIView):
         if serializer.is_valid():
         
             try:
-                deleted_count = MobileUsers.objects.filter(id__in=serializer.validated_data["ids"], is_active=True).update(is_active=False)
+                with transaction.atomic():
+                    deleted_count = MobileUsers.objects.filter(id__in=serializer.validated_data["ids"], is_active=True).update(is_active=False)
+                    remove_users_from_segments(serializer.validated_data["ids"])
 
                 if deleted_count == 0:
                     return Response({"detail": "No users were deactivated"}, status=status.HTTP_404_NOT_FOUND)
@@ -675,7 +714,7 @@ class TransactionListCreateUpdateView(APIView):
                     filters &= Q(type=type)
 
                 if search:
-                    filters &= Q(user_involved__icontains=search)
+                    filters &= search_filter(Transactions, search)
 
                 transactions = Transactions.objects.filter(filters)
 
@@ -716,19 +755,7 @@ class KeyMatrixStatisticsView(APIView):
         key matrix statistics.
         """
 
-        total_professionals = Professionals.count()
-        total_materials = Materials.count()
-        total_registered_users = MobileUsers.count()
-        total_transactions = Transactions.count()
-
-        response_data = {
-            "total_professionals": total_professionals,
-            "total_materials": total_materials,
-            "total_registered_users": total_registered_users,
-            "total_transactions": total_transactions,
-        }
-
-        return Response(response_data, status=status.HTTP_200_OK)
+        return Response(get_dashboard_result('key_matrix_statistics'), status=status.HTTP_200_OK)
     
 
 class ProfessionalsGrowthChartView(APIView):
@@ -742,38 +769,25 @@ class ProfessionalsGrowthChartView(APIView):
 
         serializer = ProfessionalsGrowthChartSerializer(data=request.query_params)
         if serializer.is_valid():
-            months = serializer.validated_data["months"]
-            end_date = datetime.datetime.now()
-
-            # Initialize a dictionary to store counts for each month.
-            month_counts = {}
-            for i in range(months):
-                month_start = datetime.datetime(end_date.year, end_date.month, 1)
-                month_str = month_start.strftime("%Y-%m")
-                # Initialize the count for this month to 0.
-                month_counts[month_str] = 0
+            return Response(get_dashboard_result('professionals_growth_chart', serializer.validated_data), status=status.HTTP_200_OK)
         
-                end_date = month_start - datetime.timedelta(days=1)
+        return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
-            start_date = datetime.datetime(end_date.year, end_date.month, 1)
-    
-            professionals = Professionals.objects.filter(created_on__range=[start_date, datetime.datetime.now()])
-            queryset = professionals.annotate(month=TruncMonth('created_on')).values('month').annotate(count=Count('id'))
 
-            # Update the month_counts dictionary with actual counts from the query results.
-            for entry in queryset:
-                month_str = entry["month"].strftime("%Y-%m")
-                month_counts[month_str] = entry["count"]
+class GrowthChartView(APIView):
+    permission_classes = [IsAuthenticatedAndAdmin]
 
-            professionals_growth_chart = [{'month': month, 'count': count} for month, count in month_counts.items()]
+    def get(self, request):
+        """
+        Number of professionals, mobile users, books, events or materials created per day, week
+        or month, over the trailing `months` (default 12) or any from_date/to_date range.
+        Read from the daily creation rollups, a multi-year chart reads at most one row per day.
+        """
 
-            response = {
-                "months": months,
-                "professionals_growth_chart": professionals_growth_chart
-            }
+        serializer = GrowthChartSerializer(data=request.query_params)
+        if serializer.is_valid():
+            return Response(get_dashboard_result('growth_chart', serializer.validated_data), status=status.HTTP_200_OK)
 
-            return Response(response, status=status.HTTP_200_OK)
-        
         return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -786,177 +800,35 @@ class RevenueGrowthView(APIView):
         1. weekly -> gives report on that week
         2. monthly -> gives report on that month
         3. yearly -> gives report on that year
+        or on any from_date/to_date range, by day, week or month (granularity).
+        The buckets, the total and the previous period are computed in one grouped query.
         """
         serializer = RevenueGrowthSerializer(data=request.query_params)
         if serializer.is_valid():
-            periods = serializer.validated_data['periods']
-            
-            if periods == 'weekly':
-                today = datetime.datetime.now()
-                start_date = datetime.datetime(today.year, today.month, today.day) - datetime.timedelta(days=datetime.datetime.now().weekday())
-                end_date = start_date + datetime.timedelta(days=6)
-
-                # Get previous week date to calculate percentage
-                prev_start_date = start_date - datetime.timedelta(days=7)
-                delta = datetime.timedelta(days=1)
-
-                transactions = Transactions.objects.filter(date_time__gte=start_date, type='payment', status='completed')
-                total_revenue = transactions.aggregate(Sum('amount'))['amount__sum'] or 0.0
-
-                prev_transactions = Transactions.objects.filter(date_time__gte=prev_start_date, date_time__lt=start_date, status='completed')
-                prev_total_revenue = prev_transactions.aggregate(Sum('amount'))['amount__sum'] or 0.0
-
-                if prev_total_revenue == 0:
-                    percentage_change = 100.0 if total_revenue > 0 else 0.0
-                else:
-                    percentage_change = ((total_revenue - prev_total_revenue) / prev_total_revenue) * 100
-
-                current_date = start_date
-                revenue_data = []
-                while current_date <= end_date:
-                    next_date = current_date + delta
-                    period_revenue = transactions.filter(date_time__gte=current_date, date_time__lt=next_date).aggregate(Sum('amount'))['amount__sum'] or 0.0
-                    revenue_data.append({
-                        'date': current_date.strftime('%Y-%m-%d'),
-                        'revenue': period_revenue
-                    })
-
-                    current_date = next_date
+            if serializer.validated_data.get('from_date'):
+                return Response(get_dashboard_result('revenue_range_chart', serializer.validated_data), status=status.HTTP_200_OK)
 
-            
-            elif periods == 'monthly':
-                today = datetime.datetime.now()
-                start_date = datetime.datetime(today.year, today.month, 1)
-                # Get the current month's last date
-                if today.month == 12:
-                    end_date = datetime.datetime(today.year+1, 1, 1) - datetime.timedelta(days=1)
-                else:
-                    end_date = datetime.datetime(today.year, today.month+1, 1) - datetime.timedelta(days=1)
-                # Get previous week to calculate percentage
-                if today.month == 1:
-                    prev_start_date = datetime.datetime(today.year-1, 12, 1)
-                else:
-                    prev_start_date = datetime.datetime(today.year, today.month-1, 1)
-                delta = datetime.timedelta(days=7)
-
-
-                transactions = Transactions.objects.filter(date_time__gte=start_date, type='payment', status='completed')
-                total_revenue = transactions.aggregate(Sum('amount'))['amount__sum'] or 0.0
-
-                prev_transactions = Transactions.objects.filter(date_time__gte=prev_start_date, date_time__lt=start_date, status='completed')
-                prev_total_revenue = prev_transactions.aggregate(Sum('amount'))['amount__sum'] or 0.0
-
-                if prev_total_revenue == 0:
-                    percentage_change = 100.0 if total_revenue > 0 else 0.0
-                else:
-                    percentage_change = ((total_revenue - prev_total_revenue) / prev_total_revenue) * 100
-
-                current_date = start_date
-                revenue_data = []
-                while current_date <= end_date:
-                    next_date = current_date + delta
-                    period_revenue = transactions.filter(date_time__gte=current_date, date_time__lt=next_date).aggregate(Sum('amount'))['amount__sum'] or 0.0
-                    revenue_data.append({
-                        'week_start': current_date.strftime('%Y-%m-%d'),
-                        'week_end': (next_date-datetime.timedelta(days=1)).strftime('%Y-%m-%d'),
-                        'revenue': period_revenue
-                    })
-                    current_date = next_date
-    
-            elif periods == 'yearly':
-                today = datetime.datetime.now()
-                start_date = datetime.datetime(today.year, 1, 1)
-                end_date = datetime.datetime(today.year, 12, 31)
-                prev_start_date = datetime.datetime(today.year-1, 1, 1)
-
-                transactions = Transactions.objects.filter(date_time__gte=start_date, type='payment', status='completed')
-                total_revenue = transactions.aggregate(Sum('amount'))['amount__sum'] or 0.0
-
-                prev_transactions = Transactions.objects.filter(date_time__gte=prev_start_date, date_time__lt=start_date, type='payment', status='completed')
-                prev_total_revenue = prev_transactions.aggregate(Sum('amount'))['amount__sum'] or 0.0
-
-                if prev_total_revenue == 0:
-                    percentage_change = 100.0 if total_revenue > 0 else 0.0
-                else:
-                    percentage_change = ((total_revenue - prev_total_revenue) / prev_total_revenue) * 100
-
-                current_date = start_date
-                revenue_data = []
-                while current_date <= end_date:
-                    # Get next month's first date
-                    if current_date.month == 12:
-                        next_date = datetime.datetime(current_date.year+1, 1, 1)
-                    else:
-                        next_date = datetime.datetime(current_date.year, current_date.month+1, 1)
-
-                    period_revenue = transactions.filter(date_time__gte=current_date, date_time__lt=next_date).aggregate(Sum('amount'))['amount__sum'] or 0.0
-                    revenue_data.append({
-                        'month': current_date.strftime('%Y-%m'),
-                        'revenue': period_revenue
-                    })
-                    current_date = next_date
-    
-            data = {
-                'periods': periods,
-                'total_revenue': total_revenue,
-                'percentage_change': percentage_change,
-                'revenue_data': revenue_data,
-            }
-            return Response(data, status=status.HTTP_200_OK)
+            return Response(get_dashboard_result('revenue_growth_chart', {'periods': serializer.validated_data['periods']}), status=status.HTTP_200_OK)
         return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class ActivityTimelineView(APIView):
+    """
+    Creations and updates of professionals, materials, events, books and users, newest first.
+    Keyset paginated: follow `next` to scroll back as far as the log goes.
+    """
     permission_classes = [IsAuthenticatedAndAdmin]
 
     def get(self, request):
-        activities = []
-
-        professionals = Professionals.objects.all().order_by('-created_on')[:10]
-        materials = Materials.objects.all().order_by('-created_on')[:10]
-        events = Events.objects.all().order_by('-created_on')[:10]
-        books = Books.objects.all().order_by('-created_on')[:10]
-        users = MobileUsers.objects.all().order_by('-created_on')[0:10]
-
-        for professional in professionals:
-            activities.append({
-                "type": "professional",
-                "data": ProfessionalsActivitySerializer(professional).data,
-                "created_on": professional.created_on
-            })
-
-        for material in materials:
-            activities.append({
-                "type": "material",
-                "data": MaterialsActivitySerializer(material).data,
-                "created_on": material.created_on
-            })
-
-        for event in events:
-            activities.append({
-                "type": "event",
-                "data": EventsActivitySerializer(event).data,
-                "created_on": event.created_on
-            })
-
-        for book in books:
-            activities.append({
-                "type": "book",
-                "data": BooksActivitySerializer(book).data,
-                "created_on": book.created_on
-            })
-
-        for user in users:
-            activities.append({
-                "type": "user",
-                "data": MobileUsersActivitySerializer(user).data,
-                "created_on": user.created_on
-            })
-
-        # Sorting activities by created_on date
-        activities.sort(key=lambda x: x['created_on'], reverse=True)
-
-        return Response(activities, status=status.HTTP_200_OK)
+        pagination = ActivityTimelinePagination()
+        params = {'page_size': pagination.get_page_size(request)}
+        if request.query_params.get(pagination.cursor_query_param):
+            params['cursor'] = request.query_params[pagination.cursor_query_param]
+
+        page = get_dashboard_result('activity_timeline', params)
+        next_link = replace_query_param(request.build_absolute_uri(), pagination.cursor_query_param, page['cursor']) if page['cursor'] else None
+
+        return Response({'next': next_link, 'results': page['results']}, status=status.HTTP_200_OK)
     
 
 class MaterialsDistributionView(APIView):
@@ -970,33 +842,121 @@ class MaterialsDistributionView(APIView):
     permission_classes = [IsAuthenticatedAndAdmin]
 
     def get(self, request):
-        total_count = Materials.objects.count()
-        electricals_count = Materials.objects.filter(type='Electricals').count()
-        building_materials_count = Materials.objects.filter(type='Building Materials').count()
-        others_count = total_count - (electricals_count + building_materials_count)
-
-        if total_count > 0:
-            electricals_percentage = (electricals_count / total_count) * 100
-            building_materials_percentage = (building_materials_count / total_count) * 100
-            others_percentage = (others_count / total_count) * 100
-        else:
-            electricals_percentage = 0
-            building_materials_percentage = 0
-            others_percentage = 0
-
-        data = {
-            'total_count': total_count,
-            'electricals_count': electricals_count,
-            'electricals_percentage': electricals_percentage,
-            'building_materials_count': building_materials_count,
-            'building_materials_percentage': building_materials_percentage,
-            'others_count': others_count,
-            'others_percentage': others_percentage
-        }
-
-        return Response(data, status=status.HTTP_200_OK)
+        return Response(get_dashboard_result('materials_distribution'), status=status.HTTP_200_OK)
     
 
+class DistributionView(APIView):
+    """
+    API endpoint that returns the distribution of a categorical column (eg: materials.type,
+    professionals.location), optionally limited to the `top` values with the rest as 'others'.
+    """
+
+    permission_classes = [IsAuthenticatedAndAdmin]
+
+    def get(self, request):
+        serializer = DistributionSerializer(data=request.query_params)
+        if serializer.is_valid():
+            return Response(get_dashboard_result('distribution', serializer.validated_data), status=status.HTTP_200_OK)
+
+        return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionAnalyticsView(APIView):
+    """
+    Ad-hoc transaction reports computed in memory on NumPy columns of the transactions:
+    1. breakdown -> count, sum, mean, min, max and percentiles of the amounts, grouped by
+       type and/or status (group_by) and day, week or month (granularity)
+    2. series -> payments, refunds, refund ratio and a moving average (window) per bucket
+       of a from_date/to_date range
+    3. cohorts -> users by month of their first transaction, and how many came back each month after
+
+    optional filters: from_date, to_date, type, status
+    """
+
+    permission_classes = [IsAuthenticatedAndAdmin]
+
+    def get(self, request):
+        serializer = TransactionAnalyticsSerializer(data=request.query_params)
+        if serializer.is_valid():
+            return Response(get_dashboard_result('transaction_analytics', serializer.validated_data), status=status.HTTP_200_OK)
+
+        return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DashboardSummaryView(APIView):
+    """
+    API endpoint computing the requested dashboard widgets (all by default) in one call,
+    concurrently, with an ETag: a client sending it back in If-None-Match gets a 304
+    without any widget being computed while the underlying tables are unchanged.
+
+    optional params: widgets (comma separated), months, periods, page_size
+    """
+
+    permission_classes = [IsAuthenticatedAndAdmin]
+
+    def get(self, request):
+        serializer = DashboardSummarySerializer(data=request.query_params)
+        if serializer.is_valid():
+            widgets = serializer.validated_data.pop("widgets")
+            params = serializer.validated_data
+
+            etag = dashboard_etag(widgets, params)
+            if etag in request.headers.get("If-None-Match", ""):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = Response(compute_dashboard(widgets, params), status=status.HTTP_200_OK)
+
+            response["ETag"] = etag
+            return response
+
+        return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DashboardStreamView(View):
+    """
+    Server-Sent Events stream pushing the dashboard changes as they happen, instead of polling
+    every widget: a 'snapshot' event, then 'counters' (counter deltas), 'revenue' (revenue rollup
+    deltas) and 'activity' (new activity log entries) events, and 'resync' when the client
+    should reload everything. Served asynchronously, an idle stream holds no worker thread.
+
+    EventSource can't send headers, the JWT access token can be passed in the `token` param.
+    optional params: channels (comma separated, all by default)
+    """
+
+    def authenticate(self, request):
+        authentication = JWTAuthentication()
+        try:
+            raw_token = request.GET.get("token")
+            if raw_token:
+                return authentication.get_user(authentication.get_validated_token(raw_token))
+
+            user_and_token = authentication.authenticate(request)
+            return user_and_token[0] if user_and_token else None
+        except (AuthenticationFailed, InvalidToken):
+            return None
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({"detail": "The live stream is only served by the ASGI application"}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        user = await sync_to_async(self.authenticate)(request)
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=status.HTTP_401_UNAUTHORIZED)
+        if not user.is_superuser:
+            return JsonResponse({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+        channels = [channel.strip() for channel in request.GET.get("channels", ",".join(CHANNELS)).split(",") if channel.strip()]
+        unknown = [channel for channel in channels if channel not in CHANNELS]
+        if unknown or not channels:
+            return JsonResponse({"detail": {"channels": [f"Unknown channels: {', '.join(unknown)}" if unknown else "This field may not be blank."]}}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(event_stream(channels, lambda: sync_to_async(live_snapshot)(channels)), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Stops nginx from buffering the events
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 # NOTIFICATIONS MODULE APIS *******
 class NotificationsFCMHTTPListCreateView(APIView):
     permission_classes = [IsAuthenticatedAndAdmin]
@@ -1027,7 +987,7 @@ class NotificationsFCMHTTPListCreateView(APIView):
                     filters &= Q(recipient=recipient)
 
                 if search:
-                    filters &= Q(title__icontains=search) | Q(body__icontains=search)
+                    filters &= search_filter(Notifications, search)
 
                 notifications = Notifications.objects.filter(filters)
 
@@ -1040,39 +1000,37 @@ class NotificationsFCMHTTPListCreateView(APIView):
 
     def post(self, request):
         """
-        This API sends push notifications to users with an FCM token if the status is 'send'. 
+        This API queues push notifications for users with an FCM token if the status is 'send',
+        a background worker delivers it (pending -> sending -> sent/failed).
         If the status is 'pending', it adds the notification to the Notifications table for later sending.
+        If 'scheduled_for' is in the future, the notification is sent (and repeated, see 'recurrence') by the scheduler.
         """
 
         serializer = NotificationsCreateSerializer(data=request.data)
         if serializer.is_valid():
 
+            scheduled_for = serializer.validated_data.get("scheduled_for")
+            if scheduled_for and scheduled_for > timezone.now():
+                notification = serializer.save(status="pending")
+                return Response({"detail": "Notification scheduled successfully", "id": notification.id}, status=status.HTTP_201_CREATED)
+
             if serializer.validated_data["status"] != "pending":
 
-                title = serializer.validated_data['title']
-                body = serializer.validated_data['body']
                 recipient = serializer.validated_data['recipient']
+                registered_from = serializer.validated_data.get('registered_from')
+                registered_to = serializer.validated_data.get('registered_to')
 
-                recipient_tokens = get_recipient_fcm_tokens(recipient)
-
-                if recipient_tokens:
+                if has_recipients(recipient, registered_from, registered_to):
                     """
                     We need to send the image url to firebase
                     so we are saving notifaction first before
-                    sending it.
+                    queueing it.
                     """
-                    notification = serializer.save()
-                    image = request.build_absolute_uri(notification.image.url)
-
-                    response = send_fcm_notification(recipient_tokens, title, body, image)
+                    notification = serializer.save(status="pending")
+                    image = request.build_absolute_uri(notification.payload_image.url)
 
-                    if response.status_code != 200:
-
-                        notification.status = "failed"
-                        notification.save()
-
-                        return Response({"detail": response.json()}, status=response.status_code)
-                    return Response({"detail": "Notification sent successfully!"}, status=status.HTTP_200_OK)
+                    enqueue_notification(notification, image)
+                    return Response({"detail": "Notification queued for sending", "id": notification.id}, status=status.HTTP_202_ACCEPTED)
                     
                 return Response({"detail": "No user found; notification cannot be sent"}, status=status.HTTP_400_BAD_REQUEST)
             
@@ -1105,26 +1063,23 @@ class NotificationsFCMHTTPRetrieveUpdateDeleteView(APIView):
         serializer = NotificationsRetrieveUpdateSerializer(notification, data=request.data)
         if serializer.is_valid():
 
+            scheduled_for = serializer.validated_data.get("scheduled_for")
+            if scheduled_for and scheduled_for > timezone.now():
+                serializer.save(status="pending")
+                return Response({"detail": "Notification scheduled successfully"}, status=status.HTTP_200_OK)
+
             if serializer.validated_data["status"] == "sent":
 
-                title = serializer.validated_data['title']
-                body = serializer.validated_data['body']
                 recipient = serializer.validated_data['recipient']
+                registered_from = serializer.validated_data.get('registered_from')
+                registered_to = serializer.validated_data.get('registered_to')
 
-                recipient_tokens = get_recipient_fcm_tokens(recipient)
-                if recipient_tokens:
-                    image = request.build_absolute_uri(notification.image.url)
-                    response = send_fcm_notification(recipient_tokens, title, body, image)
+                if has_recipients(recipient, registered_from, registered_to):
+                    notification = serializer.save(status="pending")
+                    image = request.build_absolute_uri(notification.payload_image.url)
 
-                    if response.status_code != 200:
-
-                        notification.status = "failed"
-                        notification.save()
-
-                        return Response({"detail": response.json()}, status=response.status_code)
-                    
-                    serializer.save()
-                    return Response({"detail": "Notification sent and updated successfully!"}, status=status.HTTP_200_OK)
+                    enqueue_notification(notification, image)
+                    return Response({"detail": "Notification updated and queued for sending", "id": notification.id}, status=status.HTTP_202_ACCEPTED)
                     
                 serializer.save()
                 return Response({"detail": "Notification updated sucessfully but no users found"}, status=status.HTTP_200_OK)
@@ -1132,4 +1087,25 @@ class NotificationsFCMHTTPRetrieveUpdateDeleteView(APIView):
             serializer.save()
             return Response({"detail": "Notification updated successfully!"}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response({"detail": serializer.errors}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        return Response({"detail": serializer.errors}, status=status.HTTP_404_NOT_FOUND)
+
+
+# SEARCH API'S *******
+class SearchView(APIView):
+    """
+    Best matches of `q` in one entity, ranked by relevance (full-text index on SQLite):
+    every word of `q` must start a word of the entity's searched fields.
+
+    params: entity (professionals, books, events, materials, mobileusers, transactions, notifications), q, limit
+    """
+
+    permission_classes = [IsAuthenticatedAndAdmin]
+
+    def get(self, request):
+        serializer = SearchSerializer(data=request.query_params)
+        if serializer.is_valid():
+            model = SEARCH_ENTITIES[serializer.validated_data["entity"]]
+            results = search_results(model, serializer.validated_data["q"], serializer.validated_data["limit"])
+            return Response({"results": results}, status=status.HTTP_200_OK)
+
+        return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,471 @@
+import datetime
+import threading
+from collections import Counter
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+# Local imports
+from core.models import Transactions
+from core.apis.cache_versions import get_model_version
+from core.apis.rollups import revenue_groups
+from core.apis.timeseries import iter_buckets, local_date
+
+# Third party imports
+import numpy as np
+
+# Version of Transactions bumped by updates and deletes only, which the columns can't apply incrementally
+REWRITES = 'rewrites'
+GROUP_BY_CHOICES = ('type', 'status')
+LOAD_BATCH_SIZE = 50000
+# Past this many key combinations groups are found by sorting instead of a dense bincount
+DENSE_GROUPS_LIMIT = 1 << 24
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def day_number(date):
+    return date.toordinal() - EPOCH_ORDINAL
+
+def day_date(number):
+    return datetime.date.fromordinal(int(number) + EPOCH_ORDINAL)
+
+def month_numbers(days):
+    """
+    Months since 1970-01 of an array of day numbers.
+    """
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+
+def bucket_days(days, granularity):
+    """
+    Day number of the bucket start of each day, weeks start on Monday like timeseries.bucket_start.
+    """
+    if granularity == 'week':
+        # 1970-01-01 was a Thursday
+        return days - (days + 3) % 7
+
+    if granularity == 'month':
+        return month_numbers(days).astype('datetime64[M]').astype('datetime64[D]').astype(np.int32)
+
+    return days
+
+
+class Dictionary:
+    """
+    Dictionary encoding of a string column: each distinct value is stored as a small integer code.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, values, dtype):
+        for value in set(values) - self.codes.keys():
+            self.codes[value] = len(self.values)
+            self.values.append(value)
+
+        return np.fromiter((self.codes[value] for value in values), dtype, len(values))
+
+
+class Column:
+    """
+    Growable NumPy array. Appending never touches the rows already handed out by view(),
+    so a snapshot stays valid while the store keeps loading.
+    """
+
+    def __init__(self, dtype, capacity=1024):
+        self.buffer = np.empty(capacity, dtype)
+        self.size = 0
+
+    def extend(self, values):
+        end = self.size + len(values)
+        if end > len(self.buffer):
+            buffer = np.empty(max(end, 2 * len(self.buffer)), self.buffer.dtype)
+            buffer[:self.size] = self.buffer[:self.size]
+            self.buffer = buffer
+
+        self.buffer[self.size:end] = values
+        self.size = end
+
+    def view(self):
+        return self.buffer[:self.size]
+
+
+class TransactionColumns:
+    """
+    Read-only columns of the transactions at one point in time, what the reports run on:
+    day numbers (in TIME_ZONE), type, status and user codes, amounts.
+    """
+
+    def __init__(self, days, types, statuses, users, amounts, type_values, status_values, user_count):
+        self.days = days
+        self.types = types
+        self.statuses = statuses
+        self.users = users
+        self.amounts = amounts
+        self.values = {'type': type_values, 'status': status_values}
+        self.user_count = user_count
+        self._amount_order = None
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def codes(self, name):
+        return self.types if name == 'type' else self.statuses
+
+    def amount_order(self):
+        """
+        Row indexes by ascending amount, sorted once per snapshot and shared by every percentile query.
+        """
+        if self._amount_order is None:
+            self._amount_order = np.argsort(self.amounts, kind='stable')
+        return self._amount_order
+
+    def mask(self, from_date=None, to_date=None, type=None, status=None):
+        """
+        Boolean mask of the rows matching the filters, None when nothing is filtered out.
+        """
+        mask = None
+        conditions = []
+        if from_date:
+            conditions.append(lambda: self.days >= day_number(from_date))
+        if to_date:
+            conditions.append(lambda: self.days <= day_number(to_date))
+        for name, value in (('type', type), ('status', status)):
+            if value:
+                code = self.values[name].index(value) if value in self.values[name] else -1
+                conditions.append(lambda name=name, code=code: self.codes(name) == code)
+
+        for condition in conditions:
+            mask = condition() if mask is None else mask & condition()
+        return mask
+
+
+class TransactionStore:
+    """
+    Transactions held in memory as NumPy columns (about 18 bytes a row, per process).
+
+    New rows are appended from the high-water mark, the largest id loaded (ids only grow).
+    Updates and deletes bump the 'rewrites' version of Transactions and the next refresh
+    reloads everything, they are rare next to the inserts.
+    """
+    COLUMNS = {'days': np.int32, 'types': np.int8, 'statuses': np.int8, 'users': np.int32, 'amounts': np.float64}
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset(None)
+
+    def reset(self, rewrite_version):
+        self.columns = {name: Column(dtype) for name, dtype in self.COLUMNS.items()}
+        self.dictionaries = {'types': Dictionary(), 'statuses': Dictionary(), 'users': Dictionary()}
+        self.high_water_mark = 0
+        self.version = None
+        self.rewrite_version = rewrite_version
+        self.current = None
+
+    def append(self, rows):
+        ids, days, types, statuses, users, amounts = zip(*rows)
+        self.columns['days'].extend(np.fromiter((day.toordinal() - EPOCH_ORDINAL for day in days), np.int32, len(days)))
+        self.columns['types'].extend(self.dictionaries['types'].encode(types, np.int8))
+        self.columns['statuses'].extend(self.dictionaries['statuses'].encode(statuses, np.int8))
+        self.columns['users'].extend(self.dictionaries['users'].encode(users, np.int32))
+        self.columns['amounts'].extend(np.array(amounts, np.float64))
+        self.high_water_mark = ids[-1]
+
+    def refresh(self):
+        """
+        Bring the columns up to date with the table, returns the number of rows loaded.
+        Costs one cache read while Transactions is unchanged.
+        """
+        with self.lock:
+            version = get_model_version(Transactions)
+            if version == self.version:
+                return 0
+
+            rewrite_version = get_model_version(Transactions, REWRITES)
+            if rewrite_version != self.rewrite_version:
+                self.reset(rewrite_version)
+
+            loaded = 0
+            rows = (
+                Transactions.objects.annotate(day=TruncDate('date_time', tzinfo=timezone.get_current_timezone()))
+                .order_by('id')
+                .values_list('id', 'day', 'type', 'status', 'user_involved', 'amount')
+            )
+            while True:
+                batch = list(rows.filter(id__gt=self.high_water_mark)[:LOAD_BATCH_SIZE])
+                if not batch:
+                    break
+                self.append(batch)
+                loaded += len(batch)
+
+            self.version = version
+            if loaded:
+                self.current = None
+            return loaded
+
+    def snapshot(self):
+        with self.lock:
+            if self.current is None:
+                self.current = TransactionColumns(
+                    self.columns['days'].view(),
+                    self.columns['types'].view(),
+                    self.columns['statuses'].view(),
+                    self.columns['users'].view(),
+                    self.columns['amounts'].view(),
+                    list(self.dictionaries['types'].values),
+                    list(self.dictionaries['statuses'].values),
+                    len(self.dictionaries['users'].values),
+                )
+            return self.current
+
+
+_store = TransactionStore()
+
+def get_transaction_columns():
+    _store.refresh()
+    return _store.snapshot()
+
+
+# REPORTS *******
+def combine_keys(keys):
+    """
+    Fold integer key arrays into one int64 key, returns (combined, decode, size) where
+    decode(combined values) gives back one array per key and size bounds the combined values.
+    """
+    combined = np.zeros(len(keys[0]) if keys else 0, np.int64)
+    radices = []
+    for key in keys:
+        low = int(key.min()) if len(key) else 0
+        size = int(key.max()) - low + 1 if len(key) else 1
+        combined = combined * size + (key - low)
+        radices.append((low, size))
+
+    def decode(values):
+        decoded = []
+        for low, size in reversed(radices):
+            values, remainder = np.divmod(values, size)
+            decoded.append(remainder + low)
+        return decoded[::-1]
+
+    size = 1
+    for _, radix in radices:
+        size *= radix
+    return combined, decode, size
+
+def grouped_amounts(columns, keys, mask, percentiles):
+    """
+    count, sum, mean, min, max and percentiles of the amounts per distinct combination of `keys`.
+    Returns (group keys, stats), each an array per group.
+    """
+    if not keys:
+        keys = [np.zeros(len(columns), np.int8)]
+    combined, decode, size = combine_keys(keys)
+    selected = combined if mask is None else combined[mask]
+    amounts = columns.amounts if mask is None else columns.amounts[mask]
+
+    if size <= DENSE_GROUPS_LIMIT:
+        counts = np.bincount(selected, minlength=size)
+        sums = np.bincount(selected, weights=amounts, minlength=size)
+        groups = np.flatnonzero(counts)
+        counts, sums = counts[groups], sums[groups]
+        lookup = np.full(size, -1, np.int64)
+        lookup[groups] = np.arange(len(groups))
+        group_of = lambda keys: lookup[keys]
+    else:
+        groups, inverse = np.unique(selected, return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=amounts)
+        group_of = lambda keys: np.searchsorted(groups, keys)
+
+    # Amounts ordered by group then amount: the snapshot's amount order regrouped with a stable
+    # (radix for few groups) sort, cheaper than sorting the amounts again on every query
+    order = columns.amount_order()
+    if mask is not None:
+        order = order[mask[order]]
+    group_ids = group_of(combined[order])
+    group_ids = group_ids.astype(np.uint16 if len(groups) <= 1 << 16 else np.int64)
+    sorted_amounts = columns.amounts[order[np.argsort(group_ids, kind='stable')]]
+
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+    stats = {
+        'count': counts,
+        'sum': sums,
+        'mean': sums / np.maximum(counts, 1),
+        'min': sorted_amounts[starts] if len(groups) else sums,
+        'max': sorted_amounts[starts + counts - 1] if len(groups) else sums,
+    }
+    for percentile in percentiles:
+        # Linear interpolation, np.percentile's default
+        position = starts + (counts - 1) * (percentile / 100)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        stats[percentile] = sorted_amounts[low] + (sorted_amounts[high] - sorted_amounts[low]) * (position - low) if len(groups) else sums
+
+    return decode(groups), stats
+
+def breakdown(columns, group_by=(), granularity=None, percentiles=(50, 90, 99), **filters):
+    """
+    Amount statistics of the transactions per type and/or status and/or day, week or month.
+    """
+    keys = [columns.codes(name) for name in group_by]
+    if granularity:
+        keys.append(bucket_days(columns.days, granularity))
+
+    group_keys, stats = grouped_amounts(columns, keys, columns.mask(**filters), percentiles)
+
+    rows = []
+    for index in range(len(stats['count'])):
+        row = {name: columns.values[name][group_keys[position][index]] for position, name in enumerate(group_by)}
+        if granularity:
+            row['bucket'] = day_date(group_keys[len(group_by)][index])
+        row.update({
+            'count': int(stats['count'][index]),
+            'sum': float(stats['sum'][index]),
+            'mean': float(stats['mean'][index]),
+            'min': float(stats['min'][index]),
+            'max': float(stats['max'][index]),
+            'percentiles': {f"p{percentile:g}": float(stats[percentile][index]) for percentile in percentiles},
+        })
+        rows.append(row)
+
+    return sorted(rows, key=lambda row: tuple(row[name] for name in group_by) + ((row['bucket'],) if granularity else ()))
+
+def series(columns, from_date, to_date, granularity, window=None, **filters):
+    """
+    Payments, refunds, refund ratio (refunded / paid amount) and count for every bucket from
+    `from_date` to `to_date`, with a trailing `window` bucket moving average of the payments.
+    """
+    mask = columns.mask(from_date=from_date, to_date=to_date, **filters)
+    starts = np.array([day_number(bucket) for bucket in iter_buckets(from_date, to_date, granularity)], np.int32)
+    days = columns.days if mask is None else columns.days[mask]
+    types = columns.types if mask is None else columns.types[mask]
+    amounts = columns.amounts if mask is None else columns.amounts[mask]
+    buckets = np.searchsorted(starts, days, side='right') - 1
+
+    def type_sum(value):
+        code = columns.values['type'].index(value) if value in columns.values['type'] else -1
+        return np.bincount(buckets, weights=np.where(types == code, amounts, 0.0), minlength=len(starts))
+
+    payments = type_sum('payment')
+    refunds = type_sum('refund')
+    counts = np.bincount(buckets, minlength=len(starts))
+
+    moving_average = None
+    if window:
+        sums = np.convolve(payments, np.ones(window))[:len(payments)]
+        moving_average = sums / np.minimum(np.arange(1, len(payments) + 1), window)
+
+    return [
+        {
+            'bucket': day_date(start),
+            'payments': float(payments[index]),
+            'refunds': float(refunds[index]),
+            'refund_ratio': float(refunds[index] / payments[index]) if payments[index] else None,
+            'count': int(counts[index]),
+            **({'moving_average': float(moving_average[index])} if window else {}),
+        }
+        for index, start in enumerate(starts)
+    ]
+
+def cohorts(columns, months=12, **filters):
+    """
+    Users grouped by the month of their first transaction, with the number of them who
+    transacted again 0, 1 ... `months` - 1 months later.
+    """
+    mask = columns.mask(**filters)
+    users = columns.users if mask is None else columns.users[mask]
+    user_months = month_numbers(columns.days if mask is None else columns.days[mask])
+    if not len(users):
+        return []
+
+    first_months = np.full(columns.user_count, np.iinfo(np.int32).max, np.int32)
+    np.minimum.at(first_months, users, user_months)
+    cohort_months = first_months[users]
+    offsets = user_months - cohort_months
+
+    kept = offsets < months
+    offsets, users = offsets[kept], users[kept]
+
+    # A user is in one cohort, so the distinct (user, offset) pairs are all it takes: a dense
+    # flag per pair instead of sorting the rows, then the flagged pairs counted per cohort
+    active = np.zeros(columns.user_count * months, bool)
+    active[users.astype(np.int64) * months + offsets] = True
+    pairs = np.flatnonzero(active)
+    pair_users, pair_offsets = np.divmod(pairs, months)
+
+    low = int(cohort_months.min())
+    cells = (first_months[pair_users] - low).astype(np.int64) * months + pair_offsets
+    counts = np.bincount(cells, minlength=(int(cohort_months.max()) - low + 1) * months).reshape(-1, months)
+
+    return [
+        {
+            'cohort': np.datetime64(low + index, 'M').astype(datetime.date),
+            'users': int(row[0]),
+            'active_users': row.tolist(),
+        }
+        for index, row in enumerate(counts)
+        if row[0]
+    ]
+
+REPORTS = {'breakdown': breakdown, 'series': series, 'cohorts': cohorts}
+
+def transaction_analytics(params):
+    """
+    Run one of the REPORTS on the up to date columns, `params` are the report arguments plus 'report'.
+    """
+    params = dict(params)
+    report = params.pop('report')
+    columns = get_transaction_columns()
+    return {'report': report, 'total_rows': len(columns), 'results': REPORTS[report](columns, **params)}
+
+
+# VERIFICATION *******
+def orm_percentile(queryset, count, percentile):
+    position = (count - 1) * percentile / 100
+    low, high = int(np.floor(position)), int(np.ceil(position))
+    ordered = queryset.order_by('amount').values_list('amount', flat=True)
+    low_value, high_value = ordered[low], ordered[high]
+    return low_value + (high_value - low_value) * (position - low)
+
+def check_transaction_analytics(tolerance=1e-6, percentiles=(50, 90, 99)):
+    """
+    Differences between the reports and the same figures computed by the ORM, as messages.
+    """
+    columns = get_transaction_columns()
+    mismatches = []
+
+    def compare(label, value, expected):
+        if value is None or expected is None or abs(value - expected) > tolerance * max(1.0, abs(expected)):
+            mismatches.append(f"{label}: {value} (expected {expected})")
+
+    # Daily sums and counts, against the grouped query the revenue rollups are built from
+    expected = {(group['day'], group['type'], group['status']): group for group in revenue_groups(Transactions.objects.all())}
+    computed = {(row['bucket'], row['type'], row['status']): row for row in breakdown(columns, ('type', 'status'), 'day', percentiles=())}
+    for key in sorted(expected.keys() | computed.keys()):
+        label = " ".join(str(part) for part in key)
+        compare(f"{label} count", computed.get(key, {}).get('count'), expected.get(key, {}).get('count'))
+        compare(f"{label} sum", computed.get(key, {}).get('sum'), expected.get(key, {}).get('amount'))
+
+    # Statistics and percentiles per type and status
+    for row in breakdown(columns, ('type', 'status'), percentiles=percentiles):
+        queryset = Transactions.objects.filter(type=row['type'], status=row['status'])
+        aggregates = queryset.aggregate(count=Count('id'), mean=Avg('amount'), min=Min('amount'), max=Max('amount'), sum=Sum('amount'))
+        label = f"{row['type']} {row['status']}"
+        for name in ('count', 'mean', 'min', 'max', 'sum'):
+            compare(f"{label} {name}", row[name], aggregates[name])
+        for percentile in percentiles:
+            compare(f"{label} p{percentile:g}", row['percentiles'][f"p{percentile:g}"], orm_percentile(queryset, aggregates['count'], percentile))
+
+    # Cohort sizes, users by the month of their first transaction
+    first_months = (
+        Transactions.objects.values('user_involved')
+        .annotate(first_month=Min(TruncMonth('date_time', tzinfo=timezone.get_current_timezone())))
+        .values_list('first_month', flat=True)
+        .order_by()
+    )
+    expected_cohorts = Counter(local_date(month) for month in first_months)
+    computed_cohorts = {row['cohort']: row['users'] for row in cohorts(columns, months=1)}
+    for month in sorted(expected_cohorts.keys() | computed_cohorts.keys()):
+        compare(f"cohort {month:%Y-%m} users", computed_cohorts.get(month), expected_cohorts.get(month))
+
+    return mismatches
@@ -0,0 +1,161 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from django.conf import settings
+from django.db.models import Count
+
+# Local imports
+from core.models import Professionals
+from core.apis.cache_versions import get_model_version
+
+# Fields of the professionals the autocomplete suggests values of
+AUTOCOMPLETE_FIELDS = ('name', 'expertise', 'location')
+
+WORD_START = re.compile(r'\b\w')
+
+# Prefixes matching more entries than this (the first keystrokes) keep their suggestions until the next change
+CACHED_MATCHES = 1000
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+def word_keys(value):
+    """
+    Keys a value is found by: its normalized text from the start of each of its words,
+    'Electrical & Plumbing' -> 'electrical & plumbing', 'plumbing'.
+    """
+    text = normalize(value)
+    return {text[match.start():] for match in WORD_START.finditer(text)}
+
+
+class PrefixIndex:
+    """
+    Distinct values of a field with their occurrence counts, found by the prefix of any of their words.
+
+    `entries` is a sorted list of (key, value), one per word of each value: the keys starting
+    with a prefix are contiguous, two bisects find them without scanning the others.
+    """
+
+    def __init__(self, counts):
+        self.counts = {value: count for value, count in counts.items() if value and count > 0}
+        self.entries = sorted((key, value) for value in self.counts for key in word_keys(value))
+        self.cache = {}
+
+    def add(self, value, delta):
+        """
+        Count `delta` more (or fewer) occurrences of `value`, indexing or dropping it as it appears or disappears.
+        """
+        if not value or not delta:
+            return
+
+        self.cache.clear()
+        count = self.counts.get(value, 0) + delta
+        if count > 0:
+            if value not in self.counts:
+                for key in word_keys(value):
+                    bisect.insort(self.entries, (key, value))
+            self.counts[value] = count
+
+        elif value in self.counts:
+            del self.counts[value]
+            for key in word_keys(value):
+                position = bisect.bisect_left(self.entries, (key, value))
+                if position < len(self.entries) and self.entries[position] == (key, value):
+                    del self.entries[position]
+
+    def complete(self, prefix, limit):
+        """
+        [(value, count)] of the `limit` most frequent values having a word starting with `prefix`.
+        """
+        prefix = normalize(prefix)
+        if (prefix, limit) in self.cache:
+            return self.cache[prefix, limit]
+
+        start = bisect.bisect_left(self.entries, (prefix,))
+        end = bisect.bisect_left(self.entries, (prefix + '\U0010ffff',), start)
+        values = {value for _, value in self.entries[start:end]}
+
+        best = heapq.nsmallest(limit, values, key=lambda value: (-self.counts[value], value.casefold()))
+        suggestions = [(value, self.counts[value]) for value in best]
+        if end - start > CACHED_MATCHES:
+            self.cache[prefix, limit] = suggestions
+        return suggestions
+
+
+class ProfessionalsAutocomplete:
+    """
+    Prefix indexes of the professionals' fields, built from the table on first use.
+
+    Saves and deletes in this process update them right away (see the signals). Writes from
+    other processes are caught every AUTOCOMPLETE_REFRESH_INTERVAL by comparing the model
+    version, and rebuild the indexes: between two checks, suggestions run no query at all.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indexes = None
+        self.version = None
+        self.checked_at = None
+
+    @property
+    def loaded(self):
+        return self.indexes is not None
+
+    def load(self):
+        # Version read first, a write during the load makes the next check reload
+        self.version = get_model_version(Professionals)
+        self.indexes = {
+            field: PrefixIndex(dict(Professionals.objects.values_list(field).annotate(count=Count('id')).order_by()))
+            for field in AUTOCOMPLETE_FIELDS
+        }
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < settings.AUTOCOMPLETE_REFRESH_INTERVAL:
+            return
+
+        if self.indexes is None or get_model_version(Professionals) != self.version:
+            self.load()
+        self.checked_at = now
+
+    def complete(self, prefix, fields=AUTOCOMPLETE_FIELDS, limit=10):
+        """
+        {field: [{'value', 'count'}]} of the values of `fields` having a word starting with `prefix`, most frequent first.
+        """
+        with self.lock:
+            self.refresh()
+            return {
+                field: [{"value": value, "count": count} for value, count in self.indexes[field].complete(prefix, limit)]
+                for field in fields
+            }
+
+    def apply(self, old_values, new_values):
+        """
+        Move one professional's occurrences from `old_values` to `new_values` ({field: value}, None for no professional).
+        """
+        with self.lock:
+            if self.indexes is None:
+                return
+
+            for field, index in self.indexes.items():
+                old_value = old_values and old_values[field]
+                new_value = new_values and new_values[field]
+                if old_value != new_value:
+                    index.add(old_value, -1)
+                    index.add(new_value, 1)
+
+
+professionals_autocomplete = ProfessionalsAutocomplete()
+
+
+def autocomplete_values(instance):
+    return {field: getattr(instance, field) for field in AUTOCOMPLETE_FIELDS}
+
+def stored_autocomplete_values(pk):
+    """
+    Values of the professional as saved, the indexes drop them when a save changes them.
+    """
+    return Professionals.objects.filter(pk=pk).values(*AUTOCOMPLETE_FIELDS).first()
@@ -0,0 +1,36 @@
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+
+def model_version_key(model, scope=None):
+    key = f"model_version:{model._meta.label_lower}"
+    return f"{key}:{scope}" if scope else key
+
+def get_model_version(model, scope=None):
+    """
+    Current version of a model's table, part of the cache keys of anything computed from it.
+    A `scope` is a separate version counting only some writes (eg: 'rewrites', see analytics).
+    """
+    key = model_version_key(model, scope)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock, a version lost from the cache never reuses an old value
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+
+    return version
+
+def get_model_versions(*models):
+    return ".".join(str(get_model_version(model)) for model in models)
+
+def bump_model_version(model, scope=None):
+    """
+    Invalidate every cached result computed from `model`, called on each write to its table.
+
+    The new version is set once the write commits: a reader in between would otherwise cache
+    the rows before the write under the new version. It is a fresh clock value rather than an
+    increment, concurrent bumps never collapse into one.
+    """
+    key = model_version_key(model, scope)
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
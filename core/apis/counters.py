@@ -0,0 +1,98 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+# Local imports
+from core.models import EntityCounter, Materials, MobileUsers, Professionals, Transactions
+from core.apis.cache_versions import bump_model_version
+from core.apis.live import publish_event
+
+ACTIVE_MOBILE_USERS = 'active mobile users'
+
+# Counter name -> rows it counts
+COUNTERS = {
+    Professionals._meta.model_name: lambda: Professionals.objects.all(),
+    Materials._meta.model_name: lambda: Materials.objects.all(),
+    MobileUsers._meta.model_name: lambda: MobileUsers.objects.all(),
+    Transactions._meta.model_name: lambda: Transactions.objects.all(),
+    ACTIVE_MOBILE_USERS: lambda: MobileUsers.objects.filter(is_active=True),
+}
+
+
+def counter_name(model_or_name):
+    return model_or_name if isinstance(model_or_name, str) else model_or_name._meta.model_name
+
+def seed_counter(name):
+    """
+    Create a missing counter from a real count, done once per counter.
+    """
+    counter, _ = EntityCounter.objects.get_or_create(name=name, defaults={"value": COUNTERS[name]().count()})
+    return counter.value
+
+def get_count(model_or_name):
+    name = counter_name(model_or_name)
+    value = EntityCounter.objects.filter(name=name).values_list('value', flat=True).first()
+
+    return seed_counter(name) if value is None else value
+
+def get_counts(*models_or_names):
+    """
+    {name: count} of several counters in one query.
+    """
+    names = [counter_name(model_or_name) for model_or_name in models_or_names]
+    counts = dict(EntityCounter.objects.filter(name__in=names).values_list('name', 'value'))
+
+    return {name: counts[name] if name in counts else seed_counter(name) for name in names}
+
+def increment_counter(model_or_name, delta):
+    if not delta:
+        return
+
+    name = counter_name(model_or_name)
+    if EntityCounter.objects.filter(name=name).update(value=F('value') + delta):
+        publish_event('counters', {"name": name, "delta": delta})
+    else:
+        # First write since deployment, the real count already includes this change
+        publish_event('counters', {"name": name, "value": seed_counter(name)})
+
+def reconcile_counters():
+    """
+    Reset every counter to the real count, returns {name: (stored, actual)} for the counters that drifted.
+    """
+    drifted = {}
+    for name, rows in COUNTERS.items():
+        with transaction.atomic():
+            actual = rows().count()
+            counter, created = EntityCounter.objects.select_for_update().get_or_create(name=name, defaults={"value": actual})
+            if not created and counter.value != actual:
+                drifted[name] = (counter.value, actual)
+                EntityCounter.objects.filter(id=counter.id).update(value=actual)
+                # The cached results showing the counter are keyed on its model's version
+                bump_model_version(rows().model)
+                publish_event('counters', {"name": name, "value": actual})
+
+    return drifted
+
+def list_count(queryset, mode='approx'):
+    """
+    Row count of a list page. 'exact' runs COUNT(*). 'approx' reads the counter of an unfiltered
+    queryset and caches the COUNT(*) of a filtered one per query for LIST_COUNT_CACHE_TIMEOUT,
+    it may lag the latest writes by that much.
+    """
+    if mode == 'exact':
+        return queryset.count()
+
+    name = counter_name(queryset.model)
+    if not queryset.query.where and name in COUNTERS:
+        return get_count(name)
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    key = f"list_count:{name}:{hashlib.sha1(f'{sql}|{params!r}'.encode()).hexdigest()}"
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.LIST_COUNT_CACHE_TIMEOUT)
+
+    return count
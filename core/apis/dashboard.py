@@ -0,0 +1,232 @@
+import datetime
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# Local imports
+from core.models import ActivityLog, Books, DailyRevenueRollup, Events, Materials, MobileUsers, Professionals, Transactions
+from core.apis.analytics import transaction_analytics
+from core.apis.cache_versions import get_model_version
+from core.apis.counters import COUNTERS, get_counts
+from core.apis.distribution import DISTRIBUTIONS, count_by, get_distribution
+from core.apis.paginations import ActivityTimelinePagination
+from core.apis.result_cache import cached_result
+from core.apis.revenue import period_range, previous_period_start, revenue_growth
+from core.apis.rollups import CREATION_MODELS, creation_series
+from core.apis.serializers import ActivityLogSerializer
+from core.apis.timeseries import add_months, fold_series, next_bucket, percentage_change
+
+
+# DASHBOARD WIDGETS *******
+def key_matrix_statistics(params=None):
+    counts = get_counts(Professionals, Materials, MobileUsers, Transactions)
+
+    return {
+        "total_professionals": counts[Professionals._meta.model_name],
+        "total_materials": counts[Materials._meta.model_name],
+        "total_registered_users": counts[MobileUsers._meta.model_name],
+        "total_transactions": counts[Transactions._meta.model_name],
+    }
+
+def professionals_growth_chart(params):
+    months = params["months"]
+    today = timezone.localdate()
+    series, _, _ = creation_series(Professionals, add_months(today.replace(day=1), 1 - months), today, 'month')
+
+    return {
+        "months": months,
+        # Latest month first
+        "professionals_growth_chart": [{'month': month.strftime("%Y-%m"), 'count': count} for month, count in reversed(series)],
+    }
+
+def revenue_growth_chart(params):
+    periods = params["periods"]
+    start_date, end_date, prev_start_date, granularity = period_range(periods, timezone.localdate())
+    series, total_revenue, prev_total_revenue = revenue_growth(start_date, end_date, granularity, prev_start_date)
+
+    if periods == 'weekly':
+        revenue_data = [{'date': day.strftime('%Y-%m-%d'), 'revenue': revenue} for day, revenue in series]
+
+    elif periods == 'monthly':
+        # Days of the month folded into 7 day blocks starting on the 1st
+        revenue_data = [
+            {'week_start': week_start.strftime('%Y-%m-%d'), 'week_end': week_end.strftime('%Y-%m-%d'), 'revenue': revenue}
+            for week_start, week_end, revenue in fold_series(series, 7)
+        ]
+
+    else:
+        revenue_data = [{'month': month.strftime('%Y-%m'), 'revenue': revenue} for month, revenue in series]
+
+    return {
+        'periods': periods,
+        'total_revenue': total_revenue,
+        'percentage_change': percentage_change(total_revenue, prev_total_revenue),
+        'revenue_data': revenue_data,
+    }
+
+def activity_timeline(params):
+    """
+    A page of the timeline (the first one without `cursor`), `cursor` of the result continues it.
+    """
+    pagination = ActivityTimelinePagination()
+    position = pagination.decode_position(params.get("cursor"), ActivityLog)
+    activities = pagination.get_page(ActivityLog.objects.all(), position, page_size=params.get("page_size"))
+
+    return {
+        "cursor": pagination.encode_cursor(pagination.next_position) if pagination.has_next else None,
+        "results": ActivityLogSerializer(activities, many=True).data,
+    }
+
+def materials_distribution(params=None):
+    counts = dict(count_by(Materials, 'type'))
+    total_count = sum(counts.values())
+    electricals_count = counts.get('Electricals', 0)
+    building_materials_count = counts.get('Building Materials', 0)
+    others_count = total_count - (electricals_count + building_materials_count)
+
+    def percentage(count):
+        return (count / total_count) * 100 if total_count > 0 else 0
+
+    return {
+        'total_count': total_count,
+        'electricals_count': electricals_count,
+        'electricals_percentage': percentage(electricals_count),
+        'building_materials_count': building_materials_count,
+        'building_materials_percentage': percentage(building_materials_count),
+        'others_count': others_count,
+        'others_percentage': percentage(others_count),
+    }
+
+
+def growth_chart(params):
+    entity, from_date, to_date, granularity = params["entity"], params["from_date"], params["to_date"], params["granularity"]
+    series, total_count, prev_total_count = creation_series(CREATION_MODELS[entity], from_date, to_date, granularity, previous_period_start(from_date, to_date))
+
+    return {
+        "entity": entity,
+        "from_date": from_date,
+        "to_date": to_date,
+        "granularity": granularity,
+        "total_count": total_count,
+        "percentage_change": percentage_change(total_count, prev_total_count),
+        "growth_chart": range_buckets(series, from_date, to_date, granularity, 'count'),
+    }
+
+def revenue_range_chart(params):
+    from_date, to_date, granularity = params["from_date"], params["to_date"], params["granularity"]
+    series, total_revenue, prev_total_revenue = revenue_growth(from_date, to_date, granularity, previous_period_start(from_date, to_date))
+
+    return {
+        'from_date': from_date,
+        'to_date': to_date,
+        'granularity': granularity,
+        'total_revenue': total_revenue,
+        'percentage_change': percentage_change(total_revenue, prev_total_revenue),
+        'revenue_data': range_buckets(series, from_date, to_date, granularity, 'revenue'),
+    }
+
+def distribution(params):
+    model, column = DISTRIBUTIONS[params["field"]]
+    return {'field': params["field"], **get_distribution(model, column, top=params.get("top"))}
+
+def range_buckets(series, from_date, to_date, granularity, value_name):
+    """
+    Buckets of a from_date/to_date chart, the first and last ones clipped to the range.
+    """
+    return [
+        {
+            'start': max(bucket, from_date).strftime('%Y-%m-%d'),
+            'end': min(next_bucket(bucket, granularity) - datetime.timedelta(days=1), to_date).strftime('%Y-%m-%d'),
+            value_name: value,
+        }
+        for bucket, value in series
+    ]
+
+
+# Result -> (function, tables it is computed from given its params)
+DASHBOARD_RESULTS = {
+    'key_matrix_statistics': (key_matrix_statistics, lambda params: (Professionals, Materials, MobileUsers, Transactions)),
+    'professionals_growth_chart': (professionals_growth_chart, lambda params: (Professionals,)),
+    'revenue_growth_chart': (revenue_growth_chart, lambda params: (Transactions,)),
+    'activity_timeline': (activity_timeline, lambda params: (ActivityLog, Professionals, Materials, Events, Books, MobileUsers)),
+    'materials_distribution': (materials_distribution, lambda params: (Materials,)),
+    'growth_chart': (growth_chart, lambda params: (CREATION_MODELS[params["entity"]],)),
+    'revenue_range_chart': (revenue_range_chart, lambda params: (Transactions,)),
+    'distribution': (distribution, lambda params: (DISTRIBUTIONS[params["field"]][0],)),
+    'transaction_analytics': (transaction_analytics, lambda params: (Transactions,)),
+}
+
+# Widgets of dashboard/summary -> the summary parameters they take, the cache entries are shared with their own endpoints
+DASHBOARD_WIDGETS = {
+    'key_matrix_statistics': (),
+    'professionals_growth_chart': ('months',),
+    'revenue_growth_chart': ('periods',),
+    'activity_timeline': ('page_size',),
+    'materials_distribution': (),
+}
+
+
+def get_dashboard_result(name, params=None):
+    """
+    A dashboard result, from the cache while the tables it is computed from are unchanged.
+    """
+    params = params or {}
+    function, models = DASHBOARD_RESULTS[name]
+
+    return cached_result(name, models(params), params, lambda: function(params))
+
+
+# DASHBOARD SUMMARY *******
+def dashboard_etag(widgets, params):
+    """
+    ETag of a summary, known before computing it: the versions of the tables the widgets read,
+    the parameters and the day (the charts are relative to today).
+    """
+    models = sorted({model for name in widgets for model in DASHBOARD_RESULTS[name][1](params)}, key=lambda model: model._meta.label)
+    versions = [f"{model._meta.label}:{get_model_version(model)}" for model in models]
+    key = "|".join([",".join(widgets), repr(sorted(params.items())), timezone.localdate().isoformat(), *versions])
+
+    return '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+def widget_params(name, params):
+    return {param: params[param] for param in DASHBOARD_WIDGETS[name]}
+
+def compute_widget(name, params):
+    try:
+        return get_dashboard_result(name, widget_params(name, params))
+    finally:
+        # Worker threads open their own connections, close them with the thread's work
+        connections.close_all()
+
+def compute_dashboard(widgets, params, max_workers=None):
+    """
+    Get the widgets concurrently (they read different tables), {widget: data}.
+    """
+    max_workers = min(max_workers or settings.DASHBOARD_MAX_WORKERS, len(widgets))
+    if max_workers <= 1:
+        return {name: get_dashboard_result(name, widget_params(name, params)) for name in widgets}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(compute_widget, name, params) for name in widgets}
+        return {name: future.result() for name, future in futures.items()}
+
+
+# LIVE STREAM *******
+def live_snapshot(channels):
+    """
+    State the deltas of a live stream apply to: every counter, today's revenue rollups and
+    the latest activity entries.
+    """
+    snapshot = {}
+    if 'counters' in channels:
+        snapshot['counters'] = get_counts(*COUNTERS)
+
+    if 'revenue' in channels:
+        snapshot['revenue'] = list(DailyRevenueRollup.objects.filter(day=timezone.localdate()).values('day', 'type', 'status', 'amount', 'count'))
+
+    if 'activity' in channels:
+        snapshot['activity'] = activity_timeline({'page_size': 20})['results']
+
+    return snapshot
@@ -0,0 +1,232 @@
+import datetime
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Local imports
+from core.models import NotificationDispatchJob, NotificationReceipt, Notifications
+from core.apis.inbox import publish_to_inbox
+from core.apis.firebase import FCMSendSummary, FCMUnavailableError, get_invalid_tokens, iter_recipient_fcm_tokens, prune_invalid_tokens, send_fcm_notification
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_notification(notification, image_url=None):
+    """
+    Queue a notification for background delivery, the API no longer sends inside the request.
+    """
+    with transaction.atomic():
+        Notifications.objects.filter(id=notification.id).update(status='pending')
+        notification.status = 'pending'
+        job = NotificationDispatchJob.objects.create(notification=notification, image_url=image_url)
+
+    return job
+
+def lease_expiry(lease_seconds=None):
+    return timezone.now() + datetime.timedelta(seconds=lease_seconds or settings.NOTIFICATION_DISPATCH_LEASE_SECONDS)
+
+def claimable_jobs(now):
+    return Q(status='queued', available_at__lte=now) | Q(status='leased', lease_expires_at__lt=now)
+
+def claim_jobs(worker_id, limit=1, lease_seconds=None):
+    """
+    Lease up to `limit` due jobs to `worker_id`.
+
+    Each job is claimed with a conditional UPDATE, so when several workers race for
+    the same row exactly one of them gets it, on every database backend.
+    Jobs whose lease expired are claimed again, their worker is presumed dead.
+    """
+    now = timezone.now()
+    lease_expires_at = lease_expiry(lease_seconds)
+
+    candidate_ids = NotificationDispatchJob.objects.filter(claimable_jobs(now)).order_by('available_at', 'id').values_list('id', flat=True)[:limit * 4]
+
+    claimed_ids = []
+    for job_id in candidate_ids:
+        claimed = NotificationDispatchJob.objects.filter(claimable_jobs(now), id=job_id).update(
+            status='leased',
+            lease_owner=worker_id,
+            lease_expires_at=lease_expires_at,
+            attempts=F('attempts') + 1,
+            last_edited=now,
+        )
+        if claimed:
+            claimed_ids.append(job_id)
+        if len(claimed_ids) >= limit:
+            break
+
+    return list(NotificationDispatchJob.objects.filter(id__in=claimed_ids, lease_owner=worker_id).select_related('notification'))
+
+def renew_lease(job, worker_id, lease_seconds=None):
+    """
+    Push the lease of a job forward before working on it, the jobs of a claimed batch wait
+    for the ones before them. Returns False if the lease was lost to another worker.
+    """
+    return NotificationDispatchJob.objects.filter(id=job.id, status='leased', lease_owner=worker_id).update(lease_expires_at=lease_expiry(lease_seconds)) == 1
+
+def save_progress(job, worker_id, next_chunk, resume_after_token, pending_tokens=(), lease_seconds=None):
+    """
+    Checkpoint a long running job after a sent chunk and push its lease forward.
+    `pending_tokens` are the tokens of an interrupted chunk left to send.
+    Returns False if the lease was lost to another worker.
+    """
+    return NotificationDispatchJob.objects.filter(id=job.id, status='leased', lease_owner=worker_id).update(
+        lease_expires_at=lease_expiry(lease_seconds),
+        next_chunk=next_chunk,
+        resume_after_token=resume_after_token,
+        pending_tokens=list(pending_tokens),
+    ) == 1
+
+def finish_job(job, worker_id, job_status, notification_status, error=None):
+    """
+    Record the outcome of a job, only if `worker_id` still owns its lease.
+    """
+    with transaction.atomic():
+        finished = NotificationDispatchJob.objects.filter(id=job.id, status='leased', lease_owner=worker_id).update(
+            status=job_status,
+            lease_owner=None,
+            lease_expires_at=None,
+            last_error=error,
+            last_edited=timezone.now(),
+        )
+        if finished:
+            now = timezone.now()
+            notifications = Notifications.objects.filter(id=job.notification_id)
+            if notification_status == 'sent':
+                notifications.update(last_sent_on=now)
+                publish_to_inbox(job.notification)
+
+            # A recurring notification goes back to pending until its next occurrence.
+            notifications.filter(scheduled_for__isnull=True).update(status=notification_status, last_edited=now)
+            notifications.filter(scheduled_for__isnull=False).update(status='pending', last_edited=now)
+
+    return bool(finished)
+
+def defer_job(job, worker_id, delay, error):
+    """
+    Put a job back in the queue for `delay` seconds without using up one of its attempts,
+    it resumes from its last checkpoint (see process_job). Used while the FCM circuit breaker is open.
+    """
+    with transaction.atomic():
+        deferred = NotificationDispatchJob.objects.filter(id=job.id, status='leased', lease_owner=worker_id).update(
+            status='queued',
+            lease_owner=None,
+            lease_expires_at=None,
+            available_at=timezone.now() + datetime.timedelta(seconds=delay),
+            attempts=F('attempts') - 1,
+            last_error=error,
+            last_edited=timezone.now(),
+        )
+        if deferred:
+            Notifications.objects.filter(id=job.notification_id).update(status='pending', last_edited=timezone.now())
+
+    return bool(deferred)
+
+def retry_job(job, worker_id, error):
+    """
+    Put a failed job back in the queue with exponential backoff, or fail it after the last attempt.
+    """
+    if job.attempts >= settings.NOTIFICATION_DISPATCH_MAX_ATTEMPTS:
+        return finish_job(job, worker_id, 'failed', 'failed', error=error)
+
+    delay = settings.NOTIFICATION_DISPATCH_RETRY_DELAY * 2 ** (job.attempts - 1)
+    with transaction.atomic():
+        requeued = NotificationDispatchJob.objects.filter(id=job.id, status='leased', lease_owner=worker_id).update(
+            status='queued',
+            lease_owner=None,
+            lease_expires_at=None,
+            available_at=timezone.now() + datetime.timedelta(seconds=delay),
+            last_error=error,
+            last_edited=timezone.now(),
+        )
+        if requeued:
+            Notifications.objects.filter(id=job.notification_id).update(status='pending', last_edited=timezone.now())
+
+    return bool(requeued)
+
+def record_delivery(job, chunk, summary):
+    """
+    Store the receipt of a sent chunk and prune the tokens FCM reported as dead.
+    """
+    invalid_tokens = get_invalid_tokens(summary)
+    pruned_count = prune_invalid_tokens(invalid_tokens)
+
+    return NotificationReceipt.objects.create(
+        notification_id=job.notification_id,
+        dispatch_job=job,
+        chunk=chunk,
+        success_count=summary.success_count,
+        failure_count=summary.failure_count,
+        failures={result.token: result.error for result in summary.failures},
+        pruned_count=pruned_count,
+    )
+
+def recipient_chunks(job):
+    """
+    (tokens, token to resume after once they are sent) of the recipients a job has left:
+    the pending tokens of an interrupted chunk first, then the recipients after the checkpoint.
+    """
+    notification = job.notification
+    if job.pending_tokens:
+        yield job.pending_tokens, job.resume_after_token
+
+    # Recipients are streamed and sent chunk by chunk, memory stays flat for any audience size.
+    chunks = iter_recipient_fcm_tokens(notification.recipient, start_after=job.resume_after_token, registered_from=notification.registered_from, registered_to=notification.registered_to)
+    for tokens in chunks:
+        yield tokens, tokens[-1]
+
+def process_job(job, worker_id, lease_seconds=None):
+    """
+    Deliver a leased job: pending -> sending -> sent/failed.
+    `lease_seconds` is the lease the worker claimed it with, each checkpoint renews it for as long.
+    """
+    if not renew_lease(job, worker_id, lease_seconds):
+        logger.warning("Dispatch job %s lost its lease before it started, skipping", job.id)
+        return False
+
+    notification = job.notification
+    Notifications.objects.filter(id=notification.id).update(status='sending', last_edited=timezone.now())
+
+    summary = FCMSendSummary()
+    # Counts of the chunks sent before an interruption are in their receipts.
+    sent_before = job.receipts.aggregate(success_count=Coalesce(Sum('success_count'), 0), failure_count=Coalesce(Sum('failure_count'), 0))
+    summary.success_count = sent_before['success_count']
+    summary.failure_count = sent_before['failure_count']
+
+    try:
+        for chunk, (tokens, resume_after_token) in enumerate(recipient_chunks(job), start=job.next_chunk):
+            try:
+                chunk_summary = send_fcm_notification(tokens, notification.title, notification.body, job.image_url)
+            except FCMUnavailableError as e:
+                # Checkpoint the part of the chunk that was sent, only the tokens held back are sent on resume
+                record_delivery(job, chunk, e.sent_summary())
+                if not save_progress(job, worker_id, chunk + 1, resume_after_token, e.unsent_tokens, lease_seconds):
+                    logger.warning("Dispatch job %s lost its lease, stopping", job.id)
+                    return False
+                raise
+
+            record_delivery(job, chunk, chunk_summary)
+            summary.merge(chunk_summary)
+
+            if not save_progress(job, worker_id, chunk + 1, resume_after_token, lease_seconds=lease_seconds):
+                logger.warning("Dispatch job %s lost its lease, stopping", job.id)
+                return False
+
+    except FCMUnavailableError as e:
+        logger.warning("FCM unavailable, deferring dispatch job %s for %.0fs", job.id, e.retry_after)
+        return defer_job(job, worker_id, max(e.retry_after, 1), str(e))
+
+    except Exception as e:
+        logger.exception("Dispatch job %s failed", job.id)
+        return retry_job(job, worker_id, str(e))
+
+    if summary.total == 0:
+        return finish_job(job, worker_id, 'failed', 'failed', error="No user found; notification cannot be sent")
+
+    if summary.success_count == 0:
+        return finish_job(job, worker_id, 'failed', 'failed', error=f"No token accepted the notification: {dict(summary.error_counts)}")
+
+    return finish_job(job, worker_id, 'done', 'sent')
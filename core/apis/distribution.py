@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+# Local imports
+from core.models import Books, Materials, Professionals, Transactions
+from core.apis.cache_versions import get_model_version
+
+# Columns the distribution endpoint can group by
+DISTRIBUTIONS = {
+    'materials.type': (Materials, 'type'),
+    'materials.availability': (Materials, 'availability'),
+    'professionals.expertise': (Professionals, 'expertise'),
+    'professionals.location': (Professionals, 'location'),
+    'books.availability': (Books, 'availability'),
+    'transactions.status': (Transactions, 'status'),
+    'transactions.type': (Transactions, 'type'),
+}
+
+
+def count_by(model, field):
+    """
+    [(value, count)] of a column, largest first, one GROUP BY query cached until the table changes.
+    """
+    key = f"distribution:{model._meta.label_lower}:{field}:{get_model_version(model)}"
+    counts = cache.get(key)
+    if counts is None:
+        counts = [
+            (row[field], row['count'])
+            for row in model.objects.values(field).annotate(count=Count('id')).order_by('-count', field)
+        ]
+        cache.set(key, counts, settings.DASHBOARD_CACHE_TIMEOUT)
+
+    return counts
+
+def get_distribution(model, field, top=None, other_label='others'):
+    """
+    Distribution of a column with percentages, past the `top` largest values are folded into `other_label`.
+    """
+    counts = count_by(model, field)
+    total_count = sum(count for _, count in counts)
+
+    if top and len(counts) > top:
+        counts = counts[:top] + [(other_label, sum(count for _, count in counts[top:]))]
+
+    return {
+        "total_count": total_count,
+        "distribution": [
+            {"value": value, "count": count, "percentage": (count / total_count) * 100 if total_count else 0}
+            for value, count in counts
+        ],
+    }
@@ -0,0 +1,105 @@
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FCMStandInHandler(BaseHTTPRequestHandler):
+    """
+    Answers HTTP v1 `messages:send` calls the way FCM does.
+    Tokens starting with 'invalid' are answered with UNREGISTERED, and a share of the
+    requests can be failed with 429/503 (+ Retry-After) to exercise the retry layer.
+    """
+
+    # Keep-alive, so pooled sessions can reuse their connections.
+    protocol_version = 'HTTP/1.1'
+    # Write headers and body as one segment, otherwise Nagle + delayed ACK adds ~40ms per keep-alive request.
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            token = payload["message"]["token"]
+        except (ValueError, KeyError, TypeError):
+            return self.send_json(400, self.error_body(400, 'INVALID_ARGUMENT', 'INVALID_ARGUMENT'))
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            return self.send_transient_error()
+
+        if token.startswith('invalid'):
+            return self.send_json(404, self.error_body(404, 'NOT_FOUND', 'UNREGISTERED'))
+
+        message_id = next(self.server.message_ids)
+        self.send_json(200, {"name": f"projects/handy-book/messages/{message_id}"})
+
+    def send_transient_error(self):
+        code = self.server.error_status
+        status, error_code = ('RESOURCE_EXHAUSTED', 'QUOTA_EXCEEDED') if code == 429 else ('UNAVAILABLE', 'UNAVAILABLE')
+        headers = {'Retry-After': str(self.server.retry_after)} if self.server.retry_after is not None else None
+
+        self.send_json(code, self.error_body(code, status, error_code), headers=headers)
+
+    def error_body(self, code, status, error_code):
+        return {
+            "error": {
+                "code": code,
+                "message": self.responses.get(code, ("Error",))[0],
+                "status": status,
+                "details": [{"@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError", "errorCode": error_code}]
+            }
+        }
+
+    def send_json(self, status_code, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Silence the per-request access log, it dominates benchmark output.
+        return
+
+
+class FCMStandInServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the FCM HTTP v1 endpoint, used to benchmark the sender without network access.
+
+    latency: seconds each request sleeps before answering, to simulate the round-trip to Google.
+    error_rate: share of requests answered with `error_status` (429 or 503).
+    retry_after: Retry-After seconds sent with those errors, None to omit the header.
+    """
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, error_status=503, retry_after=None):
+        super().__init__((host, port), FCMStandInHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.message_ids = itertools.count(1)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/projects/handy-book/messages:send"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fcm-standin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -1,58 +1,537 @@
-import json
+import datetime
 import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
+from django.core.cache import cache
 
 # Local imports
 from core.models import MobileUsers
+from core.apis.segments import forget_fcm_tokens, segment_members
+from core.apis.resilience import backoff_delay, get_circuit_breaker, get_rate_limiter, parse_retry_after, project_key
 
 # Third party imports
 import requests
+import firebase_admin
+from firebase_admin import credentials as firebase_credentials, exceptions as firebase_exceptions, messaging
+from requests.adapters import HTTPAdapter
 from google.oauth2 import service_account
+from google.auth.exceptions import GoogleAuthError
 from google.auth.transport.requests import Request
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_recipient_fcm_tokens( recipient_type):
-        if recipient_type == 'all users':
-            users = MobileUsers.objects.filter(fcm_token__isnull=False)
-            return [user.fcm_token for user in users]
-        
+FCM_TRANSPORT_HTTP_V1 = 'http_v1'
+FCM_TRANSPORT_ADMIN_SDK = 'admin_sdk'
+FCM_TRANSPORTS = (FCM_TRANSPORT_HTTP_V1, FCM_TRANSPORT_ADMIN_SDK)
+
+# firebase_admin.messaging.send_each() accepts at most 500 messages per call.
+FCM_ADMIN_SDK_BATCH_SIZE = 500
+
+# Error reported for the tokens skipped because the circuit breaker was open.
+FCM_CIRCUIT_OPEN = 'CIRCUIT_OPEN'
+FCM_RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+FCM_RETRYABLE_ERRORS = ('QUOTA_EXCEEDED', 'UNAVAILABLE', 'INTERNAL', 'RESOURCE_EXHAUSTED')
+
+FCM_SCOPES = ['https://www.googleapis.com/auth/firebase.messaging']
+FCM_TOKEN_CACHE_KEY = 'fcm:access_token'
+FCM_TOKEN_LOCK_KEY = 'fcm:access_token:refresh_lock'
+# How long a worker may hold the refresh lock (and how long others wait for it) before it is considered stuck.
+FCM_TOKEN_LOCK_TIMEOUT = 30
+
+_credentials = None
+_token = None
+_token_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+_firebase_app = None
+_firebase_app_lock = threading.Lock()
+
+
+class FCMUnavailableError(Exception):
+    """
+    FCM is degraded and the circuit breaker stopped the fan-out.
+    `summary` holds what was sent before, the rest should be retried after `retry_after` seconds.
+    """
+
+    def __init__(self, summary, retry_after):
+        super().__init__(f"FCM unavailable, retry in {retry_after:.0f}s")
+        self.summary = summary
+        self.retry_after = retry_after
+
+    @property
+    def unsent_tokens(self):
+        """
+        Tokens the circuit breaker held back, the others were tried.
+        """
+        return [result.token for result in self.summary.results if result.error == FCM_CIRCUIT_OPEN]
+
+    def sent_summary(self):
+        """
+        Summary of the tokens that were tried.
+        """
+        summary = FCMSendSummary()
+        for result in self.summary.results:
+            if result.error != FCM_CIRCUIT_OPEN:
+                summary.add(result)
+        return summary
+
+
+class FCMSendResult:
+    """
+    Outcome of sending a notification to a single FCM token.
+    """
+    __slots__ = ('token', 'success', 'status_code', 'error', 'message_id')
+
+    def __init__(self, token, success, status_code=None, error=None, message_id=None):
+        self.token = token
+        self.success = success
+        self.status_code = status_code
+        self.error = error
+        self.message_id = message_id
+
+    def to_dict(self):
+        return {
+            "token": self.token,
+            "success": self.success,
+            "status_code": self.status_code,
+            "error": self.error,
+            "message_id": self.message_id,
+        }
+
+
+class FCMSendSummary:
+    """
+    Per-token results of a fan-out plus the aggregated counts.
+    """
+
+    def __init__(self):
+        self.results = []
+        self.success_count = 0
+        self.failure_count = 0
+        self.error_counts = Counter()
+
+    def add(self, result):
+        self.results.append(result)
+        if result.success:
+            self.success_count += 1
         else:
-            return []
+            self.failure_count += 1
+            self.error_counts[result.error] += 1
+
+    def merge(self, other):
+        """
+        Add the counts of another summary, without keeping its per-token results.
+        """
+        self.success_count += other.success_count
+        self.failure_count += other.failure_count
+        self.error_counts.update(other.error_counts)
+
+    @property
+    def total(self):
+        return self.success_count + self.failure_count
+
+    @property
+    def failures(self):
+        return [result for result in self.results if not result.success]
+
+    def to_dict(self, include_results=False):
+        data = {
+            "total": self.total,
+            "success_count": self.success_count,
+            "failure_count": self.failure_count,
+            "errors": dict(self.error_counts),
+        }
+        if include_results:
+            data["results"] = [result.to_dict() for result in self.results]
+        return data
+
+
+def get_recipients_queryset(recipient_type, registered_from=None, registered_to=None):
+    """
+    Segment membership rows of the recipients that have a usable FCM token.
+    Deactivated users are never members of a segment.
+    """
+    return segment_members(recipient_type, registered_from, registered_to).filter(fcm_token__isnull=False).exclude(fcm_token='')
+
+def iter_recipient_fcm_tokens(recipient_type, chunk_size=None, start_after=None, registered_from=None, registered_to=None):
+    """
+    Yield the deduplicated FCM tokens of the recipients in lists of at most `chunk_size`.
+
+    Tokens are read in keyset pages over the (segment, fcm_token) index, each page is a
+    short `fcm_token > last ORDER BY fcm_token LIMIT n` query. Only token strings are
+    loaded, duplicates are dropped by the DISTINCT + keyset and memory stays at one chunk
+    whatever the number of users. No cursor is kept open while the chunk is being sent.
+    `start_after` resumes an interrupted send after the last token of its last sent chunk.
+    """
+    chunk_size = chunk_size or settings.FCM_RECIPIENT_CHUNK_SIZE
+    queryset = get_recipients_queryset(recipient_type, registered_from, registered_to).order_by('fcm_token').values_list('fcm_token', flat=True).distinct()
+
+    last_token = start_after
+    while True:
+        page = queryset if last_token is None else queryset.filter(fcm_token__gt=last_token)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+
+        yield chunk
+
+        if len(chunk) < chunk_size:
+            return
+        last_token = chunk[-1]
+
+def get_recipient_fcm_tokens(recipient_type, registered_from=None, registered_to=None):
+    return [token for chunk in iter_recipient_fcm_tokens(recipient_type, registered_from=registered_from, registered_to=registered_to) for token in chunk]
+
+def has_recipients(recipient_type, registered_from=None, registered_to=None):
+    return get_recipients_queryset(recipient_type, registered_from, registered_to).exists()
+
+def get_invalid_tokens(summary):
+    """
+    Tokens FCM reported as permanently unusable in a send summary.
+
+    INVALID_ARGUMENT is also returned for a bad payload (eg: an invalid image url), so it
+    is only trusted when some tokens of the same batch were accepted.
+    """
+    invalid_tokens = []
+    for result in summary.failures:
+        if result.error in settings.FCM_PERMANENT_TOKEN_ERRORS:
+            invalid_tokens.append(result.token)
+        elif result.error == 'INVALID_ARGUMENT' and summary.success_count:
+            invalid_tokens.append(result.token)
+
+    return invalid_tokens
+
+def prune_invalid_tokens(tokens):
+    """
+    Forget dead FCM tokens in one batched UPDATE, so later broadcasts skip them.
+    """
+    if not tokens:
+        return 0
+
+    pruned_count = MobileUsers.objects.filter(fcm_token__in=tokens).update(fcm_token=None)
+    forget_fcm_tokens(tokens)
+
+    return pruned_count
+
+def get_service_account_credentials():
+    """
+    Load the service account credentials once per process, instead of reading the JSON file on every send.
+    """
+    global _credentials
+
+    if _credentials is None:
+        _credentials = service_account.Credentials.from_service_account_file(settings.GOOGLE_APPLICATION_CREDENTIALS, scopes=FCM_SCOPES)
+
+    return _credentials
+
+def is_token_fresh(token):
+    return token is not None and token["expiry"] - time.time() > settings.FCM_TOKEN_REFRESH_MARGIN
+
+def is_token_valid(token):
+    return token is not None and token["expiry"] > time.time()
+
+def refresh_access_token():
+    """
+    Mint a new access token and publish it in the shared cache for the other workers.
+    Must be called with _token_lock held, the credentials object is not thread safe.
+    """
+    credentials = get_service_account_credentials()
+    credentials.refresh(Request())
+
+    expiry = credentials.expiry.replace(tzinfo=datetime.timezone.utc).timestamp()
+    token = {"token": credentials.token, "expiry": expiry}
+    cache.set(FCM_TOKEN_CACHE_KEY, token, timeout=max(int(expiry - time.time()), 1))
+
+    return token
 
 def get_access_token():
-    """Retrieve a valid access token that can be used to authorize requests.    
+    """Retrieve a valid access token that can be used to authorize requests.
+
+    The token is kept in process memory and in the shared Django cache, and is only
+    refreshed FCM_TOKEN_REFRESH_MARGIN seconds before it expires. Refreshes are
+    single-flight: one thread per process and one process per cache (through an
+    atomic cache.add lock) talks to Google, everyone else reuses its token.
     :return: Access token.
     """
-    credentials = service_account.Credentials.from_service_account_file(settings.GOOGLE_APPLICATION_CREDENTIALS, scopes=['https://www.googleapis.com/auth/firebase.messaging'])
-    request = Request()
-    credentials.refresh(request)
+    global _token
 
-    return credentials.token
+    if is_token_fresh(_token):
+        return _token["token"]
 
-def send_fcm_notification(tokens, title, body, image):
-    access_token = get_access_token()
+    with _token_lock:
+        if is_token_fresh(_token):
+            return _token["token"]
 
-    for token in tokens:
-        headers = {
-            'Authorization': 'Bearer ' + access_token,
-            'Content-Type': 'application/json; UTF-8',
-        }
+        shared_token = cache.get(FCM_TOKEN_CACHE_KEY)
+        if is_token_fresh(shared_token):
+            _token = shared_token
+            return _token["token"]
+
+        if cache.add(FCM_TOKEN_LOCK_KEY, os.getpid(), timeout=FCM_TOKEN_LOCK_TIMEOUT):
+            try:
+                _token = refresh_access_token()
+            finally:
+                cache.delete(FCM_TOKEN_LOCK_KEY)
+            return _token["token"]
+
+        # Another worker is refreshing, the current token is still usable meanwhile.
+        if is_token_valid(shared_token):
+            _token = shared_token
+            return _token["token"]
+
+        deadline = time.monotonic() + FCM_TOKEN_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            shared_token = cache.get(FCM_TOKEN_CACHE_KEY)
+            if is_token_fresh(shared_token):
+                _token = shared_token
+                return _token["token"]
+
+        # The worker holding the lock died or hung, refresh ourselves.
+        _token = refresh_access_token()
+        return _token["token"]
+
+def get_http_session():
+    """
+    Return the process wide requests session used for FCM calls.
+    Its connection pool is sized to FCM_MAX_WORKERS so concurrent sends reuse
+    keep-alive connections instead of doing a TCP/TLS handshake per token.
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.FCM_MAX_WORKERS)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+
+    return _session
+
+def get_firebase_app():
+    """
+    Lazily initialise the firebase_admin app used by the admin_sdk transport.
+    """
+    global _firebase_app
+
+    if _firebase_app is None:
+        with _firebase_app_lock:
+            if _firebase_app is None:
+                credentials = firebase_credentials.Certificate(settings.GOOGLE_APPLICATION_CREDENTIALS)
+                _firebase_app = firebase_admin.initialize_app(credentials, name='handy_book')
+
+    return _firebase_app
 
-        payload = {
-            "message": {
-                "token": token,
-                "notification": {
-                    "title": title,
-                    "body": body,
-                    "image": image
-                }
+def build_fcm_payload(token, title, body, image):
+    return {
+        "message": {
+            "token": token,
+            "notification": {
+                "title": title,
+                "body": body,
+                "image": image
             }
         }
+    }
+
+def parse_fcm_error(response):
+    """
+    Extract the FCM error code (eg: UNREGISTERED, INVALID_ARGUMENT) from an HTTP v1 error response.
+    """
+    try:
+        error = response.json().get("error", {})
+    except ValueError:
+        return f"HTTP_{response.status_code}"
+
+    for detail in error.get("details", []):
+        if detail.get("errorCode"):
+            return detail["errorCode"]
+
+    return error.get("status") or f"HTTP_{response.status_code}"
+
+def get_fcm_breaker(project):
+    return get_circuit_breaker(project, settings.FCM_CIRCUIT_FAILURE_THRESHOLD, settings.FCM_CIRCUIT_RESET_TIMEOUT)
+
+def get_fcm_rate_limiter(project):
+    return get_rate_limiter(project, settings.FCM_RATE_LIMIT_QPS)
+
+def send_http_v1_message(session, url, headers, token, title, body, image):
+    """
+    Send to one token, retrying 429/5xx/network errors with jittered exponential backoff
+    (honouring Retry-After), under the project's rate limit and circuit breaker.
+    """
+    project = project_key(url)
+    breaker = get_fcm_breaker(project)
+    rate_limiter = get_fcm_rate_limiter(project)
+    payload = build_fcm_payload(token, title, body, image)
+
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            return FCMSendResult(token, False, error=FCM_CIRCUIT_OPEN)
+        rate_limiter.acquire()
+
+        retry_after = None
+        try:
+            response = session.post(url, headers=headers, json=payload, timeout=settings.FCM_TIMEOUT)
+        except requests.RequestException as e:
+            result = FCMSendResult(token, False, error=type(e).__name__)
+        else:
+            if response.status_code == 200:
+                breaker.record_success()
+                return FCMSendResult(token, True, status_code=200, message_id=response.json().get("name"))
+
+            result = FCMSendResult(token, False, status_code=response.status_code, error=parse_fcm_error(response))
+            if response.status_code not in FCM_RETRYABLE_STATUS_CODES:
+                # The service is healthy, the message or token is not.
+                breaker.record_success()
+                return result
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+
+        breaker.record_failure(retry_after)
+        if attempt >= settings.FCM_MAX_RETRIES:
+            return result
+
+        time.sleep(backoff_delay(attempt, settings.FCM_BACKOFF_BASE, settings.FCM_BACKOFF_MAX, retry_after))
+        attempt += 1
+
+def raise_if_interrupted(summary, project):
+    """
+    Raise FCMUnavailableError if the circuit breaker opened during the fan-out.
+    """
+    if summary.error_counts.get(FCM_CIRCUIT_OPEN):
+        raise FCMUnavailableError(summary, get_fcm_breaker(project).retry_after())
+
+def send_with_http_v1(tokens, title, body, image, max_workers, access_token=None, fcm_url=None):
+    """
+    Send one HTTP v1 request per token with at most `max_workers` requests in flight.
+    """
+    access_token = access_token or get_access_token()
+    url = fcm_url or settings.FCM_URL
+    session = get_http_session()
+
+    headers = {
+        'Authorization': 'Bearer ' + access_token,
+        'Content-Type': 'application/json; UTF-8',
+    }
+
+    summary = FCMSendSummary()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fcm-send') as executor:
+        futures = [executor.submit(send_http_v1_message, session, url, headers, token, title, body, image) for token in tokens]
+        for future in futures:
+            summary.add(future.result())
+
+    raise_if_interrupted(summary, project_key(url))
+    return summary
+
+def admin_sdk_error_code(exception):
+    """
+    Map a firebase_admin exception to the same error codes the HTTP v1 API returns.
+    """
+    fcm_errors = {
+        messaging.UnregisteredError: 'UNREGISTERED',
+        messaging.SenderIdMismatchError: 'SENDER_ID_MISMATCH',
+        messaging.QuotaExceededError: 'QUOTA_EXCEEDED',
+        messaging.ThirdPartyAuthError: 'THIRD_PARTY_AUTH_ERROR',
+    }
+    for error_class, code in fcm_errors.items():
+        if isinstance(exception, error_class):
+            return code
+
+    code = getattr(exception, 'code', None)
+    return code.upper() if code else type(exception).__name__
+
+def send_with_admin_sdk(tokens, title, body, image):
+    """
+    Send through firebase_admin.messaging.send_each() in batches of 500 messages.
+    Tokens failing with a transient error are sent again with backoff, under the
+    same rate limit and circuit breaker as the HTTP v1 transport.
+    """
+    app = get_firebase_app()
+    project = app.project_id
+    breaker = get_fcm_breaker(project)
+    rate_limiter = get_fcm_rate_limiter(project)
+    notification = messaging.Notification(title=title, body=body, image=image)
+
+    summary = FCMSendSummary()
+    for start in range(0, len(tokens), FCM_ADMIN_SDK_BATCH_SIZE):
+        batch = tokens[start:start + FCM_ADMIN_SDK_BATCH_SIZE]
+
+        attempt = 0
+        while batch:
+            if not breaker.allow():
+                for token in batch + tokens[start + FCM_ADMIN_SDK_BATCH_SIZE:]:
+                    summary.add(FCMSendResult(token, False, error=FCM_CIRCUIT_OPEN))
+                raise_if_interrupted(summary, project)
+            rate_limiter.acquire(len(batch))
+
+            messages = [messaging.Message(token=token, notification=notification) for token in batch]
+            try:
+                batch_response = messaging.send_each(messages, app=app)
+            except (firebase_exceptions.FirebaseError, GoogleAuthError, requests.RequestException) as e:
+                # The whole batch failed (eg: network, credentials): retried as one like the HTTP v1 network errors
+                breaker.record_failure()
+                if attempt >= settings.FCM_MAX_RETRIES:
+                    for token in batch:
+                        summary.add(FCMSendResult(token, False, error=admin_sdk_error_code(e)))
+                    break
+
+                time.sleep(backoff_delay(attempt, settings.FCM_BACKOFF_BASE, settings.FCM_BACKOFF_MAX))
+                attempt += 1
+                continue
+
+            retry_batch = []
+            for token, response in zip(batch, batch_response.responses):
+                if response.success:
+                    summary.add(FCMSendResult(token, True, status_code=200, message_id=response.message_id))
+                    continue
+
+                http_response = getattr(response.exception, 'http_response', None)
+                status_code = http_response.status_code if http_response is not None else None
+                result = FCMSendResult(token, False, status_code=status_code, error=admin_sdk_error_code(response.exception))
+                if result.error in FCM_RETRYABLE_ERRORS and attempt < settings.FCM_MAX_RETRIES:
+                    retry_batch.append(token)
+                else:
+                    summary.add(result)
+
+            if retry_batch and len(retry_batch) == len(batch):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if retry_batch:
+                time.sleep(backoff_delay(attempt, settings.FCM_BACKOFF_BASE, settings.FCM_BACKOFF_MAX))
+            batch = retry_batch
+            attempt += 1
+
+    return summary
+
+def send_fcm_notification(tokens, title, body, image, transport=None, max_workers=None, access_token=None, fcm_url=None):
+    """
+    Fan a notification out to every token and return a FCMSendSummary.
+    A failing token never stops the others from being sent, transient errors are retried.
+    Raises FCMUnavailableError if FCM is degraded and the circuit breaker stopped the fan-out.
+
+    transport: 'http_v1' (one pooled request per token) or 'admin_sdk' (batched send_each),
+    defaults to settings.FCM_TRANSPORT.
+    """
+    tokens = list(tokens)
+    transport = transport or settings.FCM_TRANSPORT
+
+    if not tokens:
+        return FCMSendSummary()
+
+    if transport == FCM_TRANSPORT_HTTP_V1:
+        max_workers = max_workers or settings.FCM_MAX_WORKERS
+        return send_with_http_v1(tokens, title, body, image, max_workers, access_token=access_token, fcm_url=fcm_url)
 
-        response = requests.post(settings.FCM_URL, headers=headers, json=payload)
-        if response.status_code != 200:
-            break
+    if transport == FCM_TRANSPORT_ADMIN_SDK:
+        return send_with_admin_sdk(tokens, title, body, image)
 
-    return response
\ No newline at end of file
+    raise ValueError(f"Unknown FCM transport '{transport}', expected one of {FCM_TRANSPORTS}")
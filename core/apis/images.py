@@ -0,0 +1,41 @@
+import io
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+# Third party imports
+from PIL import Image, ImageOps
+
+PUSH_IMAGE_QUALITIES = (82, 72, 62, 52, 42)
+
+
+def build_push_variant(image_file):
+    """
+    Build a push friendly JPEG of an uploaded image: longest side capped to
+    PUSH_IMAGE_MAX_DIMENSION and quality lowered until it fits PUSH_IMAGE_MAX_BYTES
+    (or the lowest quality is reached). Every device downloads this file, not the original.
+    """
+    image_file.open('rb')
+    with Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((settings.PUSH_IMAGE_MAX_DIMENSION, settings.PUSH_IMAGE_MAX_DIMENSION), Image.LANCZOS)
+
+        # JPEG has no alpha channel, flatten transparent images on white.
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        for quality in PUSH_IMAGE_QUALITIES:
+            buffer = io.BytesIO()
+            image.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+            if buffer.tell() <= settings.PUSH_IMAGE_MAX_BYTES:
+                break
+
+    return ContentFile(buffer.getvalue())
+
+def push_variant_name(image_name):
+    return f"{os.path.splitext(os.path.basename(image_name))[0]}.jpg"
@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+# Local imports
+from core.models import InboxItem, InboxSegmentHead, NotificationInbox
+from core.apis.segments import REGISTERED_BETWEEN
+
+
+def publish_to_inbox(notification):
+    """
+    Make a sent notification visible in the inbox of its recipients: one row, whatever the audience size.
+    """
+    with transaction.atomic():
+        item = InboxItem.objects.create(
+            notification=notification,
+            segment=notification.recipient,
+            registered_from=notification.registered_from,
+            registered_to=notification.registered_to,
+        )
+        InboxSegmentHead.objects.get_or_create(segment=notification.recipient)
+        InboxSegmentHead.objects.filter(segment=notification.recipient).update(count=F('count') + 1)
+
+    return item
+
+def get_segment_heads():
+    return dict(InboxSegmentHead.objects.values_list('segment', 'count'))
+
+def last_item_before(moment):
+    return InboxItem.objects.filter(published_on__lt=moment).order_by('-published_on').values_list('id', flat=True).first() or 0
+
+def get_user_inbox(user):
+    """
+    Read state of a user, created on first use: earlier items start as read, the items
+    published before the user registered are not in their inbox.
+    """
+    inbox, _ = NotificationInbox.objects.get_or_create(
+        user=user,
+        defaults={
+            "registered_after_item": last_item_before(user.created_on),
+            "read_heads": get_segment_heads(),
+            "read_through": InboxItem.objects.aggregate(last=Max('id'))['last'] or 0,
+        },
+    )
+    return inbox
+
+def get_user_segments(user):
+    return list(user.segments.values_list('segment', flat=True))
+
+def registered_between_filter(user):
+    registered_on = timezone.localdate(user.created_on)
+    return Q(segment=REGISTERED_BETWEEN, registered_from__lte=registered_on, registered_to__gte=registered_on)
+
+def user_inbox_items(user, inbox, segments):
+    """
+    Inbox items addressed to the user's current segments since they registered, read through
+    the (segment, id) index.
+    """
+    if not segments:
+        return InboxItem.objects.none()
+
+    items = InboxItem.objects.filter(Q(segment__in=segments) | registered_between_filter(user), id__gt=inbox.registered_after_item)
+    return items.select_related('notification')
+
+def get_unread_count(user, inbox, segments):
+    """
+    Per segment head minus the head when the user last read, no scan of the items.
+    'registered between' items depend on the user's registration date, they are counted
+    from the items published since the watermark. Both only count items published after the
+    inbox was created, so after the user registered, like user_inbox_items.
+    """
+    if not segments:
+        return 0
+
+    heads = dict(InboxSegmentHead.objects.filter(segment__in=segments).values_list('segment', 'count'))
+    unread_count = sum(max(heads.get(segment, 0) - inbox.read_heads.get(segment, 0), 0) for segment in segments)
+    unread_count += InboxItem.objects.filter(registered_between_filter(user), id__gt=inbox.read_through).count()
+
+    return unread_count
+
+def mark_inbox_read(inbox):
+    inbox.read_heads = get_segment_heads()
+    inbox.read_through = InboxItem.objects.aggregate(last=Max('id'))['last'] or 0
+    inbox.last_read_on = timezone.now()
+    inbox.save()
+
+    return inbox
@@ -0,0 +1,188 @@
+import asyncio
+import datetime
+import json
+import logging
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Local imports
+from core.models import LiveEvent
+
+logger = logging.getLogger(__name__)
+
+# Channels of the live dashboard stream, 'resync' tells the clients to reload everything
+CHANNELS = ('counters', 'revenue', 'activity')
+RESYNC = 'resync'
+
+
+class Subscription:
+    """
+    Events waiting to be sent to one stream, delivered from any thread into the stream's event loop.
+    """
+
+    def __init__(self, channels, loop, maxsize):
+        self.channels = set(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, channel, data):
+        """
+        Runs in the stream's event loop. A stream too far behind gets a single resync instead of the backlog.
+        """
+        if channel != RESYNC and channel not in self.channels:
+            return
+
+        try:
+            self.queue.put_nowait((channel, data))
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((RESYNC, {}))
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """
+    Fans the events published in this process out to the streams of this process.
+
+    A stream costs an asyncio queue, no thread: publishers (sync views, signals) hand
+    the events to the streams' event loop with call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+
+    def publish(self, channel, data):
+        self.fan_out(channel, data)
+
+    def fan_out(self, channel, data):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, channel, data)
+            except RuntimeError:
+                # Event loop closed under a stream that was not unsubscribed
+                self.unsubscribe(subscription)
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, asyncio.get_running_loop(), settings.LIVE_QUEUE_SIZE)
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+
+class DatabaseBroker(InProcessBroker):
+    """
+    Relays the events between processes (several ASGI workers, management commands) through
+    the LiveEvent table: one poller task per process, whatever its number of streams, reads
+    the new rows every LIVE_POLL_INTERVAL and fans them out to the local streams.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.poller = None
+        self.last_id = None
+
+    def publish(self, channel, data):
+        LiveEvent.objects.create(channel=channel, data=data)
+
+    def subscribe(self, channels):
+        subscription = super().subscribe(channels)
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.get_running_loop().create_task(self.poll())
+        return subscription
+
+    def read_events(self):
+        if self.last_id is None:
+            # Only the events published from now on
+            self.last_id = LiveEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        events = list(LiveEvent.objects.filter(id__gt=self.last_id).order_by('id').values_list('id', 'channel', 'data')[:500])
+        if events:
+            self.last_id = events[-1][0]
+        return events
+
+    def prune_events(self):
+        return LiveEvent.objects.filter(created_on__lt=timezone.now() - datetime.timedelta(seconds=settings.LIVE_EVENT_RETENTION)).delete()[0]
+
+    async def poll(self):
+        polls = 0
+        while self.subscriptions:
+            try:
+                for _, channel, data in await sync_to_async(self.read_events)():
+                    self.fan_out(channel, data)
+
+                polls += 1
+                if polls % 60 == 0:
+                    await sync_to_async(self.prune_events)()
+            except Exception:
+                logger.exception("Live event poll failed")
+
+            await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+
+        # Nobody listens, events published until the next stream opens are not relayed
+        self.last_id = None
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.LIVE_BROKER)()
+        return _broker
+
+def publish_event(channel, data):
+    """
+    Push an event to the live dashboard streams once the current transaction commits.
+    """
+    def publish():
+        try:
+            get_broker().publish(channel, data)
+        except Exception:
+            # The stream is best effort, it never fails the write it reports
+            logger.exception("Failed to publish live %s event", channel)
+
+    transaction.on_commit(publish)
+
+def format_event(channel, data):
+    """
+    A Server-Sent Events message.
+    """
+    return f"event: {channel}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+async def event_stream(channels, snapshot):
+    """
+    Body of a stream: the `snapshot` event, then the events of `channels` as they are
+    published, with a keep-alive comment every LIVE_HEARTBEAT_INTERVAL while idle.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(channels)
+    try:
+        yield f"retry: 5000\n{format_event('snapshot', await snapshot())}"
+        while True:
+            try:
+                channel, data = await asyncio.wait_for(subscription.get(), settings.LIVE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            yield format_event(channel, data)
+    finally:
+        broker.unsubscribe(subscription)
@@ -1,37 +1,264 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import functools
+import json
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Third party imports
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Local imports
+from core.apis.counters import list_count
 
 # Create your paginators here
+class KeysetPagination(BasePagination):
+    """
+    Pages on the position of the last row in `ordering`, eg: WHERE (created_on, id) < (last created_on, last id).
+    Every page is one index range read, however deep the client scrolls. `ordering` must be unique (end it with id).
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-created_on', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, position):
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        return self.decode_position(request.query_params.get(self.cursor_query_param), model)
+
+    def decode_position(self, cursor, model):
+        """
+        Position of a cursor, its values converted by the `ordering` fields of `model`:
+        a tampered cursor is a 404, never a query error.
+        """
+        if not cursor:
+            return None
+
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering) or None in position:
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            return [model._meta.get_field(field.lstrip('-')).to_python(value) for field, value in zip(self.ordering, position)]
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def after_position(self, position):
+        """
+        Rows after `position` in `ordering`, as (a < x) OR (a = x AND b < y) ...
+        The redundant a <= x lets the database seek the index to x instead of walking it from the start.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            condition |= Q(**equal, **{f"{name}__{'lt' if field.startswith('-') else 'gt'}": value})
+            equal[name] = value
+
+        first = self.ordering[0]
+        return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]}) & condition
+
+    def get_page(self, queryset, position=None, page_size=None):
+        """
+        Rows after `position`, sets `has_next` and `next_position`. Usable without a request.
+        """
+        page_size = page_size or self.page_size
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after_position(position))
+
+        # One extra row tells if there is a next page
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = [getattr(rows[-1], field.lstrip('-')) for field in self.ordering] if self.has_next else None
+
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        return self.get_page(queryset, self.decode_cursor(request, queryset.model), self.get_page_size(request))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class CountedPaginator(Paginator):
+    """
+    Paginator taking its row count from `count_function` instead of running COUNT(*) itself.
+    """
+
+    def __init__(self, object_list, per_page, count_function=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_function = count_function
+
+    @cached_property
+    def count(self):
+        return self.count_function() if self.count_function else super().count
+
+
+class ListPagination(PageNumberPagination):
+    """
+    Page number pages (?page=n) by default, keyset pages on request: ?pagination=cursor for the
+    first one, then the `next` links. A keyset page costs the same at any depth, no OFFSET nor
+    COUNT(*), its response only has `next` and `results`.
+    Both modes read the rows in `ordering`, ended by id so pages never overlap or skip rows.
+
+    The `count` of page number pages follows ?count= (see list_count): approx (default, counters
+    and short lived cached counts), exact (COUNT(*)) or none (no count, `next` is found by
+    reading one extra row).
+    """
+    page_size = 10
+    ordering = ('created_on', 'id')
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_modes = ('approx', 'exact', 'none')
+    default_count_mode = 'approx'
+
+    def is_keyset_request(self, request):
+        return request.query_params.get(self.mode_query_param) == 'cursor' or self.cursor_query_param in request.query_params
+
+    def get_keyset_pagination(self):
+        keyset = KeysetPagination()
+        keyset.page_size = self.page_size
+        keyset.ordering = self.ordering
+        keyset.cursor_query_param = self.cursor_query_param
+        return keyset
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_query_param, self.default_count_mode)
+        if mode not in self.count_modes:
+            raise ValidationError({self.count_query_param: [f"Must be one of {', '.join(self.count_modes)}"]})
+
+        return mode
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.get_keyset_pagination() if self.is_keyset_request(request) else None
+        if self.keyset:
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        self.count_mode = self.get_count_mode(request)
+        queryset = queryset.order_by(*self.ordering)
+        if self.count_mode == 'none':
+            return self.paginate_without_count(queryset, request)
+
+        self.django_paginator_class = functools.partial(CountedPaginator, count_function=lambda: list_count(queryset, self.count_mode))
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_without_count(self, queryset, request):
+        self.request = request
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound("Invalid page.")
+
+        # One extra row tells if there is a next page
+        start = (self.page_number - 1) * self.page_size
+        rows = list(queryset[start:start + self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+
+        return rows[:self.page_size]
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+
+        if self.count_mode == 'none':
+            return Response({
+                'count': None,
+                'next': self.get_uncounted_link(self.page_number + 1) if self.has_next else None,
+                'previous': self.get_uncounted_link(self.page_number - 1) if self.page_number > 1 else None,
+                'results': data,
+            })
+
+        return super().get_paginated_response(data)
+
+    def get_uncounted_link(self, page_number):
+        url = self.request.build_absolute_uri()
+        if page_number == 1:
+            return remove_query_param(url, self.page_query_param)
+
+        return replace_query_param(url, self.page_query_param, page_number)
+
 
 # PROFESSIONALS MODULE PAGINATIONS
-class ProfessionalsPagination(PageNumberPagination):
+class ProfessionalsPagination(ListPagination):
     page_size = 10
 
 
 # BOOKS MODULE PAGINATIONS *******
-class BooksPagination(PageNumberPagination):
+class BooksPagination(ListPagination):
     page_size = 10
 
 
 # EVENTS MODULE PAGINATIONS *******
-class EventsPagination(PageNumberPagination):
+class EventsPagination(ListPagination):
     page_size = 10
 
 
 # MATERIALS MODULE PAGINATIONS *******
-class MaterialsPagination(PageNumberPagination):
+class MaterialsPagination(ListPagination):
     page_size = 10
 
 
 # USERS MODULE PAGINATIONS *******
-class UsersPagination(PageNumberPagination):
+class UsersPagination(ListPagination):
     page_size = 10
 
 
 # TRANSACTIONS MODULE PAGINATIONS *******
-class TransactionsPagination(PageNumberPagination):
+class TransactionsPagination(ListPagination):
     page_size = 10
+    ordering = ('date_time', 'id')
 
 
 # NOTIFICATION MODULE PAGINATIONS *******
-class NotificationsPagination(PageNumberPagination):
-    page_size = 10
\ No newline at end of file
+class NotificationsPagination(ListPagination):
+    page_size = 10
+
+
+# INBOX MODULE PAGINATIONS *******
+class InboxPagination(CursorPagination):
+    """
+    Newest first on the inbox sequence, pages stay stable while new items are published.
+    """
+    page_size = 20
+    ordering = '-id'
+
+
+# DASHBOARD MODULE PAGINATIONS *******
+class ActivityTimelinePagination(KeysetPagination):
+    page_size = 20
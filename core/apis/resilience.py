@@ -0,0 +1,166 @@
+import email.utils
+import random
+import re
+import threading
+import time
+
+
+def backoff_delay(attempt, base, cap, retry_after=None):
+    """
+    Exponential backoff with full jitter for the given (0 based) retry attempt.
+    A server supplied Retry-After is a floor, never shortened by the jitter.
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+
+    return delay
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header (delay in seconds or HTTP date) into seconds, None if absent or invalid.
+    """
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class RateLimiter:
+    """
+    Thread safe token bucket allowing `rate` acquisitions per second with bursts of `burst`.
+    Acquiring more than is available borrows from the future, the caller sleeps off the debt.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, count=1):
+        if not self.rate:
+            return 0.0
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= count
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a call is refused because the circuit breaker is open.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"Circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calling a degraded service after `failure_threshold` consecutive failures.
+
+    closed -> open (every call refused for `reset_timeout`, or longer if the service asked
+    for it through Retry-After) -> half open (a single trial call) -> closed on success,
+    open again on failure.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def retry_after(self):
+        return max(self.open_until - time.monotonic(), 0.0)
+
+    def allow(self):
+        """
+        Return True if a call may go through now.
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if time.monotonic() < self.open_until:
+                    return False
+                self.state = self.HALF_OPEN
+                self.trial_in_flight = False
+
+            if self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def check(self):
+        if not self.allow():
+            raise CircuitOpenError(self.retry_after())
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self, retry_after=None):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.open_until = time.monotonic() + max(self.reset_timeout, retry_after or 0)
+
+    @property
+    def is_open(self):
+        return self.state == self.OPEN and time.monotonic() < self.open_until
+
+
+_registry_lock = threading.Lock()
+_rate_limiters = {}
+_circuit_breakers = {}
+
+def get_rate_limiter(key, rate):
+    with _registry_lock:
+        if key not in _rate_limiters:
+            _rate_limiters[key] = RateLimiter(rate)
+        return _rate_limiters[key]
+
+def get_circuit_breaker(key, failure_threshold, reset_timeout):
+    with _registry_lock:
+        if key not in _circuit_breakers:
+            _circuit_breakers[key] = CircuitBreaker(failure_threshold, reset_timeout)
+        return _circuit_breakers[key]
+
+def project_key(url):
+    """
+    FCM project of a `.../projects/<id>/messages:send` url, rate limits and breakers are per project.
+    """
+    match = re.search(r'/projects/([^/]+)/', url or '')
+    return match.group(1) if match else url
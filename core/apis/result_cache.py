@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+# Local imports
+from core.apis.cache_versions import get_model_versions
+
+logger = logging.getLogger(__name__)
+
+CACHE_EVENTS = ('hits', 'misses', 'waits')
+
+# Cache events of this process since its last log, {name: Counter(event)}: counting them in
+# the shared cache would cost a cache write on every request
+_events = defaultdict(Counter)
+_events_lock = threading.Lock()
+_logged_at = time.monotonic()
+
+
+def result_cache_key(name, models, params):
+    """
+    Key of a cached result: changes when any of `models` is written, with the parameters,
+    and with the day (charts are relative to today).
+    """
+    digest = hashlib.sha1(repr(sorted((params or {}).items())).encode()).hexdigest()
+    return f"result:{name}:{digest}:{timezone.localdate().isoformat()}:{get_model_versions(*models)}"
+
+def record_cache_event(name, event):
+    """
+    Count a cache event of this process, the counts are logged and reset every
+    DASHBOARD_CACHE_METRICS_INTERVAL.
+    """
+    global _logged_at
+    with _events_lock:
+        _events[name][event] += 1
+        now = time.monotonic()
+        if now - _logged_at < settings.DASHBOARD_CACHE_METRICS_INTERVAL:
+            return
+
+        metrics = cache_metrics(_events)
+        _events.clear()
+        _logged_at = now
+
+    for name, counts in metrics.items():
+        hit_ratio = f"{counts['hit_ratio']:.0%}" if counts['hit_ratio'] is not None else "-"
+        logger.info("Cached result %s: %s hits, %s misses, %s waits, hit ratio %s", name, counts['hits'], counts['misses'], counts['waits'], hit_ratio)
+
+def cache_metrics(names):
+    """
+    {name: {'hits', 'misses', 'waits', 'hit_ratio'}} of the given results, in this process
+    since the last log.
+    """
+    metrics = {name: {event: _events.get(name, {}).get(event, 0) for event in CACHE_EVENTS} for name in names}
+    for counts in metrics.values():
+        requests = counts['hits'] + counts['misses']
+        counts['hit_ratio'] = counts['hits'] / requests if requests else None
+
+    return metrics
+
+def cached_result(name, models, params, compute):
+    """
+    Result of `compute()` cached until one of `models` changes (see bump_model_version).
+
+    On a miss a single caller computes (atomic cache.add lock), the concurrent callers wait
+    for its result instead of all hitting the database at once; if it does not come within
+    DASHBOARD_CACHE_LOCK_TIMEOUT they compute it themselves.
+    """
+    key = result_cache_key(name, models, params)
+    result = cache.get(key)
+    if result is not None:
+        record_cache_event(name, 'hits')
+        return result
+
+    record_cache_event(name, 'misses')
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, os.getpid(), timeout=settings.DASHBOARD_CACHE_LOCK_TIMEOUT):
+        try:
+            result = compute()
+            cache.set(key, result, settings.DASHBOARD_CACHE_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+        return result
+
+    record_cache_event(name, 'waits')
+    deadline = time.monotonic() + settings.DASHBOARD_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+    logger.warning("Timed out waiting for cached result %s, computing it", name)
+    return compute()
@@ -0,0 +1,36 @@
+import datetime
+
+# Local imports
+from core.models import DailyRevenueRollup
+from core.apis.timeseries import add_months, bucketed_sum
+
+
+def revenue_rollups():
+    """
+    Rollups of the transactions counted as revenue, for the current and the previous period alike.
+    """
+    return DailyRevenueRollup.objects.filter(type='payment', status='completed')
+
+def period_range(periods, today):
+    """
+    (start, end, previous start, granularity) of a preset period containing `today`.
+    """
+    if periods == 'weekly':
+        start = today - datetime.timedelta(days=today.weekday())
+        return start, start + datetime.timedelta(days=6), start - datetime.timedelta(days=7), 'day'
+
+    if periods == 'monthly':
+        start = today.replace(day=1)
+        return start, add_months(start, 1) - datetime.timedelta(days=1), add_months(start, -1), 'day'
+
+    start = datetime.date(today.year, 1, 1)
+    return start, datetime.date(today.year, 12, 31), datetime.date(today.year - 1, 1, 1), 'month'
+
+def previous_period_start(start, end):
+    """
+    Start of the period of the same length right before `start`.
+    """
+    return start - (end - start + datetime.timedelta(days=1))
+
+def revenue_growth(start, end, granularity, previous_start=None):
+    return bucketed_sum(revenue_rollups(), 'day', 'amount', start, end, granularity, previous_start)
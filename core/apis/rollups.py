@@ -0,0 +1,125 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Local imports
+from core.models import Books, DailyCreationRollup, DailyRevenueRollup, Events, Materials, MobileUsers, Professionals, Transactions
+from core.apis.cache_versions import bump_model_version
+from core.apis.live import RESYNC, publish_event
+from core.apis.timeseries import bucketed_sum
+
+# Entities with a growth chart, by name
+CREATION_MODELS = {model._meta.model_name: model for model in (Professionals, MobileUsers, Books, Events, Materials)}
+
+
+def transaction_day(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+def revenue_key(instance):
+    """
+    (day, type, status, amount) a transaction contributes to the rollups.
+    """
+    return transaction_day(instance.date_time), instance.type, instance.status, instance.amount
+
+def apply_revenue_delta(day, type, status, amount, count):
+    if not count and not amount:
+        return
+
+    DailyRevenueRollup.objects.get_or_create(day=day, type=type, status=status)
+    DailyRevenueRollup.objects.filter(day=day, type=type, status=status).update(amount=F('amount') + amount, count=F('count') + count)
+    publish_event('revenue', {"day": day, "type": type, "status": status, "amount": amount, "count": count})
+
+def revenue_groups(queryset):
+    """
+    Rollup rows of a Transactions queryset, computed with one grouped query.
+    """
+    return list(
+        queryset.annotate(day=TruncDate('date_time', tzinfo=timezone.get_current_timezone()))
+        .values('day', 'type', 'status')
+        .annotate(amount=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+
+def apply_revenue_groups(groups, sign=1):
+    for group in groups:
+        apply_revenue_delta(group['day'], group['type'], group['status'], sign * group['amount'], sign * group['count'])
+
+def apply_revenue_objects(objs, sign=1):
+    groups = defaultdict(lambda: [0.0, 0])
+    for obj in objs:
+        day, type, status, amount = revenue_key(obj)
+        groups[(day, type, status)][0] += amount
+        groups[(day, type, status)][1] += 1
+
+    for (day, type, status), (amount, count) in groups.items():
+        apply_revenue_delta(day, type, status, sign * amount, sign * count)
+
+def rebuild_revenue_rollups():
+    """
+    Recompute every rollup row from Transactions (first deployment, drift).
+    """
+    with transaction.atomic():
+        DailyRevenueRollup.objects.all().delete()
+        rows = DailyRevenueRollup.objects.bulk_create([DailyRevenueRollup(**group) for group in revenue_groups(Transactions.objects.all())], batch_size=1000)
+        # The cached revenue results are keyed on the Transactions version
+        bump_model_version(Transactions)
+        publish_event(RESYNC, {})
+
+    return len(rows)
+
+def check_revenue_rollups(tolerance=1e-6):
+    """
+    Rollup rows that disagree with Transactions, as dicts with the expected and stored values.
+    """
+    expected = {(group['day'], group['type'], group['status']): (group['amount'], group['count']) for group in revenue_groups(Transactions.objects.all())}
+    stored = {(row.day, row.type, row.status): (row.amount, row.count) for row in DailyRevenueRollup.objects.all()}
+
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys()):
+        expected_amount, expected_count = expected.get(key, (0.0, 0))
+        stored_amount, stored_count = stored.get(key, (0.0, 0))
+        if expected_count != stored_count or abs(expected_amount - stored_amount) > tolerance:
+            mismatches.append({
+                "day": key[0], "type": key[1], "status": key[2],
+                "expected_amount": expected_amount, "stored_amount": stored_amount,
+                "expected_count": expected_count, "stored_count": stored_count,
+            })
+
+    return mismatches
+
+def apply_creation_delta(model, day, count):
+    entity = model._meta.model_name
+    DailyCreationRollup.objects.get_or_create(entity=entity, day=day)
+    DailyCreationRollup.objects.filter(entity=entity, day=day).update(count=F('count') + count)
+
+def creation_groups(model):
+    return list(
+        model.objects.annotate(day=TruncDate('created_on', tzinfo=timezone.get_current_timezone()))
+        .values('day')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+def rebuild_creation_rollups():
+    """
+    Recompute the creation rollups of every entity from its table (first deployment, drift).
+    """
+    count = 0
+    with transaction.atomic():
+        DailyCreationRollup.objects.all().delete()
+        for entity, model in CREATION_MODELS.items():
+            rows = DailyCreationRollup.objects.bulk_create([DailyCreationRollup(entity=entity, **group) for group in creation_groups(model)], batch_size=1000)
+            # The cached growth charts are keyed on the entity's version
+            bump_model_version(model)
+            count += len(rows)
+
+    return count
+
+def creation_series(model, start, end, granularity, previous_start=None):
+    """
+    Rows of `model` created per bucket, see bucketed_sum.
+    """
+    rollups = DailyCreationRollup.objects.filter(entity=model._meta.model_name)
+    return bucketed_sum(rollups, 'day', 'count', start, end, granularity, previous_start, zero=0)
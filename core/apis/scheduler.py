@@ -0,0 +1,72 @@
+import calendar
+import datetime
+from urllib.parse import urljoin
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Local imports
+from core.models import NotificationDispatchJob, Notifications
+
+
+def next_occurrence(when, recurrence):
+    """
+    Next send time of a recurring notification, None for one-off notifications.
+    Monthly recurrences keep their day of month, clamped to the length of the month.
+    """
+    if recurrence == 'daily':
+        return when + datetime.timedelta(days=1)
+
+    if recurrence == 'weekly':
+        return when + datetime.timedelta(days=7)
+
+    if recurrence == 'monthly':
+        year, month = (when.year + 1, 1) if when.month == 12 else (when.year, when.month + 1)
+        day = min(when.day, calendar.monthrange(year, month)[1])
+        return when.replace(year=year, month=month, day=day)
+
+    return None
+
+def next_future_occurrence(when, recurrence, now):
+    """
+    First occurrence after `now`, occurrences missed while the scheduler was down are skipped.
+    """
+    when = next_occurrence(when, recurrence)
+    while when is not None and when <= now:
+        when = next_occurrence(when, recurrence)
+
+    return when
+
+def scheduled_notifications():
+    return Notifications.objects.filter(status='pending', scheduled_for__isnull=False)
+
+def next_due_time():
+    """
+    Send time of the next scheduled notification, one read of the (status, scheduled_for) index.
+    """
+    return scheduled_notifications().order_by('scheduled_for').values_list('scheduled_for', flat=True).first()
+
+def absolute_media_url(file):
+    return urljoin(settings.SITE_URL, file.url) if file else None
+
+def release_due_notifications(now=None, limit=100):
+    """
+    Hand the notifications due at `now` to the dispatch queue, returns the queued jobs.
+
+    Each notification is claimed by moving its `scheduled_for` forward (to the next
+    occurrence, or None) with a conditional UPDATE in the same transaction as the job
+    creation, so neither concurrent schedulers nor a restart can send an occurrence twice.
+    """
+    now = now or timezone.now()
+    due = scheduled_notifications().filter(scheduled_for__lte=now).order_by('scheduled_for')[:limit]
+
+    jobs = []
+    for notification in due:
+        scheduled_for = next_future_occurrence(notification.scheduled_for, notification.recurrence, now)
+
+        with transaction.atomic():
+            claimed = Notifications.objects.filter(id=notification.id, status='pending', scheduled_for=notification.scheduled_for).update(scheduled_for=scheduled_for, last_edited=now)
+            if claimed:
+                jobs.append(NotificationDispatchJob.objects.create(notification=notification, image_url=absolute_media_url(notification.payload_image)))
+
+    return jobs
@@ -0,0 +1,192 @@
+import logging
+import re
+from functools import reduce
+from operator import or_
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Local imports
+from core.models import Books, Events, Materials, MobileUsers, Notifications, Professionals, Transactions
+
+logger = logging.getLogger(__name__)
+
+# Model -> text fields its search box matches
+SEARCH_INDEXES = {
+    Professionals: ('name',),
+    Books: ('name',),
+    Events: ('title', 'location'),
+    Materials: ('supplier_name', 'type'),
+    MobileUsers: ('first_name', 'email'),
+    Transactions: ('user_involved',),
+    Notifications: ('title', 'body'),
+}
+
+# Entity name of the search endpoint -> model
+SEARCH_ENTITIES = {model._meta.model_name: model for model in SEARCH_INDEXES}
+
+# Same word characters as the unicode61 tokenizer: letters and digits, '_' separates words
+TOKEN = re.compile(r'[^\W_]+')
+
+# Triggers keeping a full-text table in step, named "<table>_<trigger>"
+TRIGGERS = ('insert', 'delete', 'update')
+
+# Databases -> full-text tables found in them with all their triggers, read once per process
+_tables = {}
+
+
+def fts_table(model):
+    return f"{model._meta.db_table}_fts"
+
+def fts_columns(model):
+    return [model._meta.get_field(name).column for name in SEARCH_INDEXES[model]]
+
+def match_query(text):
+    """
+    FTS5 query matching the rows having a word starting with each word of `text`
+    ('jo sm' -> '"jo"* "sm"*'), None when `text` has no word. The words are quoted,
+    the FTS5 operators typed in a search box are plain text.
+    """
+    tokens = TOKEN.findall(text or '')
+    if not tokens:
+        return None
+
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def trigger_names(table):
+    return {f"{table}_{trigger}" for trigger in TRIGGERS}
+
+def full_text_schema(cursor):
+    """
+    ({full-text tables}, {triggers}) of the database.
+    """
+    cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE '%\\_fts%' ESCAPE '\\'")
+    rows = cursor.fetchall()
+    return {name for type, name in rows if type == 'table'}, {name for type, name in rows if type == 'trigger'}
+
+def full_text_tables(using=DEFAULT_DB_ALIAS):
+    """
+    Full-text tables in sync with their model's table: a table missing one of its triggers
+    (dropped when a migration rebuilds the model's table) is ignored until ensure_search_indexes.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return set()
+
+    if using not in _tables:
+        with connection.cursor() as cursor:
+            tables, triggers = full_text_schema(cursor)
+        _tables[using] = {table for table in tables if trigger_names(table) <= triggers}
+
+    return _tables[using]
+
+def has_full_text(model, using=DEFAULT_DB_ALIAS):
+    return fts_table(model) in full_text_tables(using)
+
+def icontains_filter(model, text):
+    return reduce(or_, (Q(**{f"{name}__icontains": text}) for name in SEARCH_INDEXES[model]))
+
+def search_filter(model, text, using=DEFAULT_DB_ALIAS):
+    """
+    Q of the rows of `model` matching a search box.
+
+    Through the model's FTS5 index where there is one: every word of `text` must start a
+    word of one of the indexed fields, case and accent insensitive. Elsewhere (other
+    databases, index not built yet, `text` without any word) the fields `icontains` `text`.
+    """
+    query = match_query(text)
+    if query is None or not has_full_text(model, using):
+        return icontains_filter(model, text)
+
+    table = fts_table(model)
+    return Q(id__in=RawSQL(f'SELECT rowid FROM "{table}" WHERE "{table}" MATCH %s', (query,)))
+
+def ranked_search(model, text, limit, using=DEFAULT_DB_ALIAS):
+    """
+    [(id, rank)] of the best `limit` matches of `text`, best first (bm25, lower is better).
+    Without a full-text index the matches come by id, without a rank.
+    """
+    query = match_query(text)
+    if query is None or not has_full_text(model, using):
+        ids = model.objects.using(using).filter(icontains_filter(model, text)).order_by('id').values_list('id', flat=True)[:limit]
+        return [(id, None) for id in ids]
+
+    table = fts_table(model)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'SELECT rowid, rank FROM "{table}" WHERE "{table}" MATCH %s ORDER BY rank LIMIT %s', (query, limit))
+        return cursor.fetchall()
+
+def full_text_statements(table, content, columns):
+    """
+    Statements creating the external-content FTS5 `table` of the `columns` of `content` and the
+    triggers keeping it in step with every write to `content`, ORM or not (bulk_create,
+    queryset.update, raw SQL). The table only stores the index, the text is read from `content`.
+    """
+    names = ', '.join(f'"{column}"' for column in columns)
+    new = ', '.join(f'new."{column}"' for column in columns)
+    old = ', '.join(f'old."{column}"' for column in columns)
+
+    insert = f'INSERT INTO "{table}"(rowid, {names}) VALUES (new.id, {new});'
+    delete = f'INSERT INTO "{table}"("{table}", rowid, {names}) VALUES (\'delete\', old.id, {old});'
+
+    return [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS "{table}" USING fts5({names}, content="{content}", content_rowid="id", '
+        f'tokenize="unicode61 remove_diacritics 2", prefix="2 3")',
+        f'CREATE TRIGGER IF NOT EXISTS "{table}_insert" AFTER INSERT ON "{content}" BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS "{table}_delete" AFTER DELETE ON "{content}" BEGIN {delete} END',
+        # Only the updates of the indexed columns touch the index
+        f'CREATE TRIGGER IF NOT EXISTS "{table}_update" AFTER UPDATE OF {names} ON "{content}" BEGIN {delete} {insert} END',
+    ]
+
+def drop_full_text(model, cursor):
+    table = fts_table(model)
+    for trigger in trigger_names(table):
+        cursor.execute(f'DROP TRIGGER IF EXISTS "{trigger}"')
+    cursor.execute(f'DROP TABLE IF EXISTS "{table}"')
+
+def ensure_search_indexes(using=DEFAULT_DB_ALIAS, rebuild=False, recreate=False):
+    """
+    Create the missing full-text indexes and triggers, and fill the indexes from the existing
+    rows, the triggers maintain them afterwards. An index that lost a trigger (SQLite migrations
+    rebuild the altered tables, without their triggers) missed writes: it is refilled too.
+    `rebuild` refills all of them, `recreate` drops and recreates them (after a change of
+    SEARCH_INDEXES). Returns the names of the indexes filled.
+    No-op on other databases than SQLite, the searches use icontains there.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+
+    filled = []
+    try:
+        with connection.cursor() as cursor:
+            tables, triggers = full_text_schema(cursor)
+            for model in SEARCH_INDEXES:
+                table = fts_table(model)
+                if recreate:
+                    drop_full_text(model, cursor)
+
+                complete = table in tables and trigger_names(table) <= triggers
+                if recreate or not complete:
+                    for statement in full_text_statements(table, model._meta.db_table, fts_columns(model)):
+                        cursor.execute(statement)
+                elif not rebuild:
+                    continue
+
+                cursor.execute(f'INSERT INTO "{table}"("{table}") VALUES (\'rebuild\')')
+                filled.append(table)
+    except OperationalError:
+        # SQLite built without FTS5, the searches keep using icontains
+        logger.exception("Could not create the full-text search indexes")
+    finally:
+        _tables.pop(using, None)
+
+    return filled
+
+def search_results(model, text, limit):
+    """
+    The best `limit` matches of `text` with their indexed fields and rank, best first.
+    """
+    ranked = ranked_search(model, text, limit)
+    rows = {row['id']: row for row in model.objects.filter(id__in=[id for id, _ in ranked]).values('id', *SEARCH_INDEXES[model])}
+    return [{**rows[id], "rank": rank} for id, rank in ranked if id in rows]
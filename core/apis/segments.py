@@ -0,0 +1,127 @@
+import datetime
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Local imports
+from core.models import MobileUsers, SegmentMembership
+
+ALL_USERS = 'all users'
+ACTIVE_USERS = 'active users'
+DORMANT_USERS = 'dormant users'
+NEW_USERS = 'new users'
+REGISTERED_BETWEEN = 'registered between'
+
+
+def compute_user_segments(user, last_seen_on, now=None):
+    """
+    Segments a mobile user belongs to, none for deactivated users.
+    'registered between' is resolved from the 'all users' rows, it has no rows of its own.
+    """
+    if not user.is_active:
+        return set()
+
+    now = now or timezone.now()
+    segments = {ALL_USERS}
+
+    if last_seen_on and last_seen_on >= now - datetime.timedelta(days=settings.SEGMENT_ACTIVE_DAYS):
+        segments.add(ACTIVE_USERS)
+    else:
+        segments.add(DORMANT_USERS)
+
+    if user.created_on >= now - datetime.timedelta(days=settings.SEGMENT_NEW_USER_DAYS):
+        segments.add(NEW_USERS)
+
+    return segments
+
+def refresh_user_segments(user, now=None):
+    """
+    Bring the segment rows of one user up to date, called when a MobileUsers row is saved.
+    """
+    last_seen_on = user.user.last_login
+    segments = compute_user_segments(user, last_seen_on, now)
+
+    with transaction.atomic():
+        SegmentMembership.objects.filter(user=user).exclude(segment__in=segments).delete()
+        for segment in segments:
+            SegmentMembership.objects.update_or_create(
+                segment=segment,
+                user=user,
+                defaults={"fcm_token": user.fcm_token, "registered_on": user.created_on, "last_seen_on": last_seen_on},
+            )
+
+def remove_users_from_segments(user_ids):
+    """
+    Bulk counterpart of refresh_user_segments for queryset.update(is_active=False).
+    """
+    return SegmentMembership.objects.filter(user_id__in=user_ids).delete()[0]
+
+def forget_fcm_tokens(tokens):
+    """
+    Bulk counterpart of refresh_user_segments for pruned FCM tokens.
+    """
+    return SegmentMembership.objects.filter(fcm_token__in=tokens).update(fcm_token=None)
+
+def refresh_time_segments(now=None):
+    """
+    Move the users who crossed a time boundary since the last run: new users older than
+    SEGMENT_NEW_USER_DAYS leave 'new users', active users unseen for SEGMENT_ACTIVE_DAYS
+    become dormant. Only the crossing rows are touched, through the segment indexes.
+    """
+    now = now or timezone.now()
+    new_user_cutoff = now - datetime.timedelta(days=settings.SEGMENT_NEW_USER_DAYS)
+    active_cutoff = now - datetime.timedelta(days=settings.SEGMENT_ACTIVE_DAYS)
+
+    with transaction.atomic():
+        expired_new_users = SegmentMembership.objects.filter(segment=NEW_USERS, registered_on__lt=new_user_cutoff).delete()[0]
+
+        now_dormant = SegmentMembership.objects.filter(segment=ACTIVE_USERS, last_seen_on__lt=active_cutoff)
+        SegmentMembership.objects.bulk_create(
+            [
+                SegmentMembership(segment=DORMANT_USERS, user_id=row.user_id, fcm_token=row.fcm_token, registered_on=row.registered_on, last_seen_on=row.last_seen_on)
+                for row in now_dormant
+            ],
+            ignore_conflicts=True,
+        )
+        dormant_count = now_dormant.delete()[0]
+
+    return {"new users expired": expired_new_users, "active users now dormant": dormant_count}
+
+def rebuild_segments(batch_size=1000):
+    """
+    Recompute every segment row from MobileUsers, in batches of `batch_size` users.
+    """
+    now = timezone.now()
+    count = 0
+    SegmentMembership.objects.all().delete()
+
+    users = MobileUsers.objects.filter(is_active=True).select_related('user').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(users.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return count
+
+        rows = []
+        for user in batch:
+            last_seen_on = user.user.last_login
+            for segment in compute_user_segments(user, last_seen_on, now):
+                rows.append(SegmentMembership(segment=segment, user=user, fcm_token=user.fcm_token, registered_on=user.created_on, last_seen_on=last_seen_on))
+        SegmentMembership.objects.bulk_create(rows, batch_size=batch_size)
+
+        count += len(rows)
+        last_id = batch[-1].id
+
+def segment_members(recipient_type, registered_from=None, registered_to=None):
+    """
+    Membership rows of a notification recipient type.
+    """
+    if recipient_type == REGISTERED_BETWEEN:
+        if not registered_from or not registered_to:
+            return SegmentMembership.objects.none()
+
+        start = timezone.make_aware(datetime.datetime.combine(registered_from, datetime.time.min))
+        end = timezone.make_aware(datetime.datetime.combine(registered_to + datetime.timedelta(days=1), datetime.time.min))
+        return SegmentMembership.objects.filter(segment=ALL_USERS, registered_on__gte=start, registered_on__lt=end)
+
+    return SegmentMembership.objects.filter(segment=recipient_type)
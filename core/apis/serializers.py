@@ -5,13 +5,22 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 # Third party imports
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
 
 # Local imports
-from core.models import Books, CustomUser, AdminUsers, Events, Materials, MobileUsers, Notifications, Professionals, ProReview, Transactions
+from core.models import ActivityLog, Books, CustomUser, AdminUsers, Events, Materials, MobileUsers, Notifications, Professionals, ProReview, Transactions
+from core.apis.timeseries import add_months, bucket_count
+from core.apis.rollups import CREATION_MODELS
+from core.apis.distribution import DISTRIBUTIONS
+from core.apis.analytics import GROUP_BY_CHOICES
+from core.apis.search import SEARCH_ENTITIES
+from core.apis.autocomplete import AUTOCOMPLETE_FIELDS
 
 # Create your serializers here
 
@@ -172,6 +181,12 @@ class ProfessionalsDeleteSerializer(serializers.Serializer):
     ids = serializers.ListField(child=serializers.IntegerField())
 
 
+class ProfessionalsAutocompleteSerializer(serializers.Serializer):
+    q = serializers.CharField(default="", allow_blank=True, trim_whitespace=False)
+    field = serializers.ChoiceField(choices=AUTOCOMPLETE_FIELDS, required=False)
+    limit = serializers.IntegerField(default=10, validators=[MinValueValidator(1), MaxValueValidator(50)])
+
+
 class ProfessionalsUpdateSerializer(serializers.ModelSerializer):
     review = serializers.CharField(write_only=True)
     rating = serializers.IntegerField(write_only=True)
@@ -371,56 +386,202 @@ class  ProfessionalsGrowthChartSerializer(serializers.Serializer):
     )
 
 
-class RevenueGrowthSerializer(serializers.Serializer):
+class BucketedRangeMixin:
+    """
+    Optional from_date/to_date range split in day, week or month buckets (granularity).
+    """
+    GRANULARITY_CHOICES = [('day', 'Day'), ('week', 'Week'), ('month', 'Month')]
+    MAX_BUCKETS = 1000
+
+    def validate_range(self, attrs):
+        """
+        Returns True if a range was given.
+        """
+        from_date = attrs.get("from_date")
+        to_date = attrs.get("to_date")
+
+        if not from_date and not to_date:
+            return False
+
+        if not from_date or not to_date:
+            raise serializers.ValidationError("both 'from_date' and 'to_date' is required")
+
+        if from_date > to_date:
+            raise serializers.ValidationError({"to_date": "'to_date' must be on or after 'from_date'"})
+
+        # Default granularity keeps long ranges to a readable number of points
+        days = (to_date - from_date).days + 1
+        granularity = attrs.setdefault("granularity", 'day' if days <= 31 else 'week' if days <= 366 else 'month')
+        if bucket_count(from_date, to_date, granularity) > self.MAX_BUCKETS:
+            raise serializers.ValidationError({"granularity": f"Too many {granularity} buckets for this range, max {self.MAX_BUCKETS}"})
+
+        return True
+
+
+class RevenueGrowthSerializer(BucketedRangeMixin, serializers.Serializer):
     PERIODS_CHOICES = [('weekly', 'Weekly'), ('monthly', 'Monthly'), ('yearly', 'Yearly')]
-    periods = serializers.ChoiceField(choices=PERIODS_CHOICES)
 
+    periods = serializers.ChoiceField(choices=PERIODS_CHOICES, required=False)
+    from_date = serializers.DateField(required=False, allow_null=True)
+    to_date = serializers.DateField(required=False, allow_null=True)
+    granularity = serializers.ChoiceField(choices=BucketedRangeMixin.GRANULARITY_CHOICES, required=False)
 
-class ProfessionalsActivitySerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Professionals
-        fields = '__all__'
-    
-    
-class BooksActivitySerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Books
-        fields = "__all__"
+    def validate(self, attrs):
+        if not self.validate_range(attrs) and not attrs.get("periods"):
+            raise serializers.ValidationError({"periods": "This field is required."})
 
-    
-class MaterialsActivitySerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Materials
-        fields = "__all__"
+        return attrs
 
-    
-class EventsActivitySerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Events
-        fields = "__all__"
 
+class GrowthChartSerializer(BucketedRangeMixin, serializers.Serializer):
+    entity = serializers.ChoiceField(choices=sorted(CREATION_MODELS))
+    months = serializers.IntegerField(required=False, validators=[MinValueValidator(1), MaxValueValidator(120)])
+    from_date = serializers.DateField(required=False, allow_null=True)
+    to_date = serializers.DateField(required=False, allow_null=True)
+    granularity = serializers.ChoiceField(choices=BucketedRangeMixin.GRANULARITY_CHOICES, required=False)
+
+    def validate(self, attrs):
+        if not self.validate_range(attrs):
+            # Trailing months, the current one included
+            today = timezone.localdate()
+            attrs["from_date"] = add_months(today.replace(day=1), 1 - attrs.get("months", 12))
+            attrs["to_date"] = today
+            attrs.setdefault("granularity", 'month')
+
+        return attrs
+
+
+class DashboardSummarySerializer(serializers.Serializer):
+    WIDGET_CHOICES = ['key_matrix_statistics', 'professionals_growth_chart', 'revenue_growth_chart', 'activity_timeline', 'materials_distribution']
+
+    widgets = serializers.CharField(required=False, help_text="Comma separated, all widgets by default")
+    months = serializers.IntegerField(default=12, validators=[MinValueValidator(1), MaxValueValidator(12)])
+    periods = serializers.ChoiceField(choices=RevenueGrowthSerializer.PERIODS_CHOICES, default='monthly')
+    page_size = serializers.IntegerField(default=20, min_value=1, max_value=100)
+
+    def validate_widgets(self, value):
+        widgets = list(dict.fromkeys(widget.strip() for widget in value.split(',') if widget.strip()))
+        unknown = [widget for widget in widgets if widget not in self.WIDGET_CHOICES]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown widgets: {', '.join(unknown)}")
+
+        return widgets
+
+    def validate(self, attrs):
+        attrs["widgets"] = attrs.get("widgets") or self.WIDGET_CHOICES
+        return attrs
+
+
+class DistributionSerializer(serializers.Serializer):
+    field = serializers.ChoiceField(choices=sorted(DISTRIBUTIONS))
+    top = serializers.IntegerField(required=False, allow_null=True, min_value=1, max_value=100)
+
+
+class TransactionAnalyticsSerializer(BucketedRangeMixin, serializers.Serializer):
+    REPORT_CHOICES = [('breakdown', 'Breakdown'), ('series', 'Series'), ('cohorts', 'Cohorts')]
+
+    report = serializers.ChoiceField(choices=REPORT_CHOICES, default='breakdown')
+    from_date = serializers.DateField(required=False, allow_null=True)
+    to_date = serializers.DateField(required=False, allow_null=True)
+    granularity = serializers.ChoiceField(choices=BucketedRangeMixin.GRANULARITY_CHOICES, required=False)
+    type = serializers.ChoiceField(choices=Transactions.TYPE_CHOICES, required=False)
+    status = serializers.ChoiceField(choices=Transactions.STATUS_CHOICES, required=False)
+    group_by = serializers.CharField(required=False, help_text="Comma separated: type, status")
+    percentiles = serializers.CharField(default="50,90,99", help_text="Comma separated, 0 to 100")
+    window = serializers.IntegerField(required=False, validators=[MinValueValidator(2), MaxValueValidator(365)])
+    months = serializers.IntegerField(default=12, validators=[MinValueValidator(1), MaxValueValidator(36)])
+
+    def validate_group_by(self, value):
+        group_by = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in group_by if name not in GROUP_BY_CHOICES]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown columns: {', '.join(unknown)}")
+
+        return group_by
+
+    def validate_percentiles(self, value):
+        try:
+            percentiles = sorted({float(percentile) for percentile in value.split(',') if percentile.strip()})
+        except ValueError:
+            raise serializers.ValidationError("Must be comma separated numbers")
+
+        if any(not 0 <= percentile <= 100 for percentile in percentiles):
+            raise serializers.ValidationError("Percentiles must be between 0 and 100")
+
+        return percentiles
+
+    def validate(self, attrs):
+        report = attrs["report"]
+        granularity = attrs.get("granularity")
+        has_range = self.validate_range(attrs)
+
+        if report == 'series':
+            if not has_range:
+                raise serializers.ValidationError({"from_date": "A from_date/to_date range is required for the series report."})
+            return {name: attrs[name] for name in ('report', 'from_date', 'to_date', 'granularity', 'type', 'status', 'window') if attrs.get(name)}
+
+        filters = {name: attrs[name] for name in ('from_date', 'to_date', 'type', 'status') if attrs.get(name)}
+        if report == 'cohorts':
+            return {"report": report, "months": attrs["months"], **filters}
+
+        # The breakdown is only bucketed on request
+        breakdown = {"report": report, "group_by": tuple(attrs.get("group_by", ())), "percentiles": tuple(attrs["percentiles"]), **filters}
+        if granularity:
+            breakdown["granularity"] = granularity
+        return breakdown
+
+
+class ActivityLogSerializer(serializers.ModelSerializer):
+    type = serializers.CharField(source='entity_type')
+    data = serializers.JSONField(source='summary')
 
-class MobileUsersActivitySerializer(serializers.ModelSerializer):
     class Meta:
-        model = MobileUsers
-        exclude = ['user', 'is_active']
+        model = ActivityLog
+        fields = ['id', 'type', 'entity_id', 'action', 'data', 'created_on']
+
+
+class NotificationsValidationMixin:
+    def check_recipient_range(self, data):
+        recipient = data.get("recipient", getattr(self.instance, "recipient", None))
+        registered_from = data.get("registered_from", getattr(self.instance, "registered_from", None))
+        registered_to = data.get("registered_to", getattr(self.instance, "registered_to", None))
 
+        if recipient == "registered between":
+            if not registered_from or not registered_to:
+                raise serializers.ValidationError("both 'registered_from' and 'registered_to' is required")
+            if registered_from > registered_to:
+                raise serializers.ValidationError({"registered_to": "'registered_to' must be after 'registered_from'"})
 
-class NotificationsCreateSerializer(serializers.ModelSerializer):
+        return data
+
+    def check_schedule(self, data):
+        recurrence = data.get("recurrence", getattr(self.instance, "recurrence", "none"))
+        scheduled_for = data.get("scheduled_for", getattr(self.instance, "scheduled_for", None))
+
+        if recurrence != "none" and not scheduled_for:
+            raise serializers.ValidationError({"scheduled_for": "A recurring notification needs a 'scheduled_for' date."})
+
+        return data
+
+
+class NotificationsCreateSerializer(NotificationsValidationMixin, serializers.ModelSerializer):
     class Meta:
         model = Notifications
-        fields = ["title", "recipient", "status", "body", "image"]
+        fields = ["title", "recipient", "registered_from", "registered_to", "status", "body", "image", "scheduled_for", "recurrence"]
 
         extra_kwargs = {
             "status": {"required": True}
         }
 
+    def validate(self, data):
+        return self.check_schedule(self.check_recipient_range(data))
+
 
 # NOTIFICATIONS MODULE SERIALIZERS *******
 class NotificationsListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notifications
-        fields = ["id", "created_on", "title", "recipient", "body", "status"]
+        fields = ["id", "created_on", "title", "recipient", "body", "status", "scheduled_for", "recurrence", "last_sent_on"]
 
 
 class NotificationsListCheckSerializer(serializers.Serializer):
@@ -440,17 +601,37 @@ class NotificationsListCheckSerializer(serializers.Serializer):
         return attrs
 
 
-class NotificationsRetrieveUpdateSerializer(serializers.ModelSerializer):
+class NotificationsRetrieveUpdateSerializer(NotificationsValidationMixin, serializers.ModelSerializer):
+    delivery = serializers.SerializerMethodField()
+
     class Meta:
         model = Notifications
-        fields = ["recipient", "title", "body","status"]
+        fields = ["recipient", "registered_from", "registered_to", "title", "body","status", "scheduled_for", "recurrence", "last_sent_on", "delivery"]
+        read_only_fields = ["last_sent_on"]
 
         extra_kwargs = {
             "status": {"required": True}
         }
 
+    def get_delivery(self, obj):
+        return obj.receipts.aggregate(
+            success_count=Coalesce(Sum("success_count"), 0),
+            failure_count=Coalesce(Sum("failure_count"), 0),
+            pruned_count=Coalesce(Sum("pruned_count"), 0),
+        )
+
     def validate(self, data):
         instance = self.instance
         if instance and instance.status=='sent':
             raise serializers.ValidationError({"status": "Notification has already been sent and cannot be edited."}) 
-        return data
\ No newline at end of file
+        if instance and instance.status=='sending':
+            raise serializers.ValidationError({"status": "Notification is being sent and cannot be edited."})
+
+        return self.check_schedule(self.check_recipient_range(data))
+
+
+# SEARCH SERIALIZERS *******
+class SearchSerializer(serializers.Serializer):
+    entity = serializers.ChoiceField(choices=list(SEARCH_ENTITIES))
+    q = serializers.CharField()
+    limit = serializers.IntegerField(default=10, validators=[MinValueValidator(1), MaxValueValidator(50)])
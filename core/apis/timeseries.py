@@ -0,0 +1,107 @@
+import datetime
+from django.db.models import BooleanField, Case, DateTimeField, Sum, Value, When
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def local_date(value):
+    if not isinstance(value, datetime.datetime):
+        return value
+
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+
+def day_start(date):
+    """
+    Aware datetime of the start of `date` in the current timezone.
+    """
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+def add_months(date, months):
+    month = date.month - 1 + months
+    return date.replace(year=date.year + month // 12, month=month % 12 + 1, day=1)
+
+def bucket_start(date, granularity):
+    if granularity == 'week':
+        return date - datetime.timedelta(days=date.weekday())
+
+    if granularity == 'month':
+        return date.replace(day=1)
+
+    return date
+
+def next_bucket(date, granularity):
+    if granularity == 'week':
+        return date + datetime.timedelta(days=7)
+
+    if granularity == 'month':
+        return add_months(date, 1)
+
+    return date + datetime.timedelta(days=1)
+
+def iter_buckets(start, end, granularity):
+    """
+    Start dates of the buckets covering `start` to `end` (dates, both included).
+    """
+    current = bucket_start(start, granularity)
+    while current <= end:
+        yield current
+        current = next_bucket(current, granularity)
+
+def bucket_count(start, end, granularity):
+    return sum(1 for _ in iter_buckets(start, end, granularity))
+
+def bucketed_sum(queryset, date_field, value_field, start, end, granularity, previous_start=None, zero=0.0):
+    """
+    Sum of `value_field` per bucket from `start` to `end` (dates, both included), one grouped query.
+
+    With `previous_start` the previous period, `previous_start` up to `start`, is summed in
+    the same pass for the comparison. Returns (series, total, previous_total), series is a
+    list of (bucket start, sum) with empty buckets filled with `zero`.
+    """
+    # Datetimes are bucketed in the current timezone, date fields (rollups) as they are
+    is_datetime = isinstance(queryset.model._meta.get_field(date_field), DateTimeField)
+    boundary = day_start if is_datetime else (lambda date: date)
+    tzinfo = timezone.get_current_timezone() if is_datetime else None
+
+    current_start = boundary(start)
+    rows = (
+        queryset.filter(**{f'{date_field}__gte': boundary(previous_start or start), f'{date_field}__lt': boundary(end + datetime.timedelta(days=1))})
+        .annotate(
+            bucket=Trunc(date_field, granularity, tzinfo=tzinfo),
+            current=Case(When(**{f'{date_field}__gte': current_start}, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        )
+        .values('current', 'bucket')
+        .annotate(value=Sum(value_field))
+        .order_by()
+    )
+
+    sums = {}
+    total = previous_total = zero
+    for row in rows:
+        if row['current']:
+            bucket = local_date(row['bucket'])
+            sums[bucket] = sums.get(bucket, zero) + row['value']
+            total += row['value']
+        else:
+            previous_total += row['value']
+
+    series = [(bucket, sums.get(bucket, zero)) for bucket in iter_buckets(start, end, granularity)]
+    return series, total, previous_total
+
+def fold_series(series, size):
+    """
+    Merge consecutive buckets `size` by `size`, e.g. days into 7 day blocks.
+    Returns a list of (first bucket, last bucket, sum).
+    """
+    return [
+        (chunk[0][0], chunk[-1][0], sum(value for _, value in chunk))
+        for chunk in (series[i:i + size] for i in range(0, len(series), size))
+    ]
+
+def percentage_change(current, previous):
+    if previous == 0:
+        return 100.0 if current > 0 else 0.0
+
+    return ((current - previous) / previous) * 100
@@ -4,7 +4,7 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
 # Local imports
-from core.apis.admin_dashboard_apis import ActivityTimelineView, AdminLoginView, AdminLogoutView, AdminAccountSettingsView, AdminSecurityView, BooksListCreateDeleteView, BooksRetriveUpdateDeleteView, EventsListCreateDeleteView, EventsRetriveUpdateDeleteView, KeyMatrixStatisticsView, MaterialsDistributionView, MaterialsListCreateDeleteView, MaterialsRetriveUpdateDeleteView, NotificationsFCMHTTPListCreateView, NotificationsFCMHTTPRetrieveUpdateDeleteView, ProfessionalsGrowthChartView, ProfessionalsListCreateDeleteView, ProfessionalsRetrieveUpdateDeleteView, RevenueGrowthView, TransactionListCreateUpdateView, UsersDetailView, UsersListDeleteView
+from core.apis.admin_dashboard_apis import ActivityTimelineView, AdminLoginView, AdminLogoutView, AdminAccountSettingsView, AdminSecurityView, BooksListCreateDeleteView, BooksRetriveUpdateDeleteView, DashboardStreamView, DashboardSummaryView, EventsListCreateDeleteView, EventsRetriveUpdateDeleteView, GrowthChartView, KeyMatrixStatisticsView, DistributionView, MaterialsDistributionView, MaterialsListCreateDeleteView, MaterialsRetriveUpdateDeleteView, NotificationsFCMHTTPListCreateView, NotificationsFCMHTTPRetrieveUpdateDeleteView, ProfessionalsAutocompleteView, ProfessionalsGrowthChartView, ProfessionalsListCreateDeleteView, ProfessionalsRetrieveUpdateDeleteView, RevenueGrowthView, SearchView, TransactionAnalyticsView, TransactionListCreateUpdateView, UsersDetailView, UsersListDeleteView
 
 urlpatterns = [
     # Admin management
@@ -15,9 +15,14 @@ urlpatterns = [
     # Admin dashboard
     path('dashboard/key_matrix_statistics', KeyMatrixStatisticsView.as_view()),
     path('dashboard/professionals_growth_chart', ProfessionalsGrowthChartView.as_view()),
+    path('dashboard/growth_chart', GrowthChartView.as_view()),
     path('dashboard/revenue_growth_chart', RevenueGrowthView.as_view()),
     path('dashboard/activity_timeline', ActivityTimelineView.as_view()),
     path('dashboard/materials_distribution', MaterialsDistributionView.as_view()),
+    path('dashboard/distribution', DistributionView.as_view()),
+    path('dashboard/summary', DashboardSummaryView.as_view()),
+    path('dashboard/stream', DashboardStreamView.as_view()),
+    path('dashboard/transaction_analytics', TransactionAnalyticsView.as_view()),
 
     # Settings
     path('account_settings', AdminAccountSettingsView.as_view()),
@@ -26,6 +31,7 @@ urlpatterns = [
     # Professionals
     path('professionals', ProfessionalsListCreateDeleteView.as_view()),
     path('professionals/<int:pk>', ProfessionalsRetrieveUpdateDeleteView.as_view()),
+    path('professionals/autocomplete', ProfessionalsAutocompleteView.as_view()),
     
 
     #Users
@@ -50,4 +56,7 @@ urlpatterns = [
     # Notifications
     path('notifications', NotificationsFCMHTTPListCreateView.as_view()),
     path('notifications/<int:pk>', NotificationsFCMHTTPRetrieveUpdateDeleteView.as_view()),
+
+    # Search
+    path('search', SearchView.as_view()),
 ]
\ No newline at end of file
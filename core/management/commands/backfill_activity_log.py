@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+# Local imports
+from core.apis.activity import backfill_activity_log
+
+
+class Command(BaseCommand):
+    help = "Log the entities created before the activity log existed, so the timeline covers them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = backfill_activity_log(batch_size=options['batch_size'])
+        self.stdout.write(f"Backfilled activity log: {count} entries")
@@ -0,0 +1,63 @@
+import time
+from django.core.management.base import BaseCommand
+
+# Local imports
+from core.apis.fcm_standin import FCMStandInServer
+from core.apis.firebase import FCM_TRANSPORT_HTTP_V1, FCMUnavailableError, build_fcm_payload, send_fcm_notification
+
+# Third party imports
+import requests
+
+
+class Command(BaseCommand):
+    help = "Benchmark FCM fan-out throughput against the local FCM stand-in server."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=2000)
+        parser.add_argument('--invalid-ratio', type=float, default=0.1, help="Share of tokens the stand-in answers with UNREGISTERED.")
+        parser.add_argument('--latency', type=float, default=0.02, help="Simulated FCM round-trip in seconds.")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests failed with --error-status.")
+        parser.add_argument('--error-status', type=int, choices=[429, 503], default=503)
+        parser.add_argument('--retry-after', type=int, default=None, help="Retry-After seconds sent with injected errors.")
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 32, 64])
+        parser.add_argument('--skip-baseline', action='store_true', help="Skip the old one-connection-per-request loop.")
+
+    def handle(self, *args, **options):
+        count = options['tokens']
+        invalid_every = int(1 / options['invalid_ratio']) if options['invalid_ratio'] > 0 else 0
+        tokens = [
+            f"invalid-{i}" if invalid_every and i % invalid_every == 0 else f"token-{i}"
+            for i in range(count)
+        ]
+
+        server = FCMStandInServer(latency=options['latency'], error_rate=options['error_rate'], error_status=options['error_status'], retry_after=options['retry_after']).start()
+        try:
+            if not options['skip_baseline']:
+                self.report("baseline (requests.post per token)", count, self.baseline(server.url, tokens))
+
+            for workers in options['workers']:
+                start = time.perf_counter()
+                try:
+                    summary = send_fcm_notification(tokens, "Benchmark", "Benchmark body", None, transport=FCM_TRANSPORT_HTTP_V1, max_workers=workers, access_token='benchmark', fcm_url=server.url)
+                except FCMUnavailableError as e:
+                    summary = e.summary
+                    self.stdout.write(f"    circuit breaker opened: {e}")
+                elapsed = time.perf_counter() - start
+
+                self.report(f"http_v1 pooled, {workers} in flight", count, elapsed)
+                self.stdout.write(f"    sent={summary.success_count} failed={summary.failure_count} errors={dict(summary.error_counts)}")
+        finally:
+            server.stop()
+
+    def baseline(self, url, tokens):
+        """
+        The previous sender: one blocking request, on a fresh connection, per token.
+        """
+        headers = {'Authorization': 'Bearer benchmark', 'Content-Type': 'application/json; UTF-8'}
+        start = time.perf_counter()
+        for token in tokens:
+            requests.post(url, headers=headers, json=build_fcm_payload(token, "Benchmark", "Benchmark body", None))
+        return time.perf_counter() - start
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label}: {count} tokens in {elapsed:.2f}s ({count / elapsed:.0f} msg/s)")
@@ -0,0 +1,110 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+
+# Local imports
+from core.apis.search import full_text_statements, match_query
+
+FIRST_NAMES = ['james', 'mary', 'arun', 'priya', 'kumar', 'lakshmi', 'john', 'fatima', 'wei', 'sofia', 'rahul', 'anita', 'david', 'meera', 'carlos', 'nimal']
+DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com', 'handybook.lk', 'example.org']
+
+
+class Command(BaseCommand):
+    help = "Benchmark the FTS5 search against icontains (LIKE '%x%') on a synthetic users table (1M rows by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per query, the best is reported.")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with tempfile.TemporaryDirectory() as directory:
+            connection = sqlite3.connect(os.path.join(directory, 'benchmark.db'), isolation_level=None)
+            connection.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, first_name TEXT NOT NULL, email TEXT NOT NULL)')
+
+            started = time.perf_counter()
+            connection.execute('BEGIN')
+            connection.executemany('INSERT INTO users (first_name, email) VALUES (?, ?)', self.synthetic_users(rows))
+            connection.execute('COMMIT')
+            self.stdout.write(f"{rows} synthetic users loaded in {time.perf_counter() - started:.2f}s")
+
+            plain = self.time_inserts(connection)
+
+            started = time.perf_counter()
+            for statement in full_text_statements('users_fts', 'users', ['first_name', 'email']):
+                connection.execute(statement)
+            connection.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+            self.stdout.write(f"Full-text index built in {time.perf_counter() - started:.2f}s, {self.index_size(connection) / 2**20:.0f} MiB")
+
+            indexed = self.time_inserts(connection)
+            self.stdout.write(f"1000 single-row inserts (save()): {plain[0] * 1000:.0f}ms without the index, {indexed[0] * 1000:.0f}ms through the sync triggers")
+            self.stdout.write(f"One 10000-row insert (bulk_create): {plain[1] * 1000:.0f}ms without the index, {indexed[1] * 1000:.0f}ms through the sync triggers")
+
+            for text in ('priya', 'pri', 'priya kumar42', 'handybook', 'zzz'):
+                self.compare(connection, text, options['repeat'])
+
+            connection.close()
+
+    def synthetic_users(self, rows, seed=0):
+        generator = random.Random(seed)
+        for _ in range(rows):
+            first_name = generator.choice(FIRST_NAMES).capitalize()
+            number = generator.randrange(100_000)
+            yield first_name, f"{first_name.lower()}.{generator.choice(FIRST_NAMES)}{number}@{generator.choice(DOMAINS)}"
+
+    def time_inserts(self, connection):
+        """
+        Seconds of 1000 single-row INSERT statements and of one 10000-row INSERT, rolled back.
+        """
+        timings = []
+        for rows, statements in ((1000, 1000), (10_000, 1)):
+            users = list(self.synthetic_users(rows, seed=1))
+            per_statement = rows // statements
+            values = ', '.join(['(?, ?)'] * per_statement)
+
+            started = time.perf_counter()
+            connection.execute('BEGIN')
+            for start in range(0, rows, per_statement):
+                params = [value for user in users[start:start + per_statement] for value in user]
+                connection.execute(f'INSERT INTO users (first_name, email) VALUES {values}', params)
+            connection.execute('ROLLBACK')
+            timings.append(time.perf_counter() - started)
+
+        return timings
+
+    def index_size(self, connection):
+        try:
+            return connection.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'users_fts%'").fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            # SQLite built without the dbstat table
+            return 0
+
+    def compare(self, connection, text, repeat):
+        """
+        The two queries of a searched list page, COUNT(*) and the first page by id, as the
+        ORM runs them with icontains and with search_filter.
+        """
+        like = f"%{text}%"
+        where_like = ('first_name LIKE ? OR email LIKE ?', (like, like))
+        where_fts = ('id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?)', (match_query(text),))
+
+        self.stdout.write(f"  search {text!r}:")
+        for label, (where, params) in (('icontains', where_like), ('fts5', where_fts)):
+            count, count_time = self.best(repeat, lambda: connection.execute(f'SELECT COUNT(*) FROM users WHERE {where}', params).fetchone()[0])
+            _, page_time = self.best(repeat, lambda: connection.execute(f'SELECT id FROM users WHERE {where} ORDER BY id LIMIT 10', params).fetchall())
+            self.stdout.write(f"    {label}: {count} rows, count {count_time * 1000:.1f}ms, first page {page_time * 1000:.1f}ms")
+
+        _, ranked_time = self.best(repeat, lambda: connection.execute('SELECT rowid FROM users_fts WHERE users_fts MATCH ? ORDER BY rank LIMIT 10', where_fts[1]).fetchall())
+        self.stdout.write(f"    fts5 ranked top 10: {ranked_time * 1000:.1f}ms")
+
+    def best(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = run()
+            timings.append(time.perf_counter() - started)
+
+        return result, min(timings)
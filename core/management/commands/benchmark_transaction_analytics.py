@@ -0,0 +1,68 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+# Local imports
+from core.models import Transactions
+from core.apis.analytics import TransactionColumns, TransactionStore, breakdown, cohorts, day_number, series
+
+# Third party imports
+import numpy as np
+
+
+class Command(BaseCommand):
+    help = "Benchmark the transaction analytics reports on synthetic columns (10M rows by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000)
+        parser.add_argument('--users', type=int, default=200_000)
+        parser.add_argument('--days', type=int, default=3 * 365, help="Days the synthetic transactions are spread over.")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per report, the best is reported.")
+        parser.add_argument('--load', action='store_true', help="Also time a full load of the Transactions table and the ORM GROUP BY on it.")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        today = timezone.localdate()
+        start = today - datetime.timedelta(days=options['days'] - 1)
+
+        started = time.perf_counter()
+        columns = self.synthetic_columns(rows, options['users'], day_number(start), options['days'])
+        self.stdout.write(f"{rows} synthetic rows, {sum(array.nbytes for array in (columns.days, columns.types, columns.statuses, columns.users, columns.amounts)) / 2**20:.0f} MiB, generated in {time.perf_counter() - started:.2f}s")
+
+        self.report("amount sort (once per snapshot)", rows, lambda: columns.amount_order())
+        self.report("breakdown by type, status", rows, lambda: breakdown(columns, ('type', 'status')), options['repeat'])
+        self.report("breakdown by status, month", rows, lambda: breakdown(columns, ('status',), 'month'), options['repeat'])
+        self.report("breakdown by day, completed payments", rows, lambda: breakdown(columns, (), 'day', type='payment', status='completed'), options['repeat'])
+        self.report("series by day, 7 day moving average", rows, lambda: series(columns, start, today, 'day', window=7), options['repeat'])
+        self.report("series by month, last year", rows, lambda: series(columns, today - datetime.timedelta(days=364), today, 'month'), options['repeat'])
+        self.report("cohorts, 12 months", rows, lambda: cohorts(columns, months=12), options['repeat'])
+
+        if options['load']:
+            count = Transactions.objects.count()
+            self.report("full load from Transactions", count, lambda: TransactionStore().refresh())
+            self.report("ORM GROUP BY type, status", count, lambda: list(Transactions.objects.values('type', 'status').annotate(count=Count('id'), sum=Sum('amount')).order_by()))
+
+    def synthetic_columns(self, rows, users, first_day, days):
+        random = np.random.default_rng(0)
+        return TransactionColumns(
+            days=np.sort(random.integers(first_day, first_day + days, rows, dtype=np.int32)),
+            types=(random.random(rows) < 0.05).astype(np.int8),
+            statuses=random.choice(np.array([0, 1, 2], np.int8), rows, p=[0.85, 0.1, 0.05]),
+            users=random.integers(0, users, rows, dtype=np.int32),
+            amounts=np.round(random.lognormal(6, 1, rows), 2),
+            type_values=['payment', 'refund'],
+            status_values=['completed', 'pending', 'refunded'],
+            user_count=users,
+        )
+
+    def report(self, label, rows, run, repeat=1):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+
+        best = min(timings)
+        self.stdout.write(f"  {label}: {best * 1000:.0f}ms ({rows / best:,.0f} rows/s)" if best else f"  {label}: {best * 1000:.0f}ms")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+# Local imports
+from core.apis.images import build_push_variant, push_variant_name
+from core.models import Notifications
+
+
+class Command(BaseCommand):
+    help = "Build the compressed push image of the notifications that do not have one yet."
+
+    def handle(self, *args, **options):
+        notifications = Notifications.objects.exclude(image='').filter(Q(push_image__isnull=True) | Q(push_image=''))
+
+        count = 0
+        for notification in notifications.iterator():
+            notification.push_image.save(push_variant_name(notification.image.name), build_push_variant(notification.image), save=False)
+            Notifications.objects.filter(pk=notification.pk).update(push_image=notification.push_image.name)
+            count += 1
+
+        self.stdout.write(f"Built {count} push images")
@@ -0,0 +1,217 @@
+import datetime
+import re
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+# Third party imports
+from rest_framework.test import APIClient
+
+# Local imports
+from core.models import Books, CustomUser, Events, InboxSegmentHead, Materials, MobileUsers, Notifications, Professionals, ProReview, Transactions
+
+FROM_DATE = (timezone.localdate() - datetime.timedelta(days=30)).isoformat()
+TO_DATE = timezone.localdate().isoformat()
+
+# Every list, filter and dashboard request, each filter alone and combined
+QUERY_PATHS = [
+    'professionals',
+    'professionals?expertise=Plumbing',
+    'professionals?location=Colombo',
+    'professionals?expertise=Plumbing&location=Colombo',
+    'professionals?search=jo',
+    'professionals?pagination=cursor',
+    'professionals?count=exact',
+    'professionals/{professional}',
+    'books',
+    'books?name=harry',
+    'books?pagination=cursor',
+    'events',
+    'events?search=colombo',
+    'events?pagination=cursor',
+    'materials',
+    'materials?type=Cement',
+    'materials?supplier_name=Lanka Supplies',
+    'materials?type=Cement&supplier_name=Lanka Supplies',
+    'materials?search=cement',
+    'materials?pagination=cursor',
+    'users',
+    'users?status=true',
+    'users?status=false',
+    f'users?from_date={FROM_DATE}&to_date={TO_DATE}',
+    f'users?status=true&from_date={FROM_DATE}&to_date={TO_DATE}',
+    'users?search=kumar',
+    'users?pagination=cursor',
+    'transactions',
+    f'transactions?from_date={FROM_DATE}&to_date={TO_DATE}',
+    'transactions?search=kumar',
+    'transactions?pagination=cursor',
+    'notifications',
+    f'notifications?from_date={FROM_DATE}&to_date={TO_DATE}',
+    'notifications?search=offer',
+    'notifications?pagination=cursor',
+    'notifications/{notification}',
+    'search?entity=professionals&q=jo',
+    'dashboard/key_matrix_statistics',
+    'dashboard/professionals_growth_chart?months=12',
+    'dashboard/growth_chart?entity=mobileusers',
+    f'dashboard/growth_chart?entity=materials&from_date={FROM_DATE}&to_date={TO_DATE}&granularity=day',
+    'dashboard/revenue_growth_chart?periods=weekly',
+    'dashboard/revenue_growth_chart?periods=yearly',
+    f'dashboard/revenue_growth_chart?from_date={FROM_DATE}&to_date={TO_DATE}&granularity=day',
+    'dashboard/activity_timeline',
+    'dashboard/materials_distribution',
+    'dashboard/distribution?field=materials.type',
+    'dashboard/distribution?field=materials.availability',
+    'dashboard/distribution?field=professionals.expertise',
+    'dashboard/distribution?field=professionals.location',
+    'dashboard/distribution?field=books.availability',
+    'dashboard/distribution?field=transactions.status',
+    'dashboard/distribution?field=transactions.type',
+    'dashboard/transaction_analytics',
+    'dashboard/transaction_analytics?report=cohorts',
+    'dashboard/summary',
+]
+
+# Mobile app requests, made as a mobile user
+USER_QUERY_PATHS = [
+    'inbox',
+    'inbox/unread_count',
+]
+
+# "SCAN table" without an index: every row of the table is read
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+# Tables small by construction, read whole on purpose
+SMALL_TABLES = {
+    InboxSegmentHead._meta.db_table,  # one row per notification segment
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run every list, filter and dashboard request against a throwaway test database and EXPLAIN QUERY PLAN "
+        "each query they make, fails if one of them reads a whole table without an index (SQLite only)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print the plan of every query, not only of the full scans.")
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != 'sqlite':
+            raise CommandError("EXPLAIN QUERY PLAN checks need SQLite, the production database of this project.")
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Dashboard results are cached: every request must run its own queries
+            with override_settings(DASHBOARD_CACHE_TIMEOUT=0, LIST_COUNT_CACHE_TIMEOUT=0):
+                scans, checked = self.explain_requests(connection, options['verbose_plans'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if scans:
+            for path, sql, plan in scans:
+                self.stdout.write(self.style.ERROR(f"Full scan in {path}:\n  {sql}\n  " + "\n  ".join(plan)))
+            raise CommandError(f"{len(scans)} of {checked} queries scan a whole table.")
+
+        self.stdout.write(self.style.SUCCESS(f"{checked} queries checked, none scans a whole table."))
+
+    def explain_requests(self, connection, verbose_plans):
+        ids = self.seed()
+        admin_client, user_client = APIClient(), APIClient()
+        admin_client.force_authenticate(ids['admin'])
+        user_client.force_authenticate(ids['mobile_user'].user)
+
+        requests = [(admin_client, f"/api/admin/{path.format(**ids)}") for path in QUERY_PATHS]
+        requests += [(user_client, f"/api/user/{path}") for path in USER_QUERY_PATHS]
+
+        queries = {}
+        for client, path in requests:
+            cache.clear()
+            executed = []
+
+            def record(execute, sql, params, many, context):
+                executed.append((sql, params))
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(record):
+                response = client.get(path)
+            if response.status_code != 200:
+                raise CommandError(f"{path} answered {response.status_code}: {response.content[:500]!r}")
+
+            for sql, params in executed:
+                if sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                    queries.setdefault(sql, (path, params))
+
+        scans = []
+        with connection.cursor() as cursor:
+            for sql, (path, params) in queries.items():
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = [row[3] for row in cursor.fetchall()]
+                if verbose_plans:
+                    self.stdout.write(f"{path}\n  {sql}\n  " + "\n  ".join(plan))
+                if any(self.is_full_scan(detail) for detail in plan):
+                    scans.append((path, sql, plan))
+
+        return scans, len(queries)
+
+    def is_full_scan(self, detail):
+        match = FULL_SCAN.match(detail)
+        # sqlite_master & co: the schema, read by the search to find its indexes
+        return bool(match) and match[1] not in SMALL_TABLES and not match[1].startswith('sqlite_')
+
+    def seed(self):
+        """
+        A few rows in every table: list pages of empty tables make no query.
+        """
+        admin = CustomUser.objects.create_superuser(email='plans@example.com', password=None)
+
+        group, _ = Group.objects.get_or_create(name='USER')
+        mobile_users = []
+        for number in range(3):
+            user = CustomUser.objects.create(email=f'user{number}@example.com')
+            user.groups.add(group)
+            mobile_users.append(MobileUsers.objects.create(
+                user=user, first_name=f'Kumar {number}', last_name='Perera', email=f'user{number}@example.com',
+                phone_no=f'+9194000000{number:02d}', fcm_token=f'token-{number}', is_active=number != 2,
+            ))
+
+        professionals = Professionals.objects.bulk_create([
+            Professionals(
+                name=f'John {number}', phone_no=f'+9195000000{number:02d}', email=f'pro{number}@example.com',
+                expertise='Plumbing', location='Colombo', about='About', experiance='Experience', portfolio='portfolio.pdf', banner='banner.png',
+            )
+            for number in range(3)
+        ])
+        ProReview.objects.bulk_create([ProReview(professional=professional, created_by=admin, rating=5, review='Good') for professional in professionals])
+        Books.objects.bulk_create([Books(name=f'Harry {number}', price=10, description='Book', additional_details='Details', image='book.png') for number in range(3)])
+        Events.objects.bulk_create([
+            Events(title=f'Fair {number}', date=timezone.now(), location='Colombo', description='Event', image='event.png')
+            for number in range(3)
+        ])
+        Materials.objects.bulk_create([
+            Materials(
+                name=f'Cement {number}', type='Cement', supplier_name='Lanka Supplies', supplier_phone_no='+919600000000', price=10,
+                discount_percentage=0, title='Cement', image='material.png', description='Material',
+            )
+            for number in range(3)
+        ])
+        Transactions.objects.bulk_create([
+            Transactions(user_involved=f'Kumar {number}', type='payment', amount=10, status='completed')
+            for number in range(3)
+        ])
+        notifications = Notifications.objects.bulk_create([
+            Notifications(title=f'Offer {number}', recipient='all users', status='sent', body='Offer', image='notification.png')
+            for number in range(3)
+        ])
+
+        return {
+            'admin': admin,
+            'mobile_user': mobile_users[0],
+            'professional': professionals[0].id,
+            'notification': notifications[0].id,
+        }
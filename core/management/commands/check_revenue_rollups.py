@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+# Local imports
+from core.apis.rollups import check_revenue_rollups, rebuild_revenue_rollups
+
+
+class Command(BaseCommand):
+    help = "Compare the daily revenue rollups with Transactions, exits with an error on any difference."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tolerance', type=float, default=1e-6, help="Allowed difference on the summed amounts (float rounding).")
+        parser.add_argument('--fix', action='store_true', help="Rebuild the rollups when they differ.")
+
+    def handle(self, *args, **options):
+        mismatches = check_revenue_rollups(tolerance=options['tolerance'])
+        if not mismatches:
+            self.stdout.write("Revenue rollups are consistent")
+            return
+
+        for mismatch in mismatches:
+            self.stdout.write(
+                f"{mismatch['day']} {mismatch['type']} {mismatch['status']}: "
+                f"amount {mismatch['stored_amount']} (expected {mismatch['expected_amount']}), "
+                f"count {mismatch['stored_count']} (expected {mismatch['expected_count']})"
+            )
+
+        if options['fix']:
+            count = rebuild_revenue_rollups()
+            self.stdout.write(f"Rebuilt revenue rollups: {count} rows")
+            return
+
+        raise CommandError(f"{len(mismatches)} revenue rollup rows differ from Transactions")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+# Local imports
+from core.apis.analytics import check_transaction_analytics
+
+
+class Command(BaseCommand):
+    help = "Compare the in-memory transaction analytics with the same figures from the ORM, exits with an error on any difference."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tolerance', type=float, default=1e-6, help="Allowed relative difference on amounts (float rounding).")
+        parser.add_argument('--percentiles', type=float, nargs='+', default=[50, 90, 99])
+
+    def handle(self, *args, **options):
+        mismatches = check_transaction_analytics(tolerance=options['tolerance'], percentiles=options['percentiles'])
+        if not mismatches:
+            self.stdout.write("Transaction analytics match the ORM")
+            return
+
+        for mismatch in mismatches:
+            self.stdout.write(mismatch)
+
+        raise CommandError(f"{len(mismatches)} transaction analytics figures differ from the ORM")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+# Local imports
+from core.apis.fcm_standin import FCMStandInServer
+
+
+class Command(BaseCommand):
+    help = "Run a local stand-in for the FCM HTTP v1 endpoint (point FCM_URL at the printed url)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8787)
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds to wait before answering each request.")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests failed with --error-status.")
+        parser.add_argument('--error-status', type=int, choices=[429, 503], default=503)
+        parser.add_argument('--retry-after', type=int, default=None, help="Retry-After seconds sent with injected errors.")
+
+    def handle(self, *args, **options):
+        server = FCMStandInServer(options['host'], options['port'], latency=options['latency'], error_rate=options['error_rate'], error_status=options['error_status'], retry_after=options['retry_after'])
+        self.stdout.write(f"FCM stand-in listening on {server.url}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
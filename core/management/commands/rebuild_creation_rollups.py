@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+# Local imports
+from core.apis.rollups import rebuild_creation_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily creation rollups of the growth charts (first deployment, drift)."
+
+    def handle(self, *args, **options):
+        count = rebuild_creation_rollups()
+        self.stdout.write(f"Rebuilt creation rollups: {count} rows")
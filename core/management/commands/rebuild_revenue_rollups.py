@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+# Local imports
+from core.apis.rollups import rebuild_revenue_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily revenue rollups from Transactions (first deployment, or after check_revenue_rollups found drift)."
+
+    def handle(self, *args, **options):
+        count = rebuild_revenue_rollups()
+        self.stdout.write(f"Rebuilt revenue rollups: {count} rows")
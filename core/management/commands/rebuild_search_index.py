@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+# Local imports
+from core.apis.search import ensure_search_indexes
+
+
+class Command(BaseCommand):
+    help = "Refill the full-text search indexes from the tables (drift, restored backup), --recreate after a change of SEARCH_INDEXES."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recreate", action="store_true", help="Drop and recreate the indexes and their triggers")
+
+    def handle(self, *args, **options):
+        filled = ensure_search_indexes(rebuild=True, recreate=options["recreate"])
+        self.stdout.write(f"Rebuilt search indexes: {', '.join(filled) or 'none (not SQLite or FTS5 missing)'}")
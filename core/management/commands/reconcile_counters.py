@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+# Local imports
+from core.apis.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Reset the dashboard counters to the real row counts. Run it periodically (eg: daily from cron)."
+
+    def handle(self, *args, **options):
+        drifted = reconcile_counters()
+        if not drifted:
+            self.stdout.write("Counters are consistent")
+            return
+
+        for name, (stored, actual) in drifted.items():
+            self.stdout.write(f"{name}: {stored} -> {actual}")
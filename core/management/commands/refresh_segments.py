@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+# Local imports
+from core.apis.segments import rebuild_segments, refresh_time_segments
+
+
+class Command(BaseCommand):
+    help = "Move users across the time based notification segments. Run it periodically (eg: hourly from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Recompute every segment row from MobileUsers (first deployment, drift).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = rebuild_segments(batch_size=options['batch_size'])
+            self.stdout.write(f"Rebuilt segments: {count} membership rows")
+            return
+
+        for change, count in refresh_time_segments().items():
+            self.stdout.write(f"{change}: {count}")
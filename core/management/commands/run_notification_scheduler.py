@@ -0,0 +1,48 @@
+import signal
+import threading
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+# Local imports
+from core.apis.scheduler import next_due_time, release_due_notifications
+
+
+class Command(BaseCommand):
+    help = "Queue scheduled notifications when they are due. Safe to run in several processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-sleep', type=float, default=60.0, help="Longest sleep, bounds how late a newly scheduled notification is seen.")
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--once', action='store_true', help="Queue the due notifications and exit.")
+
+    def handle(self, *args, **options):
+        self.wakeup = threading.Event()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write("Notification scheduler started")
+        while not self.wakeup.is_set():
+            close_old_connections()
+
+            jobs = release_due_notifications(limit=options['batch_size'])
+            for job in jobs:
+                self.stdout.write(f"Queued notification {job.notification_id} (dispatch job {job.id})")
+
+            if options['once']:
+                break
+
+            # A full batch means more are due right away, otherwise sleep until the next one.
+            if len(jobs) == options['batch_size']:
+                continue
+
+            next_due = next_due_time()
+            sleep = options['max_sleep']
+            if next_due is not None:
+                sleep = min(max((next_due - timezone.now()).total_seconds(), 0), sleep)
+            self.wakeup.wait(sleep)
+
+        self.stdout.write("Notification scheduler stopped")
+
+    def stop(self, signum, frame):
+        self.wakeup.set()
@@ -0,0 +1,49 @@
+import os
+import signal
+import socket
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+# Local imports
+from core.apis.dispatch import claim_jobs, process_job
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications in the background. Several workers can run side by side."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker-id', default=f"{socket.gethostname()}:{os.getpid()}")
+        parser.add_argument('--batch-size', type=int, default=1, help="Jobs leased per claim.")
+        parser.add_argument('--lease-seconds', type=int, default=None)
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the due jobs and exit.")
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id']
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(f"Notification worker {worker_id} started")
+        while not self.stopping:
+            close_old_connections()
+            jobs = claim_jobs(worker_id, limit=options['batch_size'], lease_seconds=options['lease_seconds'])
+
+            if not jobs:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            for job in jobs:
+                # Jobs left unprocessed on shutdown are claimed again when their lease expires.
+                if self.stopping:
+                    break
+                process_job(job, worker_id, lease_seconds=options['lease_seconds'])
+                self.stdout.write(f"Processed dispatch job {job.id} (notification {job.notification_id})")
+
+        self.stdout.write(f"Notification worker {worker_id} stopped")
+
+    def stop(self, signum, frame):
+        self.stopping = True
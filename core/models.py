@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import BaseUserManager
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -61,6 +63,33 @@ class AdminUsers(models.Model):
     
 
 # USERS MODULE MODELS *******
+class MobileUsersQuerySet(models.QuerySet):
+    """
+    queryset.update() skips the model signals: keeps the active users counter, the
+    activity log and the cached results in step (eg: the bulk deactivation).
+    """
+
+    def update(self, **kwargs):
+        from core.apis.activity import is_logged_change, log_updates
+        from core.apis.cache_versions import bump_model_version
+        from core.apis.counters import ACTIVE_MOBILE_USERS, increment_counter
+
+        with transaction.atomic(using=self.db):
+            logged_ids = list(self.values_list('id', flat=True)) if is_logged_change(self.model, kwargs) else []
+            changed_count = self.exclude(is_active=kwargs['is_active']).count() if 'is_active' in kwargs else 0
+
+            updated_count = super().update(**kwargs)
+
+            if changed_count:
+                increment_counter(ACTIVE_MOBILE_USERS, changed_count if kwargs['is_active'] else -changed_count)
+            log_updates(self.model, logged_ids)
+
+        bump_model_version(self.model)
+        return updated_count
+
+    update.alters_data = True
+
+
 class MobileUsers(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
     first_name = models.CharField(max_length=150)
@@ -74,12 +103,23 @@ class MobileUsers(models.Model):
     fcm_token = models.TextField(blank=True, null=True)
     otp = models.CharField(max_length=4, null=True, blank=True)
 
+    objects = MobileUsersQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Recipient resolution: WHERE is_active AND fcm_token > ? ORDER BY fcm_token
+            models.Index(fields=['is_active', 'fcm_token'], name='mobile_user_fcm_token_idx'),
+            # List pages: ORDER BY created_on, id, WHERE (created_on, id) > cursor in keyset mode
+            models.Index(fields=['created_on', 'id'], name='mobile_user_list_idx'),
+        ]
+
     def __str__(self) -> str:
         return f' {self.id} - {self.first_name}'
     
     @classmethod
     def count(cls):
-        return cls.objects.count()
+        from core.apis.counters import get_count
+        return get_count(cls)
     
 
 # PROFESSIONALS MODULE MODELS *******
@@ -105,12 +145,22 @@ class Professionals(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     last_edited = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # List pages: ORDER BY created_on, id, WHERE (created_on, id) > cursor in keyset mode
+            models.Index(fields=['created_on', 'id'], name='professional_list_idx'),
+            # Filtered list pages: WHERE expertise = ? / location = ? ORDER BY created_on, id, and their distributions
+            models.Index(fields=['expertise', 'created_on', 'id'], name='professional_expertise_idx'),
+            models.Index(fields=['location', 'created_on', 'id'], name='professional_location_idx'),
+        ]
+
     def __str__(self) -> str:
         return f' {self.id} - {self.name}'
     
     @classmethod
     def count(cls):
-        return cls.objects.count()
+        from core.apis.counters import get_count
+        return get_count(cls)
 
 
 
@@ -143,6 +193,14 @@ class Books(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     last_edited = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # List pages: ORDER BY created_on, id, WHERE (created_on, id) > cursor in keyset mode
+            models.Index(fields=['created_on', 'id'], name='book_list_idx'),
+            # Availability distribution: GROUP BY availability
+            models.Index(fields=['availability'], name='book_availability_idx'),
+        ]
+
     def __str__(self) -> str:
         return f' {self.id} - {self.name}'
     
@@ -158,6 +216,12 @@ class Events(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     last_edited = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # List pages: ORDER BY created_on, id, WHERE (created_on, id) > cursor in keyset mode
+            models.Index(fields=['created_on', 'id'], name='event_list_idx'),
+        ]
+
     def __str__(self) -> str:
         return f' {self.id} - {self.title}'
     
@@ -181,15 +245,78 @@ class Materials(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     last_edited = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # List pages: ORDER BY created_on, id, WHERE (created_on, id) > cursor in keyset mode
+            models.Index(fields=['created_on', 'id'], name='material_list_idx'),
+            # Filtered list pages: WHERE type = ? / supplier_name = ? ORDER BY created_on, id, and the type distribution
+            models.Index(fields=['type', 'created_on', 'id'], name='material_type_idx'),
+            models.Index(fields=['supplier_name', 'created_on', 'id'], name='material_supplier_idx'),
+            # Availability distribution: GROUP BY availability
+            models.Index(fields=['availability'], name='material_availability_idx'),
+        ]
+
     def __str__(self) -> str:
         return f' {self.id} - {self.name}'
     
     @classmethod
     def count(cls):
-        return cls.objects.count()
+        from core.apis.counters import get_count
+        return get_count(cls)
     
 
 # TRANSACTIONS MODULE MODELS *******
+class TransactionsQuerySet(models.QuerySet):
+    """
+    Keeps DailyRevenueRollup in step on the bulk paths, which skip the model signals.
+    """
+    ROLLUP_FIELDS = {'date_time', 'type', 'status', 'amount'}
+    ROLLUP_BATCH_SIZE = 500
+
+    def update(self, **kwargs):
+        from core.apis.cache_versions import bump_model_version
+        from core.apis.analytics import REWRITES
+
+        if not self.ROLLUP_FIELDS & kwargs.keys():
+            updated_count = super().update(**kwargs)
+            bump_model_version(self.model)
+            bump_model_version(self.model, REWRITES)
+            return updated_count
+
+        from core.apis.rollups import apply_revenue_groups, revenue_groups
+
+        updated_count = 0
+        with transaction.atomic(using=self.db):
+            ids = list(self.values_list('id', flat=True))
+            for start in range(0, len(ids), self.ROLLUP_BATCH_SIZE):
+                batch = self.model.objects.filter(id__in=ids[start:start + self.ROLLUP_BATCH_SIZE])
+                apply_revenue_groups(revenue_groups(batch), sign=-1)
+                updated_count += super(TransactionsQuerySet, batch).update(**kwargs)
+                apply_revenue_groups(revenue_groups(batch))
+
+        bump_model_version(self.model)
+        bump_model_version(self.model, REWRITES)
+        return updated_count
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from core.apis.rollups import apply_revenue_objects
+
+        from core.apis.counters import increment_counter
+        from core.apis.cache_versions import bump_model_version
+
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            apply_revenue_objects(objs)
+            increment_counter(self.model, len(objs))
+
+        bump_model_version(self.model)
+        return objs
+
+    bulk_create.alters_data = True
+
+
 class Transactions(models.Model):
     TYPE_CHOICES = (('payment', 'Payment'), ('refund', 'Refund'))
     STATUS_CHOICES = (('completed', 'Completed'), ('pending', 'Pending'), ('refunded', 'Refunded'))
@@ -200,27 +327,287 @@ class Transactions(models.Model):
     amount = models.FloatField()
     status = models.CharField(max_length=100, choices=STATUS_CHOICES)
 
+    objects = TransactionsQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['type', 'status', 'date_time'], name='transaction_revenue_idx'),
+            # List pages: ORDER BY date_time, id, WHERE (date_time, id) > cursor in keyset mode
+            models.Index(fields=['date_time', 'id'], name='transaction_list_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user_involved} - {self.type}'
     
     @classmethod
     def count(cls):
-        return cls.objects.count()
+        from core.apis.counters import get_count
+        return get_count(cls)
     
 
+"""
+Sum and count of the transactions of a day (in TIME_ZONE) per type and status, kept up
+to date on every write so the revenue charts read a few hundred rows, not Transactions.
+"""
+class DailyRevenueRollup(models.Model):
+    day = models.DateField()
+    type = models.CharField(max_length=100, choices=Transactions.TYPE_CHOICES)
+    status = models.CharField(max_length=100, choices=Transactions.STATUS_CHOICES)
+    amount = models.FloatField(default=0.0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['type', 'status', 'day'], name='unique_daily_revenue_rollup'),
+        ]
+
+    def __str__(self):
+        return f'{self.day} - {self.type} - {self.status}'
+
+
 
 # NOTIFICATIONS MODULE MODELS *******
 class Notifications(models.Model):
-    RECIPIENT_CHOICES = [('all users', 'All Users')]
-    STATUS_CHOICES = [('sent', 'Sent'), ('pending', 'Pending'), ('failed', 'Failed')]
+    RECIPIENT_CHOICES = [
+        ('all users', 'All Users'),
+        ('active users', 'Active Users'),
+        ('dormant users', 'Dormant Users'),
+        ('new users', 'New Users'),
+        ('registered between', 'Users Registered Between'),
+    ]
+    STATUS_CHOICES = [('sent', 'Sent'), ('pending', 'Pending'), ('sending', 'Sending'), ('failed', 'Failed')]
+    RECURRENCE_CHOICES = [('none', 'None'), ('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')]
 
     title = models.CharField(max_length=250)
     recipient =models.CharField(max_length=100, choices=RECIPIENT_CHOICES)
     status = models.CharField(max_length=25, choices=STATUS_CHOICES, default='pending')
     body = models.TextField()
     image = models.ImageField(upload_to='notifications/')
+    # Compressed, size capped copy of `image` sent in push payloads, built on upload.
+    push_image = models.ImageField(upload_to='notifications/push/', blank=True, null=True)
+    # Registration date range of the 'registered between' recipients.
+    registered_from = models.DateField(blank=True, null=True)
+    registered_to = models.DateField(blank=True, null=True)
+
+    """
+    A pending notification with `scheduled_for` is sent by `run_notification_scheduler` when due.
+    Recurring notifications stay pending, `scheduled_for` moves to the next occurrence.
+    """
+    scheduled_for = models.DateTimeField(blank=True, null=True)
+    recurrence = models.CharField(max_length=25, choices=RECURRENCE_CHOICES, default='none')
+    last_sent_on = models.DateTimeField(blank=True, null=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    last_edited = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Scheduler: WHERE status = 'pending' AND scheduled_for <= now ORDER BY scheduled_for
+            models.Index(fields=['status', 'scheduled_for'], name='notification_due_idx'),
+            # List pages: ORDER BY created_on, id, WHERE (created_on, id) > cursor in keyset mode
+            models.Index(fields=['created_on', 'id'], name='notification_list_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.id} - {self.status}"
+
+    @property
+    def payload_image(self):
+        """
+        Image referenced by the push payload, the compressed variant once it exists.
+        """
+        return self.push_image or self.image
+
+
+"""
+Precomputed notification segments of the active mobile users, one row per (segment, user),
+kept current by the MobileUsers save signal and `refresh_segments` for the time based ones.
+Resolving the recipients of a segment is a read of the (segment, fcm_token) index.
+"""
+class SegmentMembership(models.Model):
+    segment = models.CharField(max_length=100)
+    user = models.ForeignKey(MobileUsers, related_name='segments', on_delete=models.CASCADE)
+    fcm_token = models.TextField(blank=True, null=True)
+    registered_on = models.DateTimeField()
+    last_seen_on = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['segment', 'user'], name='unique_segment_user'),
+        ]
+        indexes = [
+            models.Index(fields=['segment', 'fcm_token'], name='segment_token_idx'),
+            models.Index(fields=['segment', 'registered_on'], name='segment_registered_idx'),
+            models.Index(fields=['segment', 'last_seen_on'], name='segment_last_seen_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.segment} - {self.user_id}"
+
+
+"""
+A queued delivery of a notification. Jobs are claimed by `run_notification_worker`
+processes through a lease, a job whose lease expired (crashed worker) is claimed again.
+"""
+class NotificationDispatchJob(models.Model):
+    STATUS_CHOICES = [('queued', 'Queued'), ('leased', 'Leased'), ('done', 'Done'), ('failed', 'Failed')]
+
+    notification = models.ForeignKey(Notifications, related_name='dispatch_jobs', on_delete=models.CASCADE)
+    image_url = models.URLField(max_length=500, blank=True, null=True)
+    status = models.CharField(max_length=25, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    lease_owner = models.CharField(max_length=150, blank=True, null=True)
+    lease_expires_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    # Checkpoint of a partially sent broadcast, recipients are streamed in fcm_token order.
+    next_chunk = models.PositiveIntegerField(default=0)
+    resume_after_token = models.TextField(blank=True, null=True)
+    # Tokens of the chunk interrupted by an FCM outage that were not sent yet, sent first on resume.
+    pending_tokens = models.JSONField(default=list, blank=True)
     created_on = models.DateTimeField(auto_now_add=True)
     last_edited = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='dispatch_job_queued_idx'),
+            models.Index(fields=['status', 'lease_expires_at'], name='dispatch_job_lease_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.id} - {self.notification_id} - {self.status}"
+
+
+"""
+Delivery receipt of one recipient chunk of a notification send. Successful tokens are
+only counted, failed tokens are kept with their FCM error code, so a broadcast to 1M
+users is ~1000 small rows instead of 1M.
+"""
+class NotificationReceipt(models.Model):
+    notification = models.ForeignKey(Notifications, related_name='receipts', on_delete=models.CASCADE)
+    dispatch_job = models.ForeignKey(NotificationDispatchJob, related_name='receipts', on_delete=models.SET_NULL, blank=True, null=True)
+    chunk = models.PositiveIntegerField()
+    success_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    failures = models.JSONField(default=dict, blank=True)
+    pruned_count = models.PositiveIntegerField(default=0)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.notification_id} - {self.chunk} - {self.success_count}/{self.success_count + self.failure_count}"
+
+
+# INBOX MODELS *******
+"""
+One row per sent notification (per occurrence for recurring ones), shared by all its
+recipients: the mobile inbox is resolved on read from the user's segments, a broadcast
+to 1M users writes one row. The id is the inbox sequence used by cursors and watermarks.
+"""
+class InboxItem(models.Model):
+    notification = models.ForeignKey(Notifications, related_name='inbox_items', on_delete=models.CASCADE)
+    segment = models.CharField(max_length=100)
+    registered_from = models.DateField(blank=True, null=True)
+    registered_to = models.DateField(blank=True, null=True)
+    published_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['segment', 'id'], name='inbox_item_segment_idx'),
+            # Last item published before a user registered, read once per inbox
+            models.Index(fields=['published_on'], name='inbox_item_published_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.id} - {self.segment}"
+
+
+"""
+Number of inbox items published to a segment so far.
+"""
+class InboxSegmentHead(models.Model):
+    segment = models.CharField(max_length=100, unique=True)
+    count = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.segment} - {self.count}"
+
+
+"""
+Read watermark of a mobile user: the last inbox item read and the segment heads at that
+time, unread count = sum of (head now - head when read) over the user's segments.
+"""
+class NotificationInbox(models.Model):
+    user = models.OneToOneField(MobileUsers, related_name='inbox', on_delete=models.CASCADE)
+    # Last item published before the user registered: the older ones were never sent to them.
+    registered_after_item = models.BigIntegerField(default=0)
+    read_through = models.BigIntegerField(default=0)
+    read_heads = models.JSONField(default=dict, blank=True)
+    last_read_on = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self) -> str:
+        return f"{self.user_id} - {self.read_through}"
+
+
+# DASHBOARD MODELS *******
+"""
+Number of rows of an entity (model name) created on a day (in TIME_ZONE), kept up to date
+on insert and delete so the growth charts of any range read at most one row per day.
+"""
+class DailyCreationRollup(models.Model):
+    entity = models.CharField(max_length=100)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['entity', 'day'], name='unique_daily_creation_rollup'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.entity} - {self.day} - {self.count}"
+
+
+"""
+Row counts kept current by signals with F() increments, so the dashboard statistics
+do not run a COUNT(*) per table. reconcile_counters fixes any drift.
+"""
+class EntityCounter(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.name} - {self.value}"
+
+
+"""
+One row per creation or update of a professional, material, event, book or mobile user,
+with a compact summary of the entity. Read newest first on (created_on, id).
+"""
+class ActivityLog(models.Model):
+    ACTION_CHOICES = (('created', 'Created'), ('updated', 'Updated'))
+
+    entity_type = models.CharField(max_length=50)
+    entity_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    summary = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_on = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_on', 'id'], name='activity_log_timeline_idx'),
+            models.Index(fields=['entity_type', 'entity_id'], name='activity_log_entity_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.entity_type} {self.entity_id} - {self.action}"
+
+
+"""
+Events of the live dashboard stream relayed between processes by DatabaseBroker, pruned after LIVE_EVENT_RETENTION.
+"""
+class LiveEvent(models.Model):
+    channel = models.CharField(max_length=50)
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_on = models.DateTimeField(default=timezone.now, db_index=True)
+
     def __str__(self) -> str:
-        return f"{self.id} - {self.status}"
\ No newline at end of file
+        return f"{self.id} {self.channel}"
@@ -1,9 +1,20 @@
 import os
-from django.db.models.signals import post_delete, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
 # Local imports
-from .models import AdminUsers, Professionals, Books, Events, Materials, MobileUsers, Notifications
+from .models import AdminUsers, Professionals, Books, Events, Materials, MobileUsers, Notifications, Transactions
+from .apis.images import build_push_variant, push_variant_name
+from .apis.segments import refresh_user_segments
+from .apis.rollups import apply_creation_delta, apply_revenue_delta, revenue_key, transaction_day
+from .apis.timeseries import local_date
+from .apis.counters import ACTIVE_MOBILE_USERS, increment_counter
+from .apis.cache_versions import bump_model_version
+from .apis.activity import activity_summary, log_activity, stored_summary
+from .apis.analytics import REWRITES
+from .apis.search import ensure_search_indexes
+from .apis.autocomplete import autocomplete_values, professionals_autocomplete, stored_autocomplete_values
 
 
 def delete_file(path):
@@ -70,4 +81,207 @@ def delete_old_file_on_change(sender, instance, **kwargs):
     if old_portfolio:
         new_file = instance.portfolio
         if old_portfolio != new_file:
-            delete_file(old_portfolio.path)
\ No newline at end of file
+            delete_file(old_portfolio.path)
+
+
+@receiver(post_save, sender=MobileUsers)
+def refresh_segments_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    refresh_user_segments(instance)
+
+
+@receiver(pre_save, sender=Notifications)
+def mark_push_image_stale(sender, instance, **kwargs):
+    if not instance.pk:
+        instance._push_image_stale = True
+        return
+
+    old_image = sender.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+    instance._push_image_stale = old_image != instance.image.name or not instance.push_image
+
+@receiver(post_save, sender=Notifications)
+def create_push_image(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image or not getattr(instance, '_push_image_stale', False):
+        return
+
+    old_push_image = instance.push_image.path if instance.push_image else None
+
+    instance.push_image.save(push_variant_name(instance.image.name), build_push_variant(instance.image), save=False)
+    sender.objects.filter(pk=instance.pk).update(push_image=instance.push_image.name)
+    instance._push_image_stale = False
+
+    if old_push_image:
+        delete_file(old_push_image)
+
+@receiver(post_delete, sender=Notifications)
+def delete_push_image(sender, instance, **kwargs):
+    if instance.push_image:
+        delete_file(instance.push_image.path)
+
+
+def stored_revenue_key(sender, pk):
+    old = sender.objects.filter(pk=pk).values('date_time', 'type', 'status', 'amount').first()
+    if old:
+        return transaction_day(old['date_time']), old['type'], old['status'], old['amount']
+
+@receiver(pre_save, sender=Transactions)
+def remember_revenue_key(sender, instance, **kwargs):
+    instance._old_revenue_key = stored_revenue_key(sender, instance.pk) if instance.pk else None
+
+@receiver(post_save, sender=Transactions)
+def update_revenue_rollup(sender, instance, **kwargs):
+    old_key = getattr(instance, '_old_revenue_key', None)
+    new_key = revenue_key(instance)
+    if old_key == new_key:
+        return
+
+    with transaction.atomic():
+        if old_key:
+            day, type, status, amount = old_key
+            apply_revenue_delta(day, type, status, -amount, -1)
+
+        day, type, status, amount = new_key
+        apply_revenue_delta(day, type, status, amount, 1)
+
+# The stored row is what the rollups counted, the instance being deleted may be stale.
+@receiver(pre_delete, sender=Transactions)
+def remember_deleted_revenue_key(sender, instance, **kwargs):
+    instance._old_revenue_key = stored_revenue_key(sender, instance.pk)
+
+@receiver(post_delete, sender=Transactions)
+def remove_from_revenue_rollup(sender, instance, **kwargs):
+    old_key = getattr(instance, '_old_revenue_key', None)
+    if old_key:
+        day, type, status, amount = old_key
+        apply_revenue_delta(day, type, status, -amount, -1)
+
+
+@receiver(post_save, sender=Professionals)
+@receiver(post_save, sender=Materials)
+@receiver(post_save, sender=MobileUsers)
+@receiver(post_save, sender=Transactions)
+def increment_entity_counter(sender, instance, created, **kwargs):
+    if created:
+        increment_counter(sender, 1)
+
+# Also runs for queryset.delete() (eg: the multiple delete endpoints), Django sends it per row.
+@receiver(post_delete, sender=Professionals)
+@receiver(post_delete, sender=Materials)
+@receiver(post_delete, sender=MobileUsers)
+@receiver(post_delete, sender=Transactions)
+def decrement_entity_counter(sender, instance, **kwargs):
+    increment_counter(sender, -1)
+
+@receiver(pre_save, sender=MobileUsers)
+def remember_is_active(sender, instance, **kwargs):
+    instance._was_active = sender.objects.filter(pk=instance.pk).values_list('is_active', flat=True).first() if instance.pk else None
+
+@receiver(post_save, sender=MobileUsers)
+def update_active_users_counter(sender, instance, created, **kwargs):
+    was_active = bool(getattr(instance, '_was_active', None))
+    if instance.is_active != was_active:
+        increment_counter(ACTIVE_MOBILE_USERS, 1 if instance.is_active else -1)
+
+@receiver(post_delete, sender=MobileUsers)
+def decrement_active_users_counter(sender, instance, **kwargs):
+    if instance.is_active:
+        increment_counter(ACTIVE_MOBILE_USERS, -1)
+
+
+@receiver(post_save, sender=Professionals)
+@receiver(post_save, sender=Materials)
+@receiver(post_save, sender=Books)
+@receiver(post_save, sender=Events)
+@receiver(post_save, sender=MobileUsers)
+@receiver(post_save, sender=Transactions)
+@receiver(post_delete, sender=Professionals)
+@receiver(post_delete, sender=Materials)
+@receiver(post_delete, sender=Books)
+@receiver(post_delete, sender=Events)
+@receiver(post_delete, sender=MobileUsers)
+@receiver(post_delete, sender=Transactions)
+def invalidate_cached_results(sender, **kwargs):
+    bump_model_version(sender)
+
+# Inserts are appended to the analytics columns, updates and deletes make them reload.
+@receiver(post_save, sender=Transactions)
+@receiver(post_delete, sender=Transactions)
+def invalidate_analytics_columns(sender, created=False, **kwargs):
+    if not created:
+        bump_model_version(sender, REWRITES)
+
+
+@receiver(pre_save, sender=Professionals)
+@receiver(pre_save, sender=Materials)
+@receiver(pre_save, sender=Events)
+@receiver(pre_save, sender=Books)
+@receiver(pre_save, sender=MobileUsers)
+def remember_activity_summary(sender, instance, **kwargs):
+    instance._old_summary = stored_summary(sender, instance.pk) if instance.pk else None
+
+@receiver(post_save, sender=Professionals)
+@receiver(post_save, sender=Materials)
+@receiver(post_save, sender=Events)
+@receiver(post_save, sender=Books)
+@receiver(post_save, sender=MobileUsers)
+def write_activity_log(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        log_activity(instance, 'created')
+    # Saves that leave the summary as it was (eg: a new otp) are not activity
+    elif getattr(instance, '_old_summary', None) != activity_summary(instance):
+        log_activity(instance, 'updated')
+
+
+@receiver(post_save, sender=Professionals)
+@receiver(post_save, sender=MobileUsers)
+@receiver(post_save, sender=Books)
+@receiver(post_save, sender=Events)
+@receiver(post_save, sender=Materials)
+def count_creation(sender, instance, created, **kwargs):
+    if created:
+        apply_creation_delta(sender, local_date(instance.created_on), 1)
+
+@receiver(post_delete, sender=Professionals)
+@receiver(post_delete, sender=MobileUsers)
+@receiver(post_delete, sender=Books)
+@receiver(post_delete, sender=Events)
+@receiver(post_delete, sender=Materials)
+def uncount_creation(sender, instance, **kwargs):
+    apply_creation_delta(sender, local_date(instance.created_on), -1)
+
+
+@receiver(post_migrate)
+def create_search_indexes(sender, using, **kwargs):
+    # The full-text indexes live outside the migrations, created once the tables exist
+    if sender.name == 'core':
+        ensure_search_indexes(using)
+
+
+@receiver(pre_save, sender=Professionals)
+def remember_autocomplete_values(sender, instance, **kwargs):
+    # Only worth a query in a process serving suggestions
+    if instance.pk and professionals_autocomplete.loaded:
+        instance._old_autocomplete = stored_autocomplete_values(instance.pk)
+
+@receiver(post_save, sender=Professionals)
+def update_autocomplete(sender, instance, created, **kwargs):
+    if created:
+        old_values = None
+    elif hasattr(instance, '_old_autocomplete'):
+        old_values = instance._old_autocomplete
+    else:
+        # Suggestions were not loaded before this save, they will be read from the table
+        return
+
+    new_values = autocomplete_values(instance)
+    transaction.on_commit(lambda: professionals_autocomplete.apply(old_values, new_values))
+
+@receiver(post_delete, sender=Professionals)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    old_values = autocomplete_values(instance)
+    transaction.on_commit(lambda: professionals_autocomplete.apply(old_values, None))
@@ -1,3 +1,866 @@
-from django.test import TestCase
+import base64
+import copy
+import datetime
+import io
+import json
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+# Third party imports
+from firebase_admin import exceptions as firebase_exceptions
+from PIL import Image
+from rest_framework.test import APIClient
+
+# Local imports
+from core.models import ActivityLog, Books, CustomUser, DailyCreationRollup, DailyRevenueRollup, EntityCounter, InboxItem, MobileUsers, SegmentMembership, NotificationDispatchJob, Notifications, Professionals, Transactions
+from core.apis.activity import backfill_activity_log
+from core.apis.counters import ACTIVE_MOBILE_USERS, COUNTERS, get_count, reconcile_counters
+from core.apis.dashboard import key_matrix_statistics
+from core.apis.dispatch import claim_jobs, enqueue_notification, finish_job, process_job
+from core.apis.inbox import publish_to_inbox
+from core.apis.segments import rebuild_segments, refresh_time_segments, segment_members
+from core.apis.firebase import FCM_CIRCUIT_OPEN, FCMSendResult, FCMSendSummary, FCMUnavailableError, get_fcm_breaker, send_with_admin_sdk
+from core.apis.cache_versions import get_model_version
+from core.apis.result_cache import cache_metrics, cached_result
+from core.apis.revenue import revenue_growth, revenue_rollups
+from core.apis.timeseries import bucketed_sum
+from core.apis.rollups import CREATION_MODELS, check_revenue_rollups, creation_groups, rebuild_creation_rollups, rebuild_revenue_rollups
+from core.apis.search import ensure_search_indexes, fts_table, has_full_text, search_filter
+
 
 # Create your tests here.
+def create_professional(number):
+    return Professionals.objects.create(
+        name=f'John {number}', phone_no=f'+9495000000{number:02d}', email=f'pro{number}@example.com', expertise='Plumbing',
+        location='Colombo', about='About', experiance='Experience', portfolio='portfolio.pdf', banner='banner.png',
+    )
+
+
+# CACHED RESULTS TESTS *******
+class ModelVersionTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_version_changes_only_after_commit(self):
+        version = get_model_version(Transactions)
+
+        with transaction.atomic():
+            Transactions.objects.create(user_involved='user', type='payment', amount=10, status='completed')
+            self.assertEqual(get_model_version(Transactions), version)
+
+        self.assertNotEqual(get_model_version(Transactions), version)
+
+    def test_rolled_back_write_keeps_the_version(self):
+        version = get_model_version(Transactions)
+
+        try:
+            with transaction.atomic():
+                Transactions.objects.create(user_involved='user', type='payment', amount=10, status='completed')
+                raise ValueError
+        except ValueError:
+            pass
+
+        self.assertEqual(get_model_version(Transactions), version)
+
+
+class CacheMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_hits_and_misses(self):
+        for _ in range(3):
+            self.assertEqual(cached_result('metrics_counted', [Transactions], {}, lambda: 42), 42)
+
+        self.assertEqual(cache_metrics(['metrics_counted'])['metrics_counted'], {'hits': 2, 'misses': 1, 'waits': 0, 'hit_ratio': 2 / 3})
+
+    @override_settings(DASHBOARD_CACHE_METRICS_INTERVAL=0)
+    def test_logs_and_resets_the_counts(self):
+        with self.assertLogs('core.apis.result_cache', 'INFO') as logs:
+            cached_result('metrics_logged', [Transactions], {}, lambda: 42)
+
+        self.assertTrue(any("Cached result metrics_logged: 0 hits, 1 misses" in line for line in logs.output), logs.output)
+        self.assertEqual(cache_metrics(['metrics_logged'])['metrics_logged']['misses'], 0)
+
+
+class ActivityBackfillTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+
+    def test_backfill_refreshes_the_cached_timeline(self):
+        create_professional(0)
+        ActivityLog.objects.all().delete()
+        self.assertEqual(self.client.get('/api/admin/dashboard/activity_timeline').data['results'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(backfill_activity_log(), 1)
+
+        self.assertEqual(len(self.client.get('/api/admin/dashboard/activity_timeline').data['results']), 1)
+
+
+class RepairInvalidationTests(TestCase):
+    """
+    The repairs of drifted rollups and counters write no model of their own: the cached
+    dashboard results computed from the drifted values must still go.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        Transactions.objects.create(user_involved='user', type='payment', amount=10, status='completed')
+        create_professional(0)
+
+    def dashboard(self, path, key):
+        return self.client.get(f'/api/admin/dashboard/{path}').data[key]
+
+    def test_rebuilt_revenue_rollups_refresh_the_cached_charts(self):
+        DailyRevenueRollup.objects.update(amount=0)
+        self.assertEqual(self.dashboard('revenue_growth_chart?periods=weekly', 'total_revenue'), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_revenue_rollups()
+
+        self.assertEqual(self.dashboard('revenue_growth_chart?periods=weekly', 'total_revenue'), 10)
+
+    def test_rebuilt_creation_rollups_refresh_the_cached_charts(self):
+        DailyCreationRollup.objects.all().delete()
+        path = 'professionals_growth_chart?months=1'
+        self.assertEqual(self.dashboard(path, 'professionals_growth_chart')[0]['count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_creation_rollups()
+
+        self.assertEqual(self.dashboard(path, 'professionals_growth_chart')[0]['count'], 1)
+
+    def test_reconciled_counters_refresh_the_cached_statistics(self):
+        EntityCounter.objects.update_or_create(name='transactions', defaults={'value': 5})
+        self.assertEqual(self.dashboard('key_matrix_statistics', 'total_transactions'), 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reconcile_counters()['transactions'], (5, 1))
+
+        self.assertEqual(self.dashboard('key_matrix_statistics', 'total_transactions'), 1)
+
+
+# ROLLUPS TESTS *******
+class RevenueRollupTests(TestCase):
+    """
+    Every write path of Transactions keeps the daily revenue rollups equal to a recount.
+    """
+
+    def setUp(self):
+        self.transactions = [
+            Transactions.objects.create(user_involved=f'user {number}', type='payment', amount=10 * (number + 1), status=status)
+            for number, status in enumerate(['completed', 'pending', 'pending'])
+        ]
+
+    def assertInStep(self):
+        self.assertEqual(check_revenue_rollups(), [])
+
+    def revenue(self):
+        return sum(DailyRevenueRollup.objects.filter(type='payment', status='completed').values_list('amount', flat=True))
+
+    def test_create(self):
+        self.assertInStep()
+        self.assertEqual(self.revenue(), 10)
+
+    def test_save_changes(self):
+        row = self.transactions[1]
+        row.status, row.amount = 'completed', 25
+        row.save()
+
+        self.assertInStep()
+        self.assertEqual(self.revenue(), 35)
+
+    def test_delete(self):
+        self.transactions[0].delete()
+        Transactions.objects.filter(status='pending').delete()
+
+        self.assertInStep()
+        self.assertEqual(self.revenue(), 0)
+
+    def test_bulk_create(self):
+        Transactions.objects.bulk_create([Transactions(user_involved='bulk', type='payment', amount=5, status='completed') for _ in range(3)])
+
+        self.assertInStep()
+        self.assertEqual(self.revenue(), 25)
+
+    def test_queryset_update(self):
+        Transactions.objects.filter(id=self.transactions[0].id).update(date_time=timezone.now() - datetime.timedelta(days=3), amount=40)
+        Transactions.objects.filter(status='pending').update(type='refund')
+
+        self.assertInStep()
+        self.assertEqual(self.revenue(), 40)
+
+    def test_mark_as_completed_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        response = client.patch('/api/admin/transactions', {'ids': [row.id for row in self.transactions]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertInStep()
+        self.assertEqual(self.revenue(), 60)
+
+
+class RevenueBucketTests(TestCase):
+    """
+    Revenue per bucket in a single grouped query, from the rollups and from Transactions alike.
+    """
+
+    def setUp(self):
+        # Completed payments by local day: previous week on the 25th, this week on the 2nd (twice) and the 5th
+        for day, amount in ((datetime.date(2026, 2, 25), 7), (datetime.date(2026, 3, 2), 10), (datetime.date(2026, 3, 2), 5), (datetime.date(2026, 3, 5), 20)):
+            row = Transactions.objects.create(user_involved='user', type='payment', amount=amount, status='completed')
+            Transactions.objects.filter(id=row.id).update(date_time=timezone.make_aware(datetime.datetime.combine(day, datetime.time(23, 30))))
+        Transactions.objects.create(user_involved='user', type='refund', amount=100, status='completed')
+
+    def test_days_of_a_week(self):
+        with self.assertNumQueries(1):
+            series, total, previous_total = revenue_growth(datetime.date(2026, 3, 2), datetime.date(2026, 3, 8), 'day', datetime.date(2026, 2, 23))
+
+        self.assertEqual([revenue for _, revenue in series], [15, 0, 0, 20, 0, 0, 0])
+        self.assertEqual(series[0][0], datetime.date(2026, 3, 2))
+        self.assertEqual((total, previous_total), (35, 7))
+
+    def test_weeks_and_months(self):
+        weeks, _, _ = revenue_growth(datetime.date(2026, 2, 23), datetime.date(2026, 3, 8), 'week')
+        months, total, _ = revenue_growth(datetime.date(2026, 2, 1), datetime.date(2026, 3, 31), 'month')
+
+        self.assertEqual(weeks, [(datetime.date(2026, 2, 23), 7), (datetime.date(2026, 3, 2), 35)])
+        self.assertEqual(months, [(datetime.date(2026, 2, 1), 7), (datetime.date(2026, 3, 1), 35)])
+        self.assertEqual(total, 42)
+
+    def test_transactions_bucket_like_the_rollups(self):
+        payments = Transactions.objects.filter(type='payment', status='completed')
+        for granularity in ('day', 'week', 'month'):
+            args = (datetime.date(2026, 2, 1), datetime.date(2026, 3, 31), granularity, datetime.date(2026, 1, 1))
+            self.assertEqual(bucketed_sum(payments, 'date_time', 'amount', *args), bucketed_sum(revenue_rollups(), 'day', 'amount', *args), granularity)
+
+
+class CreationRollupTests(TestCase):
+    """
+    Entities created per day, kept by the save and delete signals, read by the growth charts.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        self.professionals = [create_professional(number) for number in range(3)]
+        self.books = [Books.objects.create(name=f'Book {number}', price=10, description='Book', additional_details='Details', image='book.png') for number in range(2)]
+
+    def rollups(self):
+        return {
+            (row.entity, row.day): row.count
+            for row in DailyCreationRollup.objects.all() if row.count
+        }
+
+    def assertInStep(self):
+        expected = {(entity, group['day']): group['count'] for entity, model in CREATION_MODELS.items() for group in creation_groups(model)}
+        self.assertEqual(self.rollups(), expected)
+
+    def test_create_and_delete(self):
+        self.assertInStep()
+        self.professionals[0].delete()
+        response = self.client.delete('/api/admin/books', {'ids': [book.id for book in self.books]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertInStep()
+        self.assertEqual(self.rollups(), {('professionals', timezone.localdate()): 2})
+
+    def test_rebuild_matches_the_incremental_rows(self):
+        incremental = self.rollups()
+        rebuild_creation_rollups()
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_growth_chart_reads_the_rollups(self):
+        today = timezone.localdate()
+        params = {'entity': 'professionals', 'from_date': today - datetime.timedelta(days=2), 'to_date': today, 'granularity': 'day'}
+
+        response = self.client.get('/api/admin/dashboard/growth_chart', params)
+
+        self.assertEqual(response.data['total_count'], 3)
+        self.assertEqual([bucket['count'] for bucket in response.data['growth_chart']], [0, 0, 3])
+
+
+# COUNTERS TESTS *******
+class CounterTests(TestCase):
+    """
+    Every write path keeps the counters equal to a COUNT(*).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+
+    def assertInStep(self):
+        self.assertEqual({name: get_count(name) for name in COUNTERS}, {name: rows().count() for name, rows in COUNTERS.items()})
+        self.assertEqual(reconcile_counters(), {})
+
+    def test_create_and_delete(self):
+        professionals = [create_professional(number) for number in range(3)]
+        self.assertInStep()
+
+        professionals[0].delete()
+        response = self.client.delete('/api/admin/professionals', {'ids': [professionals[1].id]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertInStep()
+        self.assertEqual(get_count(Professionals), 1)
+
+    def test_bulk_create(self):
+        Transactions.objects.create(user_involved='user', type='payment', amount=10, status='completed')
+        Transactions.objects.bulk_create([Transactions(user_involved='bulk', type='payment', amount=5, status='completed') for _ in range(3)])
+
+        self.assertInStep()
+        self.assertEqual(get_count(Transactions), 4)
+
+    def test_active_users(self):
+        users = [mobile_user(number) for number in range(4)]
+        users[0].is_active = False
+        users[0].save()
+        response = self.client.delete('/api/admin/users', {'ids': [users[1].id, users[2].id]}, format='json')
+        users[3].delete()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertInStep()
+        self.assertEqual((get_count(MobileUsers), get_count(ACTIVE_MOBILE_USERS)), (3, 0))
+
+    def test_statistics_read_the_counters(self):
+        create_professional(0)
+        Transactions.objects.create(user_involved='user', type='payment', amount=10, status='completed')
+        self.assertInStep()
+
+        with self.assertNumQueries(1):
+            statistics = key_matrix_statistics()
+
+        self.assertEqual(statistics, {"total_professionals": 1, "total_materials": 0, "total_registered_users": 0, "total_transactions": 1})
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+# KEYSET PAGINATION TESTS *******
+class CursorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+
+    def test_activity_timeline_rejects_wrongly_typed_cursor(self):
+        for values in (["notadate", 1], ["2026-01-01T00:00:00+00:00", "notanid"], [[], {}], [None, 1]):
+            response = self.client.get('/api/admin/dashboard/activity_timeline', {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 404, values)
+
+    def test_activity_timeline_accepts_its_own_cursor(self):
+        response = self.client.get('/api/admin/dashboard/activity_timeline', {'cursor': encode_cursor(["2026-01-01T00:00:00+00:00", 1])})
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_rejects_wrongly_typed_cursor(self):
+        for values in (["notadate", 1], ["2026-01-01T00:00:00+00:00", "notanid"]):
+            response = self.client.get('/api/admin/users', {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 404, values)
+
+    def test_list_follows_its_next_cursor(self):
+        Transactions.objects.bulk_create([Transactions(user_involved=f'user {number}', type='payment', amount=10, status='completed') for number in range(15)])
+
+        first = self.client.get('/api/admin/transactions', {'pagination': 'cursor'})
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(first.data['results']) + len(second.data['results']), 15)
+        self.assertIsNone(second.data['next'])
+
+    def test_list_walk_has_no_duplicates(self):
+        # Same date_time on every row, the pages only stay apart on the id tie-break
+        date_time = timezone.now()
+        Transactions.objects.bulk_create([Transactions(user_involved=f'user {number}', type='payment', amount=10, status='completed') for number in range(25)])
+        Transactions.objects.update(date_time=date_time)
+
+        ids, url, params = [], '/api/admin/transactions', {'pagination': 'cursor'}
+        while url:
+            response = self.client.get(url, params)
+            ids += [row['id'] for row in response.data['results']]
+            url, params = response.data['next'], None
+
+        self.assertEqual(sorted(ids), sorted(Transactions.objects.values_list('id', flat=True)))
+
+
+# LIST COUNT TESTS *******
+class ListCountTests(TestCase):
+    """
+    The ?count= modes of the list pages.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        Transactions.objects.bulk_create([Transactions(user_involved=f'user {number}', type='payment', amount=10, status='completed') for number in range(15)])
+
+    def count(self, mode, **params):
+        response = self.client.get('/api/admin/transactions', {'count': mode, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['count']
+
+    def test_modes(self):
+        self.assertEqual(self.count('exact'), 15)
+        self.assertEqual(self.count('approx'), 15)
+
+        first = self.client.get('/api/admin/transactions', {'count': 'none'})
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual((first.data['count'], len(first.data['results']), first.data['previous']), (None, 10, None))
+        self.assertEqual((len(second.data['results']), second.data['next']), (5, None))
+        self.assertIsNotNone(second.data['previous'])
+
+    def test_default_is_approx(self):
+        get_count(Transactions)
+        EntityCounter.objects.filter(name='transactions').update(value=99)
+        self.assertEqual(self.client.get('/api/admin/transactions').data['count'], 99)
+
+    def test_rejects_unknown_mode(self):
+        self.assertEqual(self.client.get('/api/admin/transactions', {'count': 'some'}).status_code, 400)
+
+    def test_unfiltered_approx_reads_the_counter(self):
+        self.assertEqual(get_count(Transactions), 15)
+        EntityCounter.objects.filter(name='transactions').update(value=99)
+
+        self.assertEqual(self.count('approx'), 99)
+        self.assertEqual(self.count('exact'), 15)
+
+    def test_filtered_approx_is_cached(self):
+        dates = {'from_date': (timezone.now() - datetime.timedelta(days=1)).isoformat(), 'to_date': timezone.now().isoformat()}
+        self.assertEqual(self.count('approx', **dates), 15)
+
+        Transactions.objects.create(user_involved='user', type='payment', amount=10, status='completed')
+
+        self.assertEqual(self.count('approx', **dates), 15)
+        self.assertEqual(self.count('exact', **dates), 16)
+        cache.clear()
+        self.assertEqual(self.count('approx', **dates), 16)
+
+
+# FULL-TEXT SEARCH TESTS *******
+class SearchIndexTests(TransactionTestCase):
+    def professional(self, name):
+        number = Professionals.objects.count()
+        return Professionals.objects.create(
+            name=name, phone_no=f'+9495000000{number}', email=f'pro{number}@example.com', expertise='Plumbing', location='Colombo',
+            about='About', experiance='Experience', portfolio='portfolio.pdf', banner='banner.png',
+        )
+
+    def alter_name(self, max_length):
+        # SQLite alters a column by rebuilding its table, the triggers on it are dropped
+        old_field = Professionals._meta.get_field('name')
+        new_field = copy.copy(old_field)
+        new_field.max_length = max_length
+        with connection.schema_editor() as editor:
+            editor.alter_field(Professionals, old_field, new_field)
+
+    def test_altered_table_gets_its_triggers_back(self):
+        ensure_search_indexes()
+        self.professional('John Before')
+        self.alter_name(200)
+        self.addCleanup(self.alter_name, 150)
+        self.professional('Jane Between')
+
+        self.assertFalse(has_full_text(Professionals))
+        self.assertIn(fts_table(Professionals), ensure_search_indexes())
+        self.professional('Jim After')
+
+        self.assertTrue(has_full_text(Professionals))
+        for name in ('John Before', 'Jane Between', 'Jim After'):
+            self.assertTrue(Professionals.objects.filter(search_filter(Professionals, name)).exists(), name)
+
+
+# PUSH NOTIFICATIONS TESTS *******
+class AdminSdkTransportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        app = mock.patch('core.apis.firebase.get_firebase_app', return_value=SimpleNamespace(project_id='test-project'))
+        app.start()
+        self.addCleanup(app.stop)
+        get_fcm_breaker('test-project').record_success()
+
+    @override_settings(FCM_MAX_RETRIES=1, FCM_BACKOFF_BASE=0)
+    def test_failed_batch_counts_as_failures(self):
+        error = firebase_exceptions.UnavailableError('FCM is down')
+        with mock.patch('core.apis.firebase.messaging.send_each', side_effect=error) as send_each:
+            summary = send_with_admin_sdk(['token-1', 'token-2'], 'Title', 'Body', None)
+
+        self.assertEqual(send_each.call_count, 2)
+        self.assertEqual((summary.success_count, summary.failure_count), (0, 2))
+        self.assertEqual(summary.error_counts, {'UNAVAILABLE': 2})
+        self.assertEqual(get_fcm_breaker('test-project').failures, 2)
+
+
+def mobile_user(number, last_login=None):
+    user = CustomUser.objects.create(email=f'user{number}@example.com', last_login=last_login)
+    return MobileUsers.objects.create(
+        user=user, first_name=f'User {number}', last_name='Perera', email=f'user{number}@example.com',
+        phone_no=f'+9194000000{number:02d}', fcm_token=f'token-{number}',
+    )
+
+def image_upload():
+    content = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(content, 'PNG')
+    return SimpleUploadedFile('notification.png', content.getvalue(), content_type='image/png')
+
+
+# SEGMENTS TESTS *******
+class SegmentTests(TestCase):
+    def segments(self, user):
+        return set(SegmentMembership.objects.filter(user=user).values_list('segment', flat=True))
+
+    def memberships(self):
+        return set(SegmentMembership.objects.values_list('segment', 'user_id', 'fcm_token'))
+
+    def test_saved_users_join_their_segments(self):
+        active, dormant = mobile_user(0, last_login=timezone.now()), mobile_user(1)
+
+        self.assertEqual(self.segments(active), {'all users', 'active users', 'new users'})
+        self.assertEqual(self.segments(dormant), {'all users', 'dormant users', 'new users'})
+
+    def test_saved_token_reaches_the_segments(self):
+        user = mobile_user(0)
+        user.fcm_token = 'new-token'
+        user.save()
+
+        self.assertEqual(set(SegmentMembership.objects.filter(user=user).values_list('fcm_token', flat=True)), {'new-token'})
+
+    def test_deactivated_users_leave_every_segment(self):
+        saved, deleted = mobile_user(0), mobile_user(1)
+        saved.is_active = False
+        saved.save()
+
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        response = client.delete('/api/admin/users', {'ids': [deleted.id]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.memberships(), set())
+
+    @override_settings(SEGMENT_ACTIVE_DAYS=30, SEGMENT_NEW_USER_DAYS=30)
+    def test_time_boundaries_move_the_users(self):
+        user = mobile_user(0, last_login=timezone.now())
+        long_ago = timezone.now() - datetime.timedelta(days=31)
+        SegmentMembership.objects.filter(user=user).update(registered_on=long_ago, last_seen_on=long_ago)
+
+        changes = refresh_time_segments()
+
+        self.assertEqual(changes, {"new users expired": 1, "active users now dormant": 1})
+        self.assertEqual(self.segments(user), {'all users', 'dormant users'})
+
+    def test_registered_between_resolves_from_the_registration_date(self):
+        user = mobile_user(0)
+        today = timezone.localdate()
+        yesterday = today - datetime.timedelta(days=1)
+
+        self.assertEqual(list(segment_members('registered between', yesterday, today).values_list('user_id', flat=True)), [user.id])
+        self.assertFalse(segment_members('registered between', yesterday, yesterday).exists())
+        self.assertFalse(segment_members('registered between').exists())
+
+    def test_rebuild_matches_the_incremental_rows(self):
+        mobile_user(0, last_login=timezone.now())
+        mobile_user(1)
+        inactive = mobile_user(2)
+        inactive.is_active = False
+        inactive.save()
+        incremental = self.memberships()
+
+        rebuild_segments(batch_size=1)
+
+        self.assertEqual(self.memberships(), incremental)
+
+
+# NOTIFICATIONS TESTS *******
+class NotificationApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_superuser(email='admin@example.com', password=None))
+        # 'all users', 'active users' and 'new users' / 'dormant users' and 'new users'
+        mobile_user(0, last_login=timezone.now())
+        mobile_user(1)
+
+    def notification_data(self, recipient, **data):
+        today = timezone.localdate()
+        data = {'title': 'Offer', 'recipient': recipient, 'status': 'sent', 'body': 'Offer', 'image': image_upload(), **data}
+        if recipient == 'registered between':
+            data.update(registered_from=today - datetime.timedelta(days=1), registered_to=today)
+        return data
+
+    def test_create_queues_every_recipient_type(self):
+        for recipient, _ in Notifications.RECIPIENT_CHOICES:
+            response = self.client.post('/api/admin/notifications', self.notification_data(recipient), format='multipart')
+
+            self.assertEqual(response.status_code, 202, (recipient, response.data))
+            self.assertTrue(NotificationDispatchJob.objects.filter(notification_id=response.data['id']).exists(), recipient)
+
+    def test_create_pending_saves_every_recipient_type(self):
+        for recipient, _ in Notifications.RECIPIENT_CHOICES:
+            response = self.client.post('/api/admin/notifications', self.notification_data(recipient, status='pending'), format='multipart')
+            self.assertEqual(response.status_code, 200, (recipient, response.data))
+
+        self.assertEqual(Notifications.objects.filter(status='pending').count(), len(Notifications.RECIPIENT_CHOICES))
+        self.assertFalse(NotificationDispatchJob.objects.exists())
+
+    def test_registered_between_needs_its_range(self):
+        data = {**self.notification_data('all users'), 'recipient': 'registered between'}
+        response = self.client.post('/api/admin/notifications', data, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_queues_every_recipient_type(self):
+        for recipient, _ in Notifications.RECIPIENT_CHOICES:
+            self.client.post('/api/admin/notifications', self.notification_data('all users', status='pending'), format='multipart')
+            notification = Notifications.objects.latest('id')
+
+            response = self.client.put(f'/api/admin/notifications/{notification.id}', self.notification_data(recipient), format='multipart')
+
+            self.assertEqual(response.status_code, 202, (recipient, response.data))
+            self.assertTrue(NotificationDispatchJob.objects.filter(notification=notification).exists(), recipient)
+
+
+def stored_notification(recipient='all users'):
+    # bulk_create: no push image to build from a file
+    return Notifications.objects.bulk_create([Notifications(title='Offer', recipient=recipient, body='Offer', image='notification.png')])[0]
+
+def send_summary(tokens, error=None):
+    summary = FCMSendSummary()
+    for token in tokens:
+        summary.add(FCMSendResult(token, error is None, status_code=200 if error is None else None, error=error))
+    return summary
+
+
+# NOTIFICATION DISPATCH TESTS *******
+class DispatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tokens = [mobile_user(number).fcm_token for number in range(4)]
+
+    def run_job(self, worker_id='worker', send=None):
+        job, = claim_jobs(worker_id)
+        send = send or (lambda tokens, *args: send_summary(tokens))
+        with mock.patch('core.apis.dispatch.send_fcm_notification', side_effect=send) as send_fcm_notification:
+            processed = process_job(job, worker_id)
+        return processed, [call.args[0] for call in send_fcm_notification.call_args_list]
+
+    def make_due(self, job):
+        NotificationDispatchJob.objects.filter(id=job.id).update(available_at=timezone.now())
+
+    def test_sent_job_is_done(self):
+        notification = stored_notification()
+        job = enqueue_notification(notification)
+
+        self.assertEqual(self.run_job(), (True, [self.tokens]))
+
+        job.refresh_from_db()
+        notification.refresh_from_db()
+        self.assertEqual((job.status, job.lease_owner, notification.status), ('done', None, 'sent'))
+        self.assertEqual(list(notification.receipts.values_list('chunk', 'success_count', 'failure_count')), [(0, 4, 0)])
+
+    def test_job_without_recipients_fails(self):
+        notification = stored_notification('registered between')
+        enqueue_notification(notification)
+
+        self.assertEqual(self.run_job(), (True, []))
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'failed')
+
+    def test_each_job_is_claimed_once(self):
+        first, second = enqueue_notification(stored_notification()), enqueue_notification(stored_notification())
+
+        self.assertEqual([job.id for job in claim_jobs('worker')], [first.id])
+        self.assertEqual([job.id for job in claim_jobs('other', limit=5)], [second.id])
+        self.assertEqual(claim_jobs('third'), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        job = enqueue_notification(stored_notification())
+        claimed, = claim_jobs('worker')
+        NotificationDispatchJob.objects.filter(id=job.id).update(lease_expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        reclaimed, = claim_jobs('other')
+
+        self.assertEqual((reclaimed.id, reclaimed.lease_owner, reclaimed.attempts), (job.id, 'other', 2))
+        # The presumed dead worker can no longer record an outcome
+        self.assertFalse(finish_job(claimed, 'worker', 'done', 'sent'))
+
+    @override_settings(FCM_RECIPIENT_CHUNK_SIZE=2)
+    def test_lost_lease_stops_the_worker(self):
+        notification = stored_notification()
+        job = enqueue_notification(notification)
+
+        def send(tokens, *args):
+            # Another worker took the job over during the first chunk
+            NotificationDispatchJob.objects.filter(id=job.id).update(lease_owner='other')
+            return send_summary(tokens)
+
+        self.assertEqual(self.run_job(send=send), (False, [self.tokens[:2]]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.lease_owner, job.next_chunk), ('leased', 'other', 0))
+
+    @override_settings(NOTIFICATION_DISPATCH_MAX_ATTEMPTS=2, NOTIFICATION_DISPATCH_RETRY_DELAY=60)
+    def test_failing_job_backs_off_then_fails(self):
+        notification = stored_notification()
+        job = enqueue_notification(notification)
+
+        def broken(tokens, *args):
+            raise RuntimeError("broken")
+
+        with self.assertLogs('core.apis.dispatch', 'ERROR'):
+            self.assertTrue(self.run_job(send=broken)[0])
+        job.refresh_from_db()
+        notification.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error, notification.status), ('queued', 1, 'broken', 'pending'))
+        self.assertGreater(job.available_at, timezone.now() + datetime.timedelta(seconds=50))
+        self.assertEqual(claim_jobs('worker'), [])
+
+        self.make_due(job)
+        with self.assertLogs('core.apis.dispatch', 'ERROR'):
+            self.assertTrue(self.run_job(send=broken)[0])
+        job.refresh_from_db()
+        notification.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, notification.status), ('failed', 2, 'failed'))
+
+    def test_deferred_job_keeps_its_attempts(self):
+        job = enqueue_notification(stored_notification())
+
+        def outage(tokens, *args):
+            raise FCMUnavailableError(send_summary(tokens, error=FCM_CIRCUIT_OPEN), 30)
+
+        for _ in range(3):
+            self.assertTrue(self.run_job(send=outage)[0])
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.pending_tokens), ('queued', 0, self.tokens))
+            self.assertGreater(job.available_at, timezone.now() + datetime.timedelta(seconds=20))
+            self.make_due(job)
+
+    def test_deferred_job_only_sends_the_tokens_held_back(self):
+        notification = stored_notification()
+        job = enqueue_notification(notification)
+
+        def outage(tokens, *args):
+            # The breaker opened after the first two tokens
+            summary = send_summary(tokens[:2])
+            for result in send_summary(tokens[2:], error=FCM_CIRCUIT_OPEN).results:
+                summary.add(result)
+            raise FCMUnavailableError(summary, 30)
+
+        self.assertTrue(self.run_job(send=outage)[0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.pending_tokens), ('queued', 0, self.tokens[2:]))
+
+        self.make_due(job)
+        processed, sent = self.run_job()
+
+        self.assertTrue(processed)
+        self.assertEqual(sent, [self.tokens[2:]])
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'sent')
+        self.assertEqual(sum(notification.receipts.values_list('success_count', flat=True)), 4)
+
+    @override_settings(FCM_RECIPIENT_CHUNK_SIZE=2, NOTIFICATION_DISPATCH_LEASE_SECONDS=60)
+    def test_checkpoints_keep_the_worker_lease(self):
+        enqueue_notification(stored_notification())
+        job, = claim_jobs('worker', lease_seconds=3600)
+        leases = []
+
+        def send(tokens, *args):
+            leases.append(NotificationDispatchJob.objects.get(id=job.id).lease_expires_at - timezone.now())
+            return send_summary(tokens)
+
+        with mock.patch('core.apis.dispatch.send_fcm_notification', side_effect=send):
+            self.assertTrue(process_job(job, 'worker', lease_seconds=3600))
+
+        self.assertEqual(len(leases), 2)
+        self.assertTrue(all(lease > datetime.timedelta(minutes=59) for lease in leases), leases)
+
+    def test_batch_job_reclaimed_meanwhile_is_skipped(self):
+        for _ in range(2):
+            enqueue_notification(stored_notification())
+        first, second = claim_jobs('worker', limit=2)
+
+        # The second job waited past its lease and another worker took it over
+        NotificationDispatchJob.objects.filter(id=second.id).update(lease_expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual([job.id for job in claim_jobs('other')], [second.id])
+
+        with mock.patch('core.apis.dispatch.send_fcm_notification', side_effect=lambda tokens, *args: send_summary(tokens)) as send:
+            self.assertTrue(process_job(first, 'worker'))
+            self.assertFalse(process_job(second, 'worker'))
+
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(NotificationDispatchJob.objects.get(id=second.id).lease_owner, 'other')
+
+    def test_batch_job_lease_is_renewed_before_it_starts(self):
+        for _ in range(2):
+            enqueue_notification(stored_notification())
+        first, second = claim_jobs('worker', limit=2)
+        NotificationDispatchJob.objects.filter(id=second.id).update(lease_expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        def send(tokens, *args):
+            # Not claimable by another worker while it is being sent
+            self.assertEqual(claim_jobs('other'), [])
+            return send_summary(tokens)
+
+        with mock.patch('core.apis.dispatch.send_fcm_notification', side_effect=send):
+            self.assertTrue(process_job(second, 'worker'))
+
+
+# INBOX TESTS *******
+class InboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def log_in(self, number):
+        user = mobile_user(number)
+        user.user.groups.add(Group.objects.get_or_create(name='USER')[0])
+        self.client.force_authenticate(user.user)
+        return user
+
+    def publish(self, recipient='all users'):
+        return publish_to_inbox(stored_notification(recipient))
+
+    def inbox(self):
+        response = self.client.get('/api/user/inbox')
+        return [item['id'] for item in response.data['results']], response.data['unread_count']
+
+    def test_broadcasts_before_registration_are_not_listed(self):
+        before = self.publish()
+        InboxItem.objects.filter(id=before.id).update(published_on=timezone.now() - datetime.timedelta(hours=1))
+        self.log_in(0)
+        after = self.publish()
+
+        self.assertEqual(self.inbox(), ([after.id], 0))
+
+        latest = self.publish()
+        self.assertEqual(self.inbox(), ([latest.id, after.id], 1))
+        self.assertEqual(self.client.get('/api/user/inbox/unread_count').data['unread_count'], 1)
+
+    def test_other_segments_are_not_listed(self):
+        self.log_in(0)
+        self.inbox()
+        # A user never seen is dormant, not active
+        dormant = self.publish('dormant users')
+        self.publish('active users')
+
+        self.assertEqual(self.inbox(), ([dormant.id], 1))
@@ -133,6 +133,18 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by every worker process (FCM access token, dashboard results...).
+# Create the table with `python manage.py createcachetable`.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'handy_book_cache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -185,3 +197,65 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 FIREBASE_SERVICEKEY = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
 GOOGLE_APPLICATION_CREDENTIALS = os.path.join(BASE_DIR, FIREBASE_SERVICEKEY)
 FCM_URL = os.getenv("FCM_URL")
+
+# FCM sender: 'http_v1' sends one pooled request per token, 'admin_sdk' uses firebase_admin send_each batches
+FCM_TRANSPORT = os.getenv("FCM_TRANSPORT", "http_v1")
+FCM_MAX_WORKERS = int(os.getenv("FCM_MAX_WORKERS", 32))
+FCM_TIMEOUT = float(os.getenv("FCM_TIMEOUT", 10))
+# Refresh the cached FCM OAuth token this many seconds before it expires
+FCM_TOKEN_REFRESH_MARGIN = int(os.getenv("FCM_TOKEN_REFRESH_MARGIN", 300))
+
+# Background notification dispatch (see `manage.py run_notification_worker`)
+NOTIFICATION_DISPATCH_LEASE_SECONDS = int(os.getenv("NOTIFICATION_DISPATCH_LEASE_SECONDS", 300))
+NOTIFICATION_DISPATCH_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_DISPATCH_MAX_ATTEMPTS", 5))
+NOTIFICATION_DISPATCH_RETRY_DELAY = int(os.getenv("NOTIFICATION_DISPATCH_RETRY_DELAY", 30))
+# Recipients are resolved and sent in chunks of this many tokens
+FCM_RECIPIENT_CHUNK_SIZE = int(os.getenv("FCM_RECIPIENT_CHUNK_SIZE", 1000))
+# FCM error codes meaning the token will never work again, such tokens are removed from MobileUsers
+FCM_PERMANENT_TOKEN_ERRORS = ('UNREGISTERED', 'SENDER_ID_MISMATCH')
+# Retries of 429/5xx answers, with exponential backoff (seconds) and jitter
+FCM_MAX_RETRIES = int(os.getenv("FCM_MAX_RETRIES", 4))
+FCM_BACKOFF_BASE = float(os.getenv("FCM_BACKOFF_BASE", 0.5))
+FCM_BACKOFF_MAX = float(os.getenv("FCM_BACKOFF_MAX", 30))
+# Sends per second per FCM project and per process, 0 disables the limit
+FCM_RATE_LIMIT_QPS = float(os.getenv("FCM_RATE_LIMIT_QPS", 500))
+# Consecutive failures opening the circuit breaker, and seconds it stays open
+FCM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("FCM_CIRCUIT_FAILURE_THRESHOLD", 20))
+FCM_CIRCUIT_RESET_TIMEOUT = float(os.getenv("FCM_CIRCUIT_RESET_TIMEOUT", 30))
+# Public base url of the API, used to build media urls outside of a request (scheduled notifications)
+SITE_URL = os.getenv("SITE_URL", "http://localhost:8000")
+
+# Notification segments: 'active users' logged in within SEGMENT_ACTIVE_DAYS (the others are 'dormant users'),
+# 'new users' registered within SEGMENT_NEW_USER_DAYS
+SEGMENT_ACTIVE_DAYS = int(os.getenv("SEGMENT_ACTIVE_DAYS", 30))
+SEGMENT_NEW_USER_DAYS = int(os.getenv("SEGMENT_NEW_USER_DAYS", 30))
+
+# Push payload images: longest side in pixels and target size in bytes of the compressed variant
+PUSH_IMAGE_MAX_DIMENSION = int(os.getenv("PUSH_IMAGE_MAX_DIMENSION", 1024))
+PUSH_IMAGE_MAX_BYTES = int(os.getenv("PUSH_IMAGE_MAX_BYTES", 300 * 1024))
+
+# Dashboard results are cached until their tables change, this is only an upper bound (seconds)
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", 24 * 60 * 60))
+# Threads computing the widgets of dashboard/summary concurrently, 1 computes them one after the other
+DASHBOARD_MAX_WORKERS = int(os.getenv("DASHBOARD_MAX_WORKERS", 4))
+# Seconds the other requests wait for the one computing a missing dashboard result
+DASHBOARD_CACHE_LOCK_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_LOCK_TIMEOUT", 30))
+# Seconds between two logs of the dashboard cache hits and misses of a process
+DASHBOARD_CACHE_METRICS_INTERVAL = int(os.getenv("DASHBOARD_CACHE_METRICS_INTERVAL", 15 * 60))
+
+# Live dashboard stream: event broker, core.apis.live.InProcessBroker only sees the writes of its own process,
+# core.apis.live.DatabaseBroker relays them between processes through the LiveEvent table
+LIVE_BROKER = os.getenv("LIVE_BROKER", "core.apis.live.InProcessBroker")
+# Seconds between keep-alive comments on idle streams, and between DatabaseBroker polls
+LIVE_HEARTBEAT_INTERVAL = float(os.getenv("LIVE_HEARTBEAT_INTERVAL", 15))
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", 1))
+# Events buffered per stream, a client falling further behind is told to resync
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", 100))
+# Seconds DatabaseBroker keeps relayed events
+LIVE_EVENT_RETENTION = int(os.getenv("LIVE_EVENT_RETENTION", 300))
+
+# Seconds the row count of a filtered list page is reused ('approx' count mode of the list paginations)
+LIST_COUNT_CACHE_TIMEOUT = int(os.getenv("LIST_COUNT_CACHE_TIMEOUT", 30))
+
+# Seconds between two checks of the professionals autocomplete against writes made by other processes
+AUTOCOMPLETE_REFRESH_INTERVAL = int(os.getenv("AUTOCOMPLETE_REFRESH_INTERVAL", 60))
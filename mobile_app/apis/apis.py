@@ -8,9 +8,11 @@ from rest_framework.response import Response
 from rest_framework import status
 
 # local imports
-from .serializers import UserRegisterSerializer, GetOTPSerializer, OTPVerficationSerializer
+from .serializers import UserRegisterSerializer, GetOTPSerializer, OTPVerficationSerializer, InboxItemSerializer
 from core.models import MobileUsers, CustomUser
 from core.apis.permissions import IsAuthenticatedAndInUserGroup
+from core.apis.paginations import InboxPagination
+from core.apis.inbox import get_user_inbox, get_user_segments, user_inbox_items, get_unread_count, mark_inbox_read
 
 
 # Create your apis here.
@@ -62,4 +64,51 @@ class OTPVerificationView(APIView):
             token = serializer.save()
             return Response(token, status=status.HTTP_200_OK)
         
-        return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response({"detail": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# INBOX API'S *******
+class InboxView(APIView):
+    """
+    Notifications received by the logged in user, newest first, cursor paginated.
+    """
+    permission_classes = [IsAuthenticatedAndInUserGroup]
+
+    def get(self, request):
+        user = get_object_or_404(MobileUsers, user=request.user)
+        inbox = get_user_inbox(user)
+        segments = get_user_segments(user)
+
+        paginator = InboxPagination()
+        items = paginator.paginate_queryset(user_inbox_items(user, inbox, segments), request)
+        serializer = InboxItemSerializer(items, many=True, context={"inbox": inbox})
+
+        response = paginator.get_paginated_response(serializer.data)
+        response.data["unread_count"] = get_unread_count(user, inbox, segments)
+        return response
+
+
+class InboxUnreadCountView(APIView):
+    """
+    Number of unread notifications, for the app badge.
+    """
+    permission_classes = [IsAuthenticatedAndInUserGroup]
+
+    def get(self, request):
+        user = get_object_or_404(MobileUsers, user=request.user)
+        inbox = get_user_inbox(user)
+
+        return Response({"unread_count": get_unread_count(user, inbox, get_user_segments(user))}, status=status.HTTP_200_OK)
+
+
+class InboxMarkReadView(APIView):
+    """
+    Mark every notification of the inbox as read.
+    """
+    permission_classes = [IsAuthenticatedAndInUserGroup]
+
+    def post(self, request):
+        user = get_object_or_404(MobileUsers, user=request.user)
+        mark_inbox_read(get_user_inbox(user))
+
+        return Response({"detail": "Inbox marked as read"}, status=status.HTTP_200_OK)
@@ -1,5 +1,5 @@
 from django.db import transaction
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import Group, update_last_login
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
@@ -10,7 +10,8 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from phonenumber_field.serializerfields import PhoneNumberField
 
 #local imports
-from core.models import CustomUser, MobileUsers
+from core.models import CustomUser, InboxItem, MobileUsers
+from core.apis.scheduler import absolute_media_url
 
 
 # Create your serializers here
@@ -86,6 +87,9 @@ class OTPVerficationSerializer(serializers.Serializer):
         user = self.validated_data["user"]
         custom_user = self.validated_data["custom_user"]
 
+        # Record the login, the notification segments are based on it
+        update_last_login(None, custom_user)
+
         # Change the otp to none
         user.otp = None
         user.save()
@@ -100,3 +104,20 @@ class OTPVerficationSerializer(serializers.Serializer):
         }
         return tokens
 
+
+# INBOX API'S *******
+class InboxItemSerializer(serializers.ModelSerializer):
+    title = serializers.CharField(source='notification.title')
+    body = serializers.CharField(source='notification.body')
+    image = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
+
+    class Meta:
+        model = InboxItem
+        fields = ['id', 'title', 'body', 'image', 'published_on', 'is_read']
+
+    def get_image(self, obj):
+        return absolute_media_url(obj.notification.payload_image)
+
+    def get_is_read(self, obj):
+        return obj.id <= self.context["inbox"].read_through
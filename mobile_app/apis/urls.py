@@ -4,10 +4,15 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
 # Local imports
-from .apis import UserRegisterView, UserGetOTPView, OTPVerificationView
+from .apis import UserRegisterView, UserGetOTPView, OTPVerificationView, InboxView, InboxUnreadCountView, InboxMarkReadView
 
 urlpatterns = [
     path('register', UserRegisterView.as_view()),
     path('getotp', UserGetOTPView.as_view()),
-    path('validate_otp', OTPVerificationView.as_view())
+    path('validate_otp', OTPVerificationView.as_view()),
+
+    # Inbox
+    path('inbox', InboxView.as_view()),
+    path('inbox/unread_count', InboxUnreadCountView.as_view()),
+    path('inbox/read', InboxMarkReadView.as_view())
 ]
\ No newline at end of file